@@ -0,0 +1,252 @@
+"""
+Performance benchmarks of the simulator and the matchers.
+
+Every benchmark uses fixed seeds and synthetic grid graphs, and reports named metrics with a unit and a direction.
+Results are written as JSON and can be compared against a stored baseline, in which case the script exits with
+status 1 if a metric regressed by more than the threshold:
+
+    python benchmarks/run.py --output results.json --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse, json, os, platform, sys, time, tracemalloc, warnings
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import networkx as nx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.maps import Map
+from ubergym.envs.matcher import Matcher
+from ubergym.envs import graphs
+import drivers.AcceptingDriver as AcceptingDriver
+import ubergym.envs.constants as constants
+
+SEED = 2002
+WEIGHT = 1
+
+BENCHMARKS: Dict[str, Callable[[bool], Dict[str, Dict]]] = {}
+
+
+def benchmark(function: Callable[[bool], Dict[str, Dict]]) -> Callable[[bool], Dict[str, Dict]]:
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def metric(value: float, unit: str, higher_is_better: bool) -> Dict:
+    return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def grid_graph(side: int) -> nx.DiGraph:
+    """
+    side x side grid with edges in both directions and constant weight, nodes are numbered 0, ..., side * side - 1.
+    """
+    return graphs.grid(side, side, weight = WEIGHT).to_networkx()
+
+
+def make_env(side: int, n_drivers: int, arrival_rate: float, num_steps: int, **kwargs) -> Uber:
+    """
+    Environment on a side x side grid where arrival_rate passengers spawn per step in expectation, spread uniformly.
+    """
+    n_nodes = side * side
+    probabilities = np.full(n_nodes, min(arrival_rate / n_nodes, 1.0))
+    return Uber(n_drivers = n_drivers, passenger_generation_probabilities = probabilities, graph = grid_graph(side), num_steps = num_steps, is_logging = False, seed = SEED, **kwargs)
+
+
+def run_episode(env: Uber, policy: AcceptingDriver.Policy, seed: Optional[int] = SEED) -> int:
+    observations = env.reset(seed = seed)
+    done = False
+    steps = 0
+    while not done:
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        steps += 1
+    return steps
+
+
+def median_time(function: Callable[[], object], repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+@benchmark
+def env_steps(quick: bool) -> Dict[str, Dict]:
+    """
+    Steps per second of an episode with accepting drivers against the number of drivers, the graph size and the arrival rate.
+    """
+    num_steps = 50 if quick else 200
+    results = {}
+    for side in [4, 8]:
+        for n_drivers in [5, 20]:
+            for arrival_rate in [0.5, 2.0]:
+                env = make_env(side, n_drivers, arrival_rate, num_steps)
+                policy = AcceptingDriver.Policy(env.map.graph)
+                start = time.perf_counter()
+                steps = run_episode(env, policy)
+                elapsed = time.perf_counter() - start
+                env.close()
+                results[f"nodes={side * side},drivers={n_drivers},rate={arrival_rate}"] = metric(steps / elapsed, "steps/s", True)
+    return results
+
+
+@benchmark
+def matcher_solve(quick: bool) -> Dict[str, Dict]:
+    """
+    Median latency of Matcher.minimize_costs against the size of square cost matrices of random integer distances.
+    """
+    repeats = 3 if quick else 5
+    rng = np.random.default_rng(SEED)
+    results = {}
+    for method in constants.simulation["matcher_metadata"]["types"]:
+        matcher = Matcher(method, constants.simulation["mean_price_per_distance"], constants.simulation["variance_per_price"])
+        for size in [5, 10, 20, 40]:
+            costs = rng.integers(1, 20, size = (size, size)).astype(np.float64)
+            # the lexicographic matcher rescales the costs in place
+            latency = median_time(lambda: matcher.minimize_costs(costs.copy()), repeats)
+            results[f"{method},size={size}"] = metric(latency * 1e3, "ms", False)
+    return results
+
+
+@benchmark
+def map_warmup(quick: bool) -> Dict[str, Dict]:
+    """
+    Cost of filling the distance and shortest path caches of a Map for all pairs of nodes, and of a warm lookup.
+    """
+    results = {}
+    for side in ([6] if quick else [6, 10]):
+        graph = grid_graph(side)
+        pairs = [(u, v) for u in graph for v in graph]
+
+        map = Map(graph)
+        start = time.perf_counter()
+        for u, v in pairs:
+            map.distance(u, v)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for u, v in pairs:
+            map.distance(u, v)
+        warm = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for u, v in pairs:
+            map.shortest_path(u, v)
+        paths = time.perf_counter() - start
+
+        next_hops = median_time(lambda: Map(graph).next_hops(), 5)
+
+        nodes = side * side
+        results[f"distance_cold,nodes={nodes}"] = metric(cold / len(pairs) * 1e6, "us/pair", False)
+        results[f"distance_warm,nodes={nodes}"] = metric(warm / len(pairs) * 1e6, "us/pair", False)
+        results[f"shortest_path_cold,nodes={nodes}"] = metric(paths / len(pairs) * 1e6, "us/pair", False)
+        results[f"next_hops,nodes={nodes}"] = metric(next_hops * 1e3, "ms", False)
+    return results
+
+
+@benchmark
+def reset_and_memory(quick: bool) -> Dict[str, Dict]:
+    """
+    Median reset time, and the memory allocated by a long episode after a warm-up episode, measured with tracemalloc.
+    """
+    num_steps = 200 if quick else 1000
+    env = make_env(6, 10, 1.0, num_steps)
+    policy = AcceptingDriver.Policy(env.map.graph)
+
+    reset = median_time(lambda: env.reset(seed = SEED), 5 if quick else 20)
+
+    # a first episode warms up the caches and the solver so that only the growth of the episode itself is measured
+    run_episode(env, policy)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run_episode(env, policy)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    env.close()
+
+    return {
+        "reset": metric(reset * 1e3, "ms", False),
+        f"memory_growth,steps={num_steps}": metric(growth / 1024, "KiB", False),
+        f"memory_peak,steps={num_steps}": metric(peak / 1024, "KiB", False),
+    }
+
+
+def run(names: List[str], quick: bool) -> Dict:
+    results = {}
+    for name in names:
+        print(f"running {name}", file = sys.stderr)
+        for key, value in BENCHMARKS[name](quick).items():
+            results[f"{name}/{key}"] = value
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "networkx": nx.__version__,
+            "platform": platform.platform(),
+            "quick": quick,
+            "seed": SEED,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Names of the metrics that are worse than in the baseline by more than threshold, as a fraction of the baseline value.
+    Metrics that are missing on either side are ignored.
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        reference = baseline["results"][name]["value"]
+        if reference == 0:
+            continue
+        difference = (current["value"] - reference) / abs(reference)
+        # positive when the metric got worse
+        change = -difference if current["higher_is_better"] else difference
+        status = "REGRESSION" if change > threshold else "ok"
+        print(f"{status:>10} {name}: {current['value']:.4g} {current['unit']} (baseline {reference:.4g}, {difference:+.1%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description = "Run the ubergym performance benchmarks.")
+    parser.add_argument("benchmarks", nargs = "*", help = f"benchmarks to run among {', '.join(BENCHMARKS)}, all by default")
+    parser.add_argument("--quick", action = "store_true", help = "smaller problem sizes and fewer repeats")
+    parser.add_argument("--output", help = "path of the JSON results")
+    parser.add_argument("--baseline", help = "path of JSON results to compare against")
+    parser.add_argument("--threshold", type = float, default = 0.25, help = "relative slowdown counted as a regression")
+    args = parser.parse_args(args)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks {', '.join(unknown)}")
+
+    warnings.filterwarnings("ignore")
+    results = run(args.benchmarks or list(BENCHMARKS), args.quick)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent = 2)
+    else:
+        print(json.dumps(results, indent = 2))
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("quick") != args.quick:
+        print("warning: the baseline was run with a different --quick setting", file = sys.stderr)
+    regressions = compare(results, baseline, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
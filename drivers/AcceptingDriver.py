@@ -1,17 +1,13 @@
-from typing import Iterable, List, Tuple
+from typing import Iterable, List, Optional, Tuple
 from dataclasses import dataclass
-import logging, sys
+import logging
 import numpy as np
 import networkx as nx
 
 from ubergym.envs.maps import Map
+from drivers.trajectory import TrajectoryBuffer
 
-# logging config
-logging.basicConfig(
-    format='%(message)s',
-    filename='logs.log',
-    level=logging.INFO,
-)
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Driver:
@@ -19,10 +15,16 @@ class Driver:
     num_actions: int
     graph: nx.DiGraph 
     is_logging: bool = False
+    # with history = True observations, actions and rewards are kept in lists that grow with every step,
+    # a TrajectoryBuffer with n_drivers = 1 keeps them in bounded arrays instead
+    history: bool = False
+    trajectory: Optional[TrajectoryBuffer] = None
 
 
     def __post_init__(self):
         self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
         self.actions = []
         self.observations = []
         self.messages = []
@@ -36,11 +38,15 @@ class Driver:
         self.map = Map(self.graph)
 
     def action(self, observation) -> int:
-        self.observations.append(observation)
+        if self.history:
+            self.observations.append(observation)
         self._log_observation(observation)
         action = self._select_action(observation)
         self._log_action(action)
-        self.actions.append(action)
+        if self.history:
+            self.actions.append(action)
+        if self.trajectory is not None:
+            self.trajectory.add(observation[None], np.array([action]))
         return action
 
     def _select_action(self, observation):
@@ -74,24 +80,48 @@ class Driver:
 
     def add_reward(self, reward):
         self._log_reward(reward)
-        self.rewards.append(reward)
+        self.last_reward = reward
+        self.episode_reward += reward
+        if self.history:
+            self.rewards.append(reward)
+        if self.trajectory is not None:
+            self.trajectory.add_rewards(np.array([reward]))
+
+    def reset(self):
+        """
+        Clears the episode.
+        """
+        self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
+        self.actions = []
+        self.observations = []
+        self.messages = []
+        if self.trajectory is not None:
+            self.trajectory.reset()
 
     def log(self):
         if not self.is_logging:
             return
         
         for message in self.messages:
-            logging.info(message)
+            logger.info(message)
         
         self.messages = []
 
     def _log_action(self, action):
+        if not self.is_logging:
+            return
         self.messages.append(f'Action = {action}')
 
     def _log_reward(self, reward):
+        if not self.is_logging:
+            return
         self.messages.append(f'Reward = {reward}')
 
     def _log_observation(self, observation):
+        if not self.is_logging:
+            return
         driver_msg = f'Driver {self.name}'
         state = self.state_to_message[observation[0]]
         state_msg = f'State = {state}'
@@ -114,4 +144,36 @@ class Driver:
             message += '\t' + p_destination_msg
             self.messages.append(message)
 
-        return 
\ No newline at end of file
+        return 
+
+
+@dataclass
+class Policy:
+    """
+    Batched version of the accepting driver for a whole fleet, without per-driver logging and histories.
+    Moves follow the next_hops table of the map, so when several shortest paths tie the next node may differ from
+    the one of the driver, which follows Map.shortest_path.
+    """
+    graph: nx.DiGraph
+
+    def __post_init__(self):
+        self.map = Map(self.graph)
+        self.next_hops = self.map.next_hops()
+
+    def act_batch(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Takes the (n_drivers, features) observation matrix and returns one action per driver.
+        """
+        state = observations[:, 0].astype(np.int64)
+        position = observations[:, 1].astype(np.int64)
+        p_destination = observations[:, 2].astype(np.int64)
+        p_position = observations[:, 3].astype(np.int64)
+
+        # IDLE and OFF drivers stay where they are, next_hops[i, i] = i covers arrived MATCHED and RIDING drivers
+        actions = position.copy()
+        actions[state == 1] = 1
+        matched = state == 2
+        actions[matched] = self.next_hops[position[matched], p_position[matched]]
+        riding = state == 3
+        actions[riding] = self.next_hops[position[riding], p_destination[riding]]
+        return actions
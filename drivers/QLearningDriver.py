@@ -1,17 +1,14 @@
-from typing import Iterable, List, Tuple
+from typing import Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
-import logging, sys
+import logging
 import numpy as np
 import networkx as nx
 
 from ubergym.envs.maps import Map
+from drivers.trajectory import TrajectoryBuffer
+from drivers.qtables import QTable
 
-# logging config
-logging.basicConfig(
-    format='%(message)s',
-    stream=sys.stdout,
-    level=logging.INFO,
-)
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Driver:
@@ -21,10 +18,25 @@ class Driver:
     is_logging: bool = False
     lr: float = 0.05
     epsilon: float = 0.5
+    # Q-table storage, see drivers/qtables.py
+    backend: str = 'dense'
+    dtype: type = np.float64
+    neighbor_actions: bool = False
+    qtable: Optional[QTable] = None
+    # with learning = False the Q-table is only read, e.g. when it is memory-mapped read-only
+    learning: bool = True
+    # with history = True observations, states, actions and rewards are kept in lists that grow with every step,
+    # a TrajectoryBuffer with n_drivers = 1 keeps observations, actions and rewards in bounded arrays instead
+    history: bool = False
+    trajectory: Optional[TrajectoryBuffer] = None
+    # exploration and the initial Q-values, a Generator, e.g. the agents stream env.rngs["agents"] of Uber, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
 
 
     def __post_init__(self):
         self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
         self.actions = []
         self.observations = []
         self.states = []
@@ -37,6 +49,7 @@ class Driver:
             4: "OFF"
         }
         self.map = Map(self.graph)
+        self.rng = np.random.default_rng(self.seed)
 
         # initalize RL values
         self.inital_low = 0
@@ -45,71 +58,83 @@ class Driver:
         self.num_price_states = 20
         self.max_price = 200
         self.n_nodes = len(self.graph)
-        print(self.n_nodes)
-        self.qtable = [
-            # IDLE: driver position, passenger position, action
-            np.random.uniform(self.inital_low, self.inital_high, size = (self.n_nodes, self.num_actions)), 
-            # MATCHING: driver position, passenger destination, passenger position, price, action
-            np.random.uniform(self.inital_low, self.inital_high, size = (self.n_nodes, self.n_nodes, self.n_nodes, self.num_price_states, 2)), 
-            # MATCHED: driver position, passenger destination, passenger position, action
-            np.random.uniform(self.inital_low, self.inital_high, size = (self.n_nodes, self.n_nodes, self.n_nodes, self.num_actions)),
-            # RIDING: driver position, passenger destination, action
-            np.random.uniform(self.inital_low, self.inital_high, size = (self.n_nodes, self.n_nodes, self.num_actions))
-        ]
+        if self.qtable is None:
+            self.qtable = QTable(
+                graph = self.graph,
+                num_actions = self.num_actions,
+                num_price_states = self.num_price_states,
+                backend = self.backend,
+                dtype = self.dtype,
+                neighbor_actions = self.neighbor_actions,
+                initial_low = self.inital_low,
+                initial_high = self.inital_high,
+                seed = self.rng,
+            )
 
         self.prev_state = None
+        # slot of the previous action in the Q-table row of the previous state
         self.prev_action = None
 
-        # initalize non-neighbor movements to -np.inf so that they are not chosen
-        for i in range(self.n_nodes):
-            for j in range(self.n_nodes):
-                if i == j:
-                    continue
-                if self.map.neighbors(i,j):
-                    continue
-                self.qtable[0][i][j] = -np.inf
-        
-        for i in range(self.n_nodes):
-            for j in range(self.n_nodes):
-                for k in range(self.n_nodes):
-                    if i == k:
-                        continue
-                    if self.map.neighbors(i,k):
-                        continue
-                    self.qtable[3][i][j][k] = -np.inf
-                    self.qtable[2][i][j][k] = -np.inf
-
 
     def action(self, observation) -> int:
         state = self._get_state(observation)
         self._learn(state)
 
-        self.observations.append(observation)
-        self.states.append(state)
+        if self.history:
+            self.observations.append(observation)
+            self.states.append(state)
         self._log_observation(observation)
         
         action = self._select_action(state)
+        if self.trajectory is not None:
+            self.trajectory.add(observation[None], np.array([action]))
 
         return action
 
     def _learn(self, state):
-        if self.prev_state is None:
+        if state[0] == 4:
+            # OFF drivers have no Q-table, learning starts again from the first state after they log on
+            self.prev_state = None
+            return
+        if self.prev_state is None or not self.learning:
             self.prev_state = state
             return
         
         # TD Learning
-        reward = self.rewards[-1]
-        qmax = np.max(self.qtable[state[0]][state[1:]])
-        qcurr = self.qtable[self.prev_state[0]][self.prev_state[1:]][self.prev_action]
-        self.qtable[self.prev_state[0]][self.prev_state[1:]][self.prev_action] += self.lr * (reward + self.discount * qmax - qcurr)
+        reward = self.last_reward
+        qmax = np.max(self.qtable.values(state))
+        qcurr = self.qtable.values(self.prev_state)[self.prev_action]
+        self.qtable.update(self.prev_state, self.prev_action, self.lr * (reward + self.discount * qmax - qcurr))
         self.prev_state = state
 
-    def reset(self):
+    def save(self, path: str):
+        self.qtable.save(path)
+
+    @classmethod
+    def load(cls, path: str, name: int, graph: nx.DiGraph, mmap_mode: Optional[str] = 'r', **kwargs) -> 'Driver':
+        """
+        Creates a driver from a Q-table saved with save. The default read-only memory map disables learning.
+        """
+        qtable = QTable.load(path, graph, mmap_mode = mmap_mode)
+        kwargs.setdefault("learning", mmap_mode != 'r')
+        return cls(name, qtable.num_actions, graph, qtable = qtable, **kwargs)
+
+    def reset(self, rng: Optional[np.random.Generator] = None):
+        """
+        Clears the episode, with rng the driver explores with it from now on, pass env.rngs["agents"] after every
+        env.reset(seed = ...) since the environment then replaces its generators.
+        """
+        if rng is not None:
+            self.rng = rng
         self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
         self.actions = []
         self.observations = []
         self.states = []
         self.messages = []
+        if self.trajectory is not None:
+            self.trajectory.reset()
         self.prev_state = None
         self.prev_action = None
 
@@ -123,6 +148,8 @@ class Driver:
             return state[:4]
         elif state[0] == 3:
             return state[:3]
+        elif state[0] == 4:
+            return state[:2]
         return state
 
     def _get_next_node(self, position, destination) -> int:
@@ -135,7 +162,10 @@ class Driver:
 
     def _select_action(self, state):
 
-        if state[0] == 2:
+        if state[0] == 4:
+            # OFF drivers wait in place
+            action = state[1]
+        elif state[0] == 2:
             position = state[1]
             destination = state[3]
             action = self._get_next_node(position, destination)
@@ -144,13 +174,16 @@ class Driver:
             destination = state[2]
             action = self._get_next_node(position, destination)
 
-        elif np.random.random() < self.epsilon:
-            action = np.random.randint(0, len(self.qtable[state[0]][state[1:]]))
+        elif self.rng.random() < self.epsilon:
+            # exploration only picks allowed actions, the TD update of a masked (-inf) slot is NaN
+            slots = self.qtable.allowed_slots(state)
+            action = self.qtable.action(state, slots[self.rng.integers(0, len(slots))])
         else:
-            action = np.argmax(self.qtable[state[0]][state[1:]])
-        self.prev_action = action
+            action = self.qtable.action(state, np.argmax(self.qtable.values(state)))
+        self.prev_action = None if state[0] == 4 else self.qtable.slot(state, action)
         self._log_action(action)
-        self.actions.append(action)
+        if self.history:
+            self.actions.append(action)
         return action
 
     def _get_price_state(self, price: float) -> int:
@@ -164,24 +197,35 @@ class Driver:
 
     def add_reward(self, reward):
         self._log_reward(reward)
-        self.rewards.append(reward)
+        self.last_reward = reward
+        self.episode_reward += reward
+        if self.history:
+            self.rewards.append(reward)
+        if self.trajectory is not None:
+            self.trajectory.add_rewards(np.array([reward]))
 
     def log(self):
         if not self.is_logging:
             return
         
         for message in self.messages:
-            logging.info(message)
+            logger.info(message)
         
         self.messages = []
 
     def _log_action(self, action):
+        if not self.is_logging:
+            return
         self.messages.append(f'Driver {self.name}, Action = {action}')
 
     def _log_reward(self, reward):
+        if not self.is_logging:
+            return
         self.messages.append(f'Driver {self.name}, Reward = {reward}')
 
     def _log_observation(self, observation):
+        if not self.is_logging:
+            return
         driver_msg = f'Driver {self.name}'
         state = self.state_to_message[observation[0]]
         state_msg = f'State = {state}'
@@ -0,0 +1,190 @@
+from typing import List, Optional, Union
+from dataclasses import dataclass
+import numpy as np
+import networkx as nx
+
+from ubergym.envs.maps import Map
+from drivers.trajectory import TrajectoryBuffer
+
+
+@dataclass
+class Fleet:
+    """
+    Tabular Q-learning for a whole fleet of drivers at once.
+    Uses the same states, actions and TD(0) updates as QLearningDriver, but takes the observations of all drivers
+    as one (n_drivers, features) matrix and does the state lookup, the action selection and the updates with numpy.
+    With shared tables all drivers learn a single Q-table, otherwise every driver has its own slice of stacked tables.
+    """
+    n_drivers: int
+    num_actions: int
+    graph: nx.DiGraph
+    shared: bool = True
+    lr: float = 0.05
+    epsilon: float = 0.5
+    discount: float = 1.0
+    # a Generator, e.g. the agents stream env.rngs["agents"] of Uber, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
+    # optional store of the observations, actions and rewards of the fleet
+    trajectory: Optional[TrajectoryBuffer] = None
+
+    def __post_init__(self):
+        self.map = Map(self.graph)
+        self.rng = np.random.default_rng(self.seed)
+
+        # initalize RL values
+        self.inital_low = 0
+        self.inital_high = 50
+        self.num_price_states = 20
+        self.max_price = 200
+        self.n_nodes = len(self.graph)
+        n = self.n_nodes
+
+        self.state_shapes = [
+            # IDLE: driver position
+            (n,),
+            # MATCHING: driver position, passenger destination, passenger position, price
+            (n, n, n, self.num_price_states),
+            # MATCHED: driver position, passenger destination, passenger position
+            (n, n, n),
+            # RIDING: driver position, passenger destination
+            (n, n),
+        ]
+        self.action_sizes = [self.num_actions, 2, self.num_actions, self.num_actions]
+
+        # allowed[i, j] is True if a driver at node i can move to node j (or stay)
+        self.allowed = np.zeros((n, self.num_actions), dtype = bool)
+        for u, v in self.graph.edges():
+            self.allowed[u, v] = True
+        self.allowed[np.arange(n), np.arange(n)] = True
+        self.next_hops = self.map.next_hops()
+
+        # tables[k] has shape (n_tables, n_states_k, n_actions_k) with flattened states
+        n_tables = 1 if self.shared else self.n_drivers
+        self.tables: List[np.ndarray] = []
+        for k in range(len(self.state_shapes)):
+            shape = (n_tables,) + self.state_shapes[k] + (self.action_sizes[k],)
+            table = self.rng.uniform(self.inital_low, self.inital_high, size = shape)
+            # initalize non-neighbor movements to -np.inf so that they are not chosen, for MATCHED the actions and
+            # not the rows of the states whose passenger is away from the driver, as in QTable
+            if k == 0:
+                table[:, ~self.allowed] = -np.inf
+            elif k == 2:
+                table[np.broadcast_to(~self.allowed[None, :, None, None, :], shape)] = -np.inf
+            elif k == 3:
+                table[np.broadcast_to(~self.allowed[None, :, None, :], shape)] = -np.inf
+            self.tables.append(table.reshape(n_tables, -1, self.action_sizes[k]))
+
+        self.table_index = np.zeros(self.n_drivers, dtype = np.int64) if self.shared else np.arange(self.n_drivers)
+        self.reset()
+
+    def reset(self, rng: Optional[np.random.Generator] = None):
+        """
+        Clears the episode, with rng the fleet explores with it from now on, pass env.rngs["agents"] after every
+        env.reset(seed = ...) since the environment then replaces its generators.
+        """
+        if rng is not None:
+            self.rng = rng
+        self.prev_status: Optional[np.ndarray] = None
+        self.prev_state: Optional[np.ndarray] = None
+        self.prev_action: Optional[np.ndarray] = None
+        self.last_rewards = np.zeros(self.n_drivers)
+        self.episode_rewards = np.zeros(self.n_drivers)
+        if self.trajectory is not None:
+            self.trajectory.reset()
+
+    def act_batch(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Takes the (n_drivers, features) observation matrix and returns one action per driver.
+        """
+        status, state = self._get_states(observations)
+        self._learn(status, state)
+        actions = self._select_actions(observations, status, state)
+
+        self.prev_status = status
+        self.prev_state = state
+        self.prev_action = actions
+        if self.trajectory is not None:
+            self.trajectory.add(observations, actions)
+        return actions
+
+    def add_rewards(self, rewards: np.ndarray):
+        self.last_rewards = np.asarray(rewards, dtype = np.float64)
+        self.episode_rewards += self.last_rewards
+        if self.trajectory is not None:
+            self.trajectory.add_rewards(self.last_rewards)
+
+    def _get_price_states(self, price: np.ndarray) -> np.ndarray:
+        price_states = np.floor_divide(price, int(self.max_price / self.num_price_states)).astype(np.int64)
+        return np.clip(price_states, 0, self.num_price_states - 1)
+
+    def _get_states(self, observations: np.ndarray):
+        """
+        Flattened state index of every driver in the table of its status, -1 for statuses without a table.
+        """
+        status = observations[:, 0].astype(np.int64)
+        position = observations[:, 1].astype(np.int64)
+        p_destination = observations[:, 2].astype(np.int64)
+        p_position = observations[:, 3].astype(np.int64)
+        price_state = self._get_price_states(observations[:, 4])
+
+        n, P = self.n_nodes, self.num_price_states
+        state = np.select(
+            [status == 0, status == 1, status == 2, status == 3],
+            [
+                position,
+                ((position * n + p_destination) * n + p_position) * P + price_state,
+                (position * n + p_destination) * n + p_position,
+                position * n + p_destination,
+            ],
+            default = -1,
+        )
+        return status, state
+
+    def _learn(self, status: np.ndarray, state: np.ndarray):
+        if self.prev_state is None:
+            return
+
+        # TD Learning, only for drivers that had a learnable state before and have one now
+        qmax = np.zeros(self.n_drivers)
+        valid = (self.prev_state >= 0) & (state >= 0)
+        for k, table in enumerate(self.tables):
+            mask = valid & (status == k)
+            qmax[mask] = table[self.table_index[mask], state[mask]].max(axis = 1)
+
+        for k, table in enumerate(self.tables):
+            mask = valid & (self.prev_status == k)
+            if not mask.any():
+                continue
+            index = (self.table_index[mask], self.prev_state[mask], self.prev_action[mask])
+            qcurr = table[index]
+            delta = self.lr * (self.last_rewards[mask] + self.discount * qmax[mask] - qcurr)
+            # np.add.at accumulates the updates of drivers hitting the same entry of a shared table
+            np.add.at(table, index, delta)
+
+    def _select_actions(self, observations: np.ndarray, status: np.ndarray, state: np.ndarray) -> np.ndarray:
+        position = observations[:, 1].astype(np.int64)
+        p_destination = observations[:, 2].astype(np.int64)
+        p_position = observations[:, 3].astype(np.int64)
+
+        # drivers without a learnable state wait in place
+        actions = position.copy()
+
+        # MATCHED and RIDING drivers follow the shortest path
+        matched = status == 2
+        actions[matched] = self.next_hops[position[matched], p_position[matched]]
+        riding = status == 3
+        actions[riding] = self.next_hops[position[riding], p_destination[riding]]
+
+        # epsilon-greedy for IDLE and MATCHING drivers, exploration only picks allowed actions
+        explore = self.rng.random(self.n_drivers) < self.epsilon
+        for k in [0, 1]:
+            mask = status == k
+            if not mask.any():
+                continue
+            q = self.tables[k][self.table_index[mask], state[mask]]
+            scores = self.rng.random(q.shape)
+            if k == 0:
+                scores[~self.allowed[position[mask]]] = -1.0
+            actions[mask] = np.where(explore[mask], scores.argmax(axis = 1), q.argmax(axis = 1))
+
+        return actions
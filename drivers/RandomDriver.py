@@ -1,17 +1,13 @@
-from typing import Iterable, List, Tuple
+from typing import Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
-import logging, sys
+import logging
 import numpy as np
 import networkx as nx
 
 from ubergym.envs.maps import Map
+from drivers.trajectory import TrajectoryBuffer
 
-# logging config
-logging.basicConfig(
-    format='%(message)s',
-    stream=sys.stdout,
-    level=logging.INFO,
-)
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Driver:
@@ -19,9 +15,18 @@ class Driver:
     num_actions: int
     graph: nx.DiGraph 
     is_logging: bool = False
+    # with history = True observations, actions and rewards are kept in lists that grow with every step,
+    # a TrajectoryBuffer with n_drivers = 1 keeps them in bounded arrays instead
+    history: bool = False
+    trajectory: Optional[TrajectoryBuffer] = None
+    # a Generator, e.g. the agents stream env.rngs["agents"] of Uber, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
 
     def __post_init__(self):
+        self.rng = np.random.default_rng(self.seed)
         self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
         self.actions = []
         self.observations = []
         self.messages = []
@@ -35,33 +40,63 @@ class Driver:
         self.map = Map(self.graph)
 
     def action(self, observation) -> int:
-        self.observations.append(observation)
+        if self.history:
+            self.observations.append(observation)
         self._log_observation(observation)
-        action = np.random.randint(0, self.num_actions)
+        action = int(self.rng.integers(0, self.num_actions))
         self._log_action(action)
-        self.actions.append(action)
+        if self.history:
+            self.actions.append(action)
+        if self.trajectory is not None:
+            self.trajectory.add(observation[None], np.array([action]))
         return action
 
     def add_reward(self, reward):
         self._log_reward(reward)
-        self.rewards.append(reward)
+        self.last_reward = reward
+        self.episode_reward += reward
+        if self.history:
+            self.rewards.append(reward)
+        if self.trajectory is not None:
+            self.trajectory.add_rewards(np.array([reward]))
+
+    def reset(self, rng: Optional[np.random.Generator] = None):
+        """
+        Clears the episode, with rng the driver draws its actions with it from now on.
+        """
+        if rng is not None:
+            self.rng = rng
+        self.rewards = []
+        self.last_reward = None
+        self.episode_reward = 0.0
+        self.actions = []
+        self.observations = []
+        self.messages = []
+        if self.trajectory is not None:
+            self.trajectory.reset()
 
     def log(self):
         if not self.is_logging:
             return
         
         for message in self.messages:
-            logging.info(message)
+            logger.info(message)
         
         self.messages = []
 
     def _log_action(self, action):
+        if not self.is_logging:
+            return
         self.messages.append(f'Action = {action}')
 
     def _log_reward(self, reward):
+        if not self.is_logging:
+            return
         self.messages.append(f'Reward = {reward}')
 
     def _log_observation(self, observation):
+        if not self.is_logging:
+            return
         driver_msg = f'Driver {self.name}'
         state = self.state_to_message[observation[0]]
         state_msg = f'State = {state}'
@@ -84,4 +119,30 @@ class Driver:
             message += '\t' + p_destination_msg
             self.messages.append(message)
 
-        return 
\ No newline at end of file
+        return 
+
+
+@dataclass
+class Policy:
+    """
+    Batched version of the random driver for a whole fleet, without per-driver logging and histories.
+    """
+    num_actions: int
+    # a Generator, e.g. the agents stream env.rngs["agents"] of Uber, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
+
+    def __post_init__(self):
+        self.rng = np.random.default_rng(self.seed)
+
+    def reset(self, rng: Optional[np.random.Generator] = None):
+        """
+        With rng the policy draws its actions with it from now on, e.g. env.rngs["agents"] after env.reset.
+        """
+        if rng is not None:
+            self.rng = rng
+
+    def act_batch(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Takes the (n_drivers, features) observation matrix and returns one action per driver.
+        """
+        return self.rng.integers(0, self.num_actions, size = len(observations))
@@ -0,0 +1,165 @@
+"""
+Hogwild-style training of QLearningDriver fleets: several worker processes each run their own Uber environment
+and drivers, and all of them update one dense Q-table that lives in shared memory.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import queue
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from drivers.qtables import QTable
+import drivers.QLearningDriver as QLearningDriver
+
+
+@dataclass
+class StripedQTable(QTable):
+    """
+    QTable whose updates hold one of a fixed number of locks, chosen by the hash of the state.
+    Without locks, updates are lock-free and concurrent updates of the same entry may be lost.
+    """
+    locks: Optional[List] = None
+
+    def update(self, state: Tuple, slot: int, delta: float):
+        if not self.locks:
+            return super().update(state, slot, delta)
+        with self.locks[hash(state) % len(self.locks)]:
+            super().update(state, slot, delta)
+
+
+def _table_kwargs(qtable: QTable) -> Dict:
+    return dict(
+        num_actions = qtable.num_actions,
+        num_price_states = qtable.num_price_states,
+        dtype = qtable.dtype,
+        neighbor_actions = qtable.neighbor_actions,
+        initial_low = qtable.initial_low,
+        initial_high = qtable.initial_high,
+    )
+
+
+def _share(tables: List[np.ndarray]) -> Tuple[List[shared_memory.SharedMemory], List[Tuple]]:
+    """
+    Copies the tables into new shared memory blocks, returns the blocks and the specs to attach to them.
+    """
+    blocks, specs = [], []
+    for table in tables:
+        block = shared_memory.SharedMemory(create = True, size = max(table.nbytes, 1))
+        np.ndarray(table.shape, dtype = table.dtype, buffer = block.buf)[...] = table
+        blocks.append(block)
+        specs.append((block.name, table.shape, table.dtype.str))
+    return blocks, specs
+
+
+def _attach(specs: List[Tuple]) -> Tuple[List[shared_memory.SharedMemory], List[np.ndarray]]:
+    blocks = [shared_memory.SharedMemory(name = name) for name, _, _ in specs]
+    tables = [np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+    return blocks, tables
+
+
+def _worker(worker: int, episodes: List[int], env_kwargs: Dict, driver_kwargs: Dict, table_kwargs: Dict, specs: List[Tuple], locks: List, seed: int, results: mp.Queue):
+    # the blocks stay open until the process exits since the drivers hold views of them
+    blocks, tables = _attach(specs)
+
+    env = Uber(**env_kwargs)
+    graph = env_kwargs["graph"]
+    qtable = StripedQTable(graph = graph, tables = tables, locks = locks, **table_kwargs)
+    drivers = [QLearningDriver.Driver(i, table_kwargs["num_actions"], graph, qtable = qtable, **driver_kwargs) for i in range(env.n_drivers)]
+
+    for n, episode in enumerate(episodes):
+        # the seed of the worker seeds its environment once, the later episodes continue its streams, and the
+        # drivers explore with the agents stream of the environment
+        observations = env.reset(seed = seed if n == 0 else None)
+        for driver in drivers:
+            driver.reset(env.rngs["agents"])
+        done = False
+        while not done:
+            vectorized_observations = np.array(list(observations.values()))
+            actions = [drivers[i].action(vectorized_observations[:,i]) for i in range(env.n_drivers)]
+            observations, rewards, done, info = env.step(actions)
+            for i in range(env.n_drivers):
+                drivers[i].add_reward(rewards[i])
+
+        results.put({"worker": worker, "episode": episode, "rewards": [float(driver.episode_reward) for driver in drivers]})
+    env.close()
+
+
+def train(
+    env_kwargs: Dict,
+    n_episodes: int,
+    n_workers: int = mp.cpu_count(),
+    driver_kwargs: Optional[Dict] = None,
+    qtable: Optional[QTable] = None,
+    n_locks: int = 0,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_every: int = 10,
+    seed: Optional[int] = None,
+    callback: Optional[Callable[[Dict], None]] = None) -> Tuple[QTable, List[Dict]]:
+    """
+    Trains one shared dense Q-table with n_workers processes running n_episodes episodes in total.
+    env_kwargs are the arguments of Uber, driver_kwargs extra arguments of QLearningDriver.Driver.
+    n_locks = 0 gives lock-free updates, otherwise updates hold one of n_locks striped locks.
+    Episode results are streamed to callback as they arrive, and the table is saved to the directory
+    checkpoint_path (see QTable.save) every checkpoint_every episodes. Returns the trained Q-table and the results of all episodes.
+    Worker i seeds its environment, and so its drivers, with the i-th child of SeedSequence(seed), so that every worker
+    sees its own trajectories. The trajectories are only reproducible when the actions do not depend on the values
+    that the other workers write into the shared table, e.g. with epsilon = 1.
+    """
+    driver_kwargs = dict(driver_kwargs or {})
+    graph = env_kwargs["graph"]
+    if qtable is None:
+        qtable = QTable(graph = graph, num_actions = len(graph), dtype = driver_kwargs.pop("dtype", np.float64), neighbor_actions = driver_kwargs.pop("neighbor_actions", False), seed = seed)
+    if qtable.backend != 'dense':
+        raise ValueError("only dense Q-tables can be shared between processes")
+
+    ctx = mp.get_context()
+    blocks, specs = _share(qtable.tables)
+    locks = [ctx.Lock() for _ in range(n_locks)]
+    results_queue = ctx.Queue()
+    seeds = [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(n_workers)]
+
+    workers = []
+    for worker in range(n_workers):
+        episodes = list(range(worker, n_episodes, n_workers))
+        if len(episodes) == 0:
+            continue
+        process = ctx.Process(target = _worker, args = (worker, episodes, env_kwargs, driver_kwargs, _table_kwargs(qtable), specs, locks, seeds[worker], results_queue), daemon = True)
+        process.start()
+        workers.append(process)
+
+    shared_tables = [np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+    results: List[Dict] = []
+    try:
+        while len(results) < n_episodes:
+            try:
+                result = results_queue.get(timeout = 1.0)
+            except queue.Empty:
+                if not any(process.is_alive() for process in workers):
+                    raise RuntimeError("workers exited before finishing all episodes")
+                continue
+
+            results.append(result)
+            if callback is not None:
+                callback(result)
+            if checkpoint_path is not None and len(results) % checkpoint_every == 0:
+                QTable(graph = graph, tables = shared_tables, **_table_kwargs(qtable)).save(checkpoint_path)
+
+        for process in workers:
+            process.join()
+
+        # copy the trained values out of shared memory before releasing it
+        qtable.tables = [np.array(table) for table in shared_tables]
+        if checkpoint_path is not None:
+            qtable.save(checkpoint_path)
+    finally:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        del shared_tables
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return qtable, results
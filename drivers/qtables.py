@@ -0,0 +1,253 @@
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+import json, os
+import numpy as np
+import networkx as nx
+
+BACKENDS = ['dense', 'sparse']
+
+# version of the on-disk layout written by QTable.save
+FORMAT_VERSION = 1
+
+# statuses whose actions are movements to a node
+MOVE_STATES = [0, 2, 3]
+
+
+@dataclass
+class QTable:
+    """
+    Q-values of the QLearningDriver, indexed by the state tuples of the driver:
+        IDLE: (0, driver position)
+        MATCHING: (1, driver position, passenger destination, passenger position, price state)
+        MATCHED: (2, driver position, passenger destination, passenger position)
+        RIDING: (3, driver position, passenger destination)
+
+    Backends:
+        dense: one preallocated array per status, like the original Q-tables
+        sparse: rows are materialised lazily the first time a state is visited
+
+    With neighbor_actions, movement actions are restricted to staying and moving to an out-neighbour.
+    The actions of a state are then slots of a CSR row instead of node ids, use action/slot to convert.
+    """
+    graph: nx.DiGraph
+    num_actions: int
+    num_price_states: int = 20
+    backend: str = 'dense'
+    dtype: type = np.float64
+    neighbor_actions: bool = False
+    initial_low: float = 0
+    initial_high: float = 50
+    # a Generator, e.g. the one of the driver, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
+    # existing dense tables to use instead of allocating new ones, e.g. tables in shared memory
+    tables: Optional[List[np.ndarray]] = None
+
+    def __post_init__(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f'Unknown Q-table backend {self.backend}')
+
+        self.rng = np.random.default_rng(self.seed)
+        self.n_nodes = len(self.graph)
+        n = self.n_nodes
+
+        # CSR of the allowed moves of every node: the node itself and its out-neighbours, sorted
+        rows = [sorted(set(self.graph.successors(i)) | {i}) for i in range(n)]
+        self.indptr = np.zeros(n + 1, dtype = np.int64)
+        self.indptr[1:] = np.cumsum([len(row) for row in rows])
+        self.indices = np.fromiter((j for row in rows for j in row), dtype = np.int64, count = self.indptr[-1])
+
+        # allowed[i, j] is True if a driver at node i can move to node j (or stay)
+        self.allowed = np.zeros((n, self.num_actions), dtype = bool)
+        self.allowed[np.repeat(np.arange(n), np.diff(self.indptr)), self.indices] = True
+
+        if self.backend == 'dense':
+            if self.tables is None:
+                self.tables = [self._dense_table(k) for k in range(4)]
+            elif [table.shape for table in self.tables] != [self._shape(k) for k in range(4)]:
+                raise ValueError('tables do not have the shapes of this Q-table')
+        else:
+            self.rows: List[Dict[Tuple, np.ndarray]] = [{} for _ in range(4)]
+
+    def _shape(self, k: int) -> Tuple:
+        n = self.n_nodes
+        if self.neighbor_actions:
+            # the driver position selects a slice of the flattened CSR action dimension
+            nnz = int(self.indptr[-1])
+            return [(nnz,), (n, n, n, self.num_price_states, 2), (n, n, nnz), (n, nnz)][k]
+        return [(n, self.num_actions), (n, n, n, self.num_price_states, 2), (n, n, n, self.num_actions), (n, n, self.num_actions)][k]
+
+    def _uniform(self, shape) -> np.ndarray:
+        # drawn directly in the table dtype so that float32 tables never hold a float64 copy
+        values = self.rng.random(shape, dtype = self.dtype)
+        values *= self.initial_high - self.initial_low
+        values += self.initial_low
+        return values
+
+    def _dense_table(self, k: int) -> np.ndarray:
+        shape = self._shape(k)
+        table = self._uniform(shape)
+        if self.neighbor_actions or k not in MOVE_STATES:
+            return table
+
+        # initalize non-neighbor movements to -np.inf so that they are not chosen
+        # MATCHED (k == 2) masks the actions that do not move to a neighbor of the driver position, like IDLE and
+        # RIDING. The original tables masked whole rows instead, every action of the states whose passenger position
+        # is not a neighbor of the driver, which made their maximum -inf and the TD targets of those states NaN.
+        if k == 0:
+            mask = ~self.allowed
+        elif k == 2:
+            mask = np.broadcast_to(~self.allowed[:, None, None, :], shape)
+        else:
+            mask = np.broadcast_to(~self.allowed[:, None, :], shape)
+        table[mask] = -np.inf
+        return table
+
+    def _row_slice(self, state: Tuple) -> Tuple:
+        # index of the row of a state in the dense table of its status
+        if self.neighbor_actions and state[0] in MOVE_STATES:
+            position = state[1]
+            return tuple(state[2:]) + (slice(self.indptr[position], self.indptr[position + 1]),)
+        return tuple(state[1:])
+
+    def _new_row(self, state: Tuple) -> np.ndarray:
+        k, position = state[0], state[1]
+        if k not in MOVE_STATES:
+            return self._uniform(2)
+        if self.neighbor_actions:
+            return self._uniform(self.indptr[position + 1] - self.indptr[position])
+        row = self._uniform(self.num_actions)
+        row[~self.allowed[position]] = -np.inf
+        return row
+
+    def values(self, state: Tuple) -> np.ndarray:
+        """
+        Q-values of all the actions of a state. The returned array is a view, updating it updates the table.
+        """
+        if self.backend == 'dense':
+            return self.tables[state[0]][self._row_slice(state)]
+
+        key = tuple(state[1:])
+        row = self.rows[state[0]].get(key)
+        if row is None:
+            row = self._new_row(state)
+            self.rows[state[0]][key] = row
+        return row
+
+    def update(self, state: Tuple, slot: int, delta: float):
+        self.values(state)[slot] += delta
+
+    def action(self, state: Tuple, slot: int) -> int:
+        """
+        Converts the slot of an action in the row of a state to the action of the environment.
+        """
+        if self.neighbor_actions and state[0] in MOVE_STATES:
+            return int(self.indices[self.indptr[state[1]] + slot])
+        return int(slot)
+
+    def slot(self, state: Tuple, action: int) -> int:
+        """
+        Converts an action of the environment to its slot in the row of a state.
+        """
+        if self.neighbor_actions and state[0] in MOVE_STATES:
+            lo, hi = self.indptr[state[1]], self.indptr[state[1] + 1]
+            slot = int(np.searchsorted(self.indices[lo:hi], action))
+            if slot == hi - lo or self.indices[lo + slot] != action:
+                raise ValueError(f'action {action} is not allowed at node {state[1]}')
+            return slot
+        return int(action)
+
+    def allowed_slots(self, state: Tuple) -> np.ndarray:
+        """
+        Slots of the allowed actions in the row of a state, the other slots hold -inf.
+        """
+        if state[0] not in MOVE_STATES:
+            return np.arange(2)
+        position = state[1]
+        if self.neighbor_actions:
+            return np.arange(self.indptr[position + 1] - self.indptr[position])
+        return np.flatnonzero(self.allowed[position])
+
+    def __len__(self) -> int:
+        """
+        Number of materialised Q-values.
+        """
+        if self.backend == 'dense':
+            return sum(table.size for table in self.tables)
+        return sum(row.size for rows in self.rows for row in rows.values())
+
+    def save(self, path: str):
+        """
+        Saves the Q-table to the directory path as plain .npy files and a meta.json describing them:
+            dense: table_<status>.npy with the table of every status
+            sparse: keys_<status>.npy (one state per row), offsets_<status>.npy and values_<status>.npy
+                    (the Q-values of the state in row i are values[offsets[i]:offsets[i + 1]])
+        """
+        os.makedirs(path, exist_ok = True)
+
+        if self.backend == 'dense':
+            for k, table in enumerate(self.tables):
+                np.save(os.path.join(path, f'table_{k}.npy'), table)
+        else:
+            for k, rows in enumerate(self.rows):
+                key_length = [1, 4, 3, 2][k]
+                keys = np.array(list(rows.keys()), dtype = np.int64).reshape(len(rows), key_length)
+                offsets = np.zeros(len(rows) + 1, dtype = np.int64)
+                offsets[1:] = np.cumsum([row.size for row in rows.values()])
+                values = np.concatenate(list(rows.values())) if rows else np.zeros(0, dtype = self.dtype)
+                np.save(os.path.join(path, f'keys_{k}.npy'), keys)
+                np.save(os.path.join(path, f'offsets_{k}.npy'), offsets)
+                np.save(os.path.join(path, f'values_{k}.npy'), values)
+
+        meta = {
+            "version": FORMAT_VERSION,
+            "backend": self.backend,
+            "dtype": np.dtype(self.dtype).name,
+            "neighbor_actions": self.neighbor_actions,
+            "n_nodes": self.n_nodes,
+            "num_actions": self.num_actions,
+            "num_price_states": self.num_price_states,
+            "initial_low": self.initial_low,
+            "initial_high": self.initial_high,
+        }
+        # meta.json is written last so that a directory with a meta.json is complete
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent = 2)
+
+    @classmethod
+    def load(cls, path: str, graph: nx.DiGraph, mmap_mode: Optional[str] = None) -> 'QTable':
+        """
+        Loads a Q-table saved with save. With mmap_mode='r' the values are memory-mapped read-only, so that
+        many processes evaluating the same table share it through the page cache; mmap_mode='c' maps it
+        copy-on-write for private updates.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        if meta["version"] > FORMAT_VERSION:
+            raise ValueError(f'Q-table format version {meta["version"]} is newer than the supported version {FORMAT_VERSION}')
+        if meta["n_nodes"] != len(graph):
+            raise ValueError(f'Q-table was saved for a graph with {meta["n_nodes"]} nodes, got {len(graph)}')
+
+        kwargs = dict(
+            graph = graph,
+            num_actions = meta["num_actions"],
+            num_price_states = meta["num_price_states"],
+            backend = meta["backend"],
+            dtype = np.dtype(meta["dtype"]).type,
+            neighbor_actions = meta["neighbor_actions"],
+            initial_low = meta["initial_low"],
+            initial_high = meta["initial_high"],
+        )
+
+        if meta["backend"] == 'dense':
+            tables = [np.load(os.path.join(path, f'table_{k}.npy'), mmap_mode = mmap_mode) for k in range(4)]
+            return cls(tables = tables, **kwargs)
+
+        qtable = cls(**kwargs)
+        for k in range(4):
+            keys = np.load(os.path.join(path, f'keys_{k}.npy'))
+            offsets = np.load(os.path.join(path, f'offsets_{k}.npy'))
+            values = np.load(os.path.join(path, f'values_{k}.npy'), mmap_mode = mmap_mode)
+            # rows are views of the (possibly memory-mapped) values
+            qtable.rows[k] = {tuple(key): values[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys.tolist())}
+        return qtable
@@ -0,0 +1,91 @@
+from typing import Optional
+from dataclasses import dataclass
+import numpy as np
+
+RETENTIONS = ['episode', 'ring']
+
+
+@dataclass
+class TrajectoryBuffer:
+    """
+    Preallocated fleet-level store of observations, actions and rewards with shape (capacity, n_drivers, ...).
+    Retention:
+        episode: keeps the steps of the current episode, capacity must be at least the episode length
+        ring: keeps the last capacity steps across episodes, older steps are overwritten
+    Drivers and fleets only record into a buffer when one is given, so no buffer means no cost.
+    """
+    n_drivers: int
+    capacity: int
+    n_features: int = 5
+    retention: str = 'episode'
+
+    def __post_init__(self):
+        if self.retention not in RETENTIONS:
+            raise ValueError(f'Unknown retention {self.retention}')
+
+        self._observations = np.zeros((self.capacity, self.n_drivers, self.n_features), dtype = np.float64)
+        self._actions = np.zeros((self.capacity, self.n_drivers), dtype = np.int64)
+        self._rewards = np.zeros((self.capacity, self.n_drivers), dtype = np.float64)
+        self.clear()
+
+    def clear(self):
+        self.cursor = 0  # total number of steps added since the last clear
+        self.episode_start = 0
+
+    def reset(self):
+        """
+        Marks the start of a new episode, the episode buffer is emptied.
+        """
+        if self.retention == 'episode':
+            self.clear()
+        else:
+            self.episode_start = self.cursor
+
+    def add(self, observations: np.ndarray, actions: np.ndarray):
+        """
+        Records the (n_drivers, n_features) observations of a step and the actions taken on them.
+        """
+        if self.retention == 'episode' and self.cursor == self.capacity:
+            raise IndexError(f'episode is longer than the capacity {self.capacity} of the buffer')
+
+        row = self.cursor % self.capacity
+        self._observations[row] = observations
+        self._actions[row] = actions
+        self._rewards[row] = 0.0
+        self.cursor += 1
+
+    def add_rewards(self, rewards: np.ndarray):
+        """
+        Records the rewards of the last added step.
+        """
+        self._rewards[(self.cursor - 1) % self.capacity] = rewards
+
+    def __len__(self) -> int:
+        return min(self.cursor, self.capacity)
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        # a view of the stored steps in chronological order, a copy once a ring buffer has wrapped around
+        if self.cursor <= self.capacity:
+            return array[:self.cursor]
+        start = self.cursor % self.capacity
+        return np.concatenate([array[start:], array[:start]])
+
+    @property
+    def observations(self) -> np.ndarray:
+        return self._ordered(self._observations)
+
+    @property
+    def actions(self) -> np.ndarray:
+        return self._ordered(self._actions)
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._ordered(self._rewards)
+
+    def episode_rewards(self) -> Optional[np.ndarray]:
+        """
+        Total reward of every driver in the current episode, None if part of the episode was overwritten.
+        """
+        if self.cursor - self.episode_start > self.capacity:
+            return None
+        return self.rewards[len(self) - (self.cursor - self.episode_start):].sum(axis = 0)
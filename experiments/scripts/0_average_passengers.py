@@ -13,13 +13,6 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
-# auxiliary function to get the number of passengers in each node
-def get_passengers_by_node(env):
-    p = np.zeros((len(env.map),))
-    for passenger in env.passengers:
-        p[passenger.position] += 1
-    return p
-
 # initialize environment
 logging.info('Initializing environment')
 num_steps = 10000
@@ -33,8 +26,8 @@ step = 0
 
 while not done:
     logging.info(f'Step: {step}')
-    p = get_passengers_by_node(env)
-    average_passengers[:,step] = p/(step+1)
+    # the environment counts the spawned passengers of every node as they are generated
+    average_passengers[:,step] = env.kpis.spawned_by_node/(step+1)
     observation, rewards, done, info = env.step([0])
     step += 1
 
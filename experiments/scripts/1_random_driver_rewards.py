@@ -19,7 +19,7 @@ logging.basicConfig(
 env = gym.make('ubergym/uber-v0', **kwargs_single_driver)
 G = kwargs_single_driver["graph"]
 n_drivers = kwargs_single_driver["n_drivers"]
-drivers = [RandomDriver.Driver(i, len(G), G, True) for i in range(n_drivers)]
+drivers = [RandomDriver.Driver(i, len(G), G, True, history = True) for i in range(n_drivers)]
 
 # reset and loop through environment
 observations = env.reset()
@@ -1,10 +1,10 @@
-import pickle
 import numpy as np
 import logging, sys
 import gym
 
 from constants import kwargs_single_driver
 import drivers.QLearningDriver as QLearningDriver
+from results import ResultsWriter
 
 # logging config
 logging.basicConfig(
@@ -17,14 +17,20 @@ logging.basicConfig(
 env = gym.make('ubergym/uber-v0', is_logging = False,   **kwargs_single_driver)
 G = kwargs_single_driver["graph"]
 n_drivers = kwargs_single_driver["n_drivers"]
-drivers = [QLearningDriver.Driver(i, len(G), G, True) for i in range(n_drivers)]
+drivers = [QLearningDriver.Driver(i, len(G), G, True, history = True) for i in range(n_drivers)]
 
 # reset and loop through environment
 num_episodes = 100
 
+writer = ResultsWriter("data/qlearning_driver", overwrite = True)
+writer.write_config(0, {"n_drivers": n_drivers, "num_episodes": num_episodes, "n_nodes": len(G)})
+
 for episode in range(num_episodes):
     logging.info(f'Epsiode: {episode}')
     observations = env.reset()
+    # the drivers explore with the agents stream of the environment, fetched again after every reset
+    for driver in drivers:
+        driver.reset(env.rngs["agents"])
 
     done = False
     step = 0
@@ -41,10 +47,16 @@ for episode in range(num_episodes):
             drivers[i].log()
         step += 1
 
-    for i in range(n_drivers):
-        rewards = drivers[i].rewards
-        with open(f"data/qlearning_driver{i}_episode_{episode}_rewards.pkl", "wb") as f:
-            pickle.dump(rewards, f)
+    # rewards of every driver at every step of the episode, one row per (step, driver)
+    rewards = np.array([drivers[i].rewards for i in range(n_drivers)]).T
+    n_steps = len(rewards)
+    writer.extend("rewards",
+        episode = np.full(n_steps * n_drivers, episode, dtype = np.int32),
+        step = np.repeat(np.arange(n_steps, dtype = np.int32), n_drivers),
+        driver = np.tile(np.arange(n_drivers, dtype = np.int32), n_steps),
+        reward = rewards.reshape(-1).astype(np.float64))
 
-    for driver in drivers:
-        driver.reset()
\ No newline at end of file
+writer.close()
+
+for i in range(n_drivers):
+    drivers[i].save(f"data/qlearning_driver{i}_qtable")
\ No newline at end of file
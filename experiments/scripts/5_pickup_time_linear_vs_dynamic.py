@@ -1,9 +1,8 @@
-import pickle
 import numpy as np
 import logging, sys
-import gym
 
-from run import run
+from sweep import sweep, collect
+from results import ResultsWriter
 
 # logging config
 logging.basicConfig(
@@ -15,21 +14,32 @@ logging.basicConfig(
 n_drivers = 5
 STEPS_PER_PASSENGER = np.linspace(.6, 1.2, 13)
 n_episodes = 300
-passenger_waiting_times = []
-def callback(env):
-    global passenger_waiting_times
-    for passenger in env.passengers:
-        if passenger.picked_up_at is not None:
-            passenger_waiting_times.append(passenger.picked_up_at - passenger.spawned_at)
-
-for i in range(len(STEPS_PER_PASSENGER)):
-    steps_per_passenger = STEPS_PER_PASSENGER[i]
-    logging.info(f'Running with {steps_per_passenger = }')
-    passenger_waiting_times = []
-    run(n_drivers = n_drivers, driver_type = 'Accepting', steps_per_passenger=steps_per_passenger, matcher_type='LINEAR_SUM', n_episodes=n_episodes, episode_callbacks=[callback])
-    with open(f"data/linear_sum_passenger_waiting_times_{n_drivers}drivers_{steps_per_passenger}stepsperpassenger.pkl", "wb") as f:
-        pickle.dump(passenger_waiting_times, f)
-    passenger_waiting_times = []
-    run(n_drivers = n_drivers, driver_type = 'Accepting', steps_per_passenger=steps_per_passenger, matcher_type='DYNAMIC', n_episodes=n_episodes, episode_callbacks=[callback])
-    with open(f"data/dynamic_passenger_waiting_times_{n_drivers}drivers_{steps_per_passenger}stepsperpassenger.pkl", "wb") as f:
-        pickle.dump(passenger_waiting_times, f) 
\ No newline at end of file
+SEED = 2002
+
+def passenger_trip_times(env):
+    picked_up = [passenger for passenger in env.passengers if passenger.picked_up_at is not None]
+    waiting_times = np.array([passenger.picked_up_at - passenger.spawned_at for passenger in picked_up])
+    ride_times = np.array([passenger.arrived_at - passenger.picked_up_at if passenger.arrived_at is not None else -1 for passenger in picked_up])
+    return waiting_times, ride_times
+
+if __name__ == '__main__':
+    grid = {
+        'steps_per_passenger': list(STEPS_PER_PASSENGER),
+        'matcher_type': ['LINEAR_SUM', 'DYNAMIC'],
+    }
+
+    def log(results):
+        for config, chunk, episodes in results:
+            logging.info(f'Finished chunk {chunk} of {config}')
+            yield config, chunk, episodes
+
+    results = sweep(grid, n_episodes, seed = SEED, common_scenarios = True, n_drivers = n_drivers, driver_type = 'Accepting', episode_callbacks = [passenger_trip_times])
+    episodes = collect(log(results), key = lambda config: (config['steps_per_passenger'], config['matcher_type']))
+
+    # one run per configuration, trips of every episode are appended to the trips table
+    with ResultsWriter('data/pickup_time_demand', overwrite = True) as writer:
+        for run, ((steps_per_passenger, matcher_type), callback_results) in enumerate(sorted(episodes.items())):
+            writer.write_config(run, {'n_drivers': n_drivers, 'matcher_type': matcher_type, 'steps_per_passenger': steps_per_passenger, 'seed': SEED})
+            for episode, ((waiting_times, ride_times),) in enumerate(callback_results):
+                n = len(waiting_times)
+                writer.extend('trips', run = np.full(n, run, dtype = np.int32), episode = np.full(n, episode, dtype = np.int32), waiting_time = waiting_times.astype(np.int32), ride_time = ride_times.astype(np.int32))
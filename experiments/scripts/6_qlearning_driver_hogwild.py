@@ -0,0 +1,30 @@
+import pickle
+import numpy as np
+import logging, sys
+
+from constants import kwargs_single_driver
+from drivers.hogwild import train
+
+# logging config
+logging.basicConfig(
+    format='%(message)s',
+    stream=sys.stdout,
+    level=logging.INFO,
+)
+
+# same experiment as 3_qlearning_driver.py, with the episodes spread over worker processes sharing one Q-table
+num_episodes = 100
+
+def callback(result):
+    logging.info(f'Worker: {result["worker"]}, Episode: {result["episode"]}, Rewards: {result["rewards"]}')
+
+if __name__ == '__main__':
+    qtable, results = train(
+        dict(is_logging = False, **kwargs_single_driver),
+        n_episodes = num_episodes,
+        checkpoint_path = "data/qlearning_hogwild_qtable",
+        callback = callback)
+
+    results.sort(key = lambda result: result["episode"])
+    with open("data/qlearning_hogwild_rewards.pkl", "wb") as f:
+        pickle.dump(results, f)
@@ -0,0 +1,229 @@
+"""
+Columnar, append-only store for experiment results.
+
+A store is a directory with one sub-directory per table and one sub-directory per column:
+    <root>/configs/<run>.json               run configurations
+    <root>/<table>/schema.json              dtype of every column
+    <root>/<table>/<column>/<chunk>.npy     chunks of chunk_size rows, written once and never modified
+Rows are buffered in memory and written a chunk at a time, and the reader memory-maps the chunks.
+"""
+import json, os, shutil
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+AGGREGATIONS = ['count', 'sum', 'mean', 'min', 'max']
+
+
+class ResultsWriter:
+    def __init__(self, root: str, chunk_size: int = 4096, overwrite: bool = False):
+        """
+        Appends to the store at root if it exists, unless overwrite is set in which case the store is emptied first.
+        """
+        if overwrite and os.path.exists(root):
+            shutil.rmtree(root)
+        self.root = root
+        self.chunk_size = chunk_size
+        self.schemas: Dict[str, Dict[str, str]] = {}
+        self.buffers: Dict[str, Dict[str, List[np.ndarray]]] = {}
+        self.buffered_rows: Dict[str, int] = {}
+        self.next_chunk: Dict[str, int] = {}
+        os.makedirs(self.root, exist_ok = True)
+
+    def __enter__(self) -> 'ResultsWriter':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_config(self, run: int, config: Dict):
+        """
+        Saves the configuration of a run, rows refer to it through a run column.
+        """
+        os.makedirs(os.path.join(self.root, 'configs'), exist_ok = True)
+        with open(os.path.join(self.root, 'configs', f'{run}.json'), 'w') as f:
+            json.dump(config, f, indent = 2, default = lambda value: value.item() if isinstance(value, np.generic) else str(value))
+
+    def _open_table(self, table: str, columns: Dict[str, np.ndarray]):
+        path = os.path.join(self.root, table)
+        schema_path = os.path.join(path, 'schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                schema = json.load(f)
+        else:
+            schema = {name: column.dtype.str for name, column in columns.items()}
+            for name in schema:
+                os.makedirs(os.path.join(path, name), exist_ok = True)
+            with open(schema_path, 'w') as f:
+                json.dump(schema, f, indent = 2)
+
+        self.schemas[table] = schema
+        self.buffers[table] = {name: [] for name in schema}
+        self.buffered_rows[table] = 0
+        # appending continues after the chunks already on disk
+        self.next_chunk[table] = len(os.listdir(os.path.join(path, next(iter(schema)))))
+
+    def append(self, table: str, **columns):
+        """
+        Appends one row, every column is a scalar.
+        """
+        self.extend(table, **{name: np.asarray(value)[None] for name, value in columns.items()})
+
+    def extend(self, table: str, **columns):
+        """
+        Appends many rows at once, every column is an array of the same length.
+        """
+        columns = {name: np.asarray(value) for name, value in columns.items()}
+        if table not in self.schemas:
+            self._open_table(table, columns)
+
+        schema = self.schemas[table]
+        if set(columns) != set(schema):
+            raise ValueError(f'table {table} has columns {sorted(schema)}, got {sorted(columns)}')
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError('all columns should have the same length')
+
+        for name, column in columns.items():
+            self.buffers[table][name].append(column.astype(schema[name], copy = False))
+        self.buffered_rows[table] += lengths.pop()
+
+        while self.buffered_rows[table] >= self.chunk_size:
+            self._write_chunk(table, self.chunk_size)
+
+    def _write_chunk(self, table: str, n_rows: int):
+        chunk = self.next_chunk[table]
+        for name, parts in self.buffers[table].items():
+            column = np.concatenate(parts)
+            np.save(os.path.join(self.root, table, name, f'{chunk:08d}.npy'), column[:n_rows])
+            self.buffers[table][name] = [column[n_rows:]]
+        self.buffered_rows[table] -= n_rows
+        self.next_chunk[table] += 1
+
+    def flush(self):
+        """
+        Writes the buffered rows of every table as a (possibly smaller) chunk.
+        """
+        for table in self.schemas:
+            if self.buffered_rows[table] > 0:
+                self._write_chunk(table, self.buffered_rows[table])
+
+    def close(self):
+        self.flush()
+
+
+class ResultsReader:
+    def __init__(self, root: str, mmap_mode: Optional[str] = 'r'):
+        self.root = root
+        self.mmap_mode = mmap_mode
+
+    def tables(self) -> List[str]:
+        return sorted(table for table in os.listdir(self.root) if os.path.exists(os.path.join(self.root, table, 'schema.json')))
+
+    def schema(self, table: str) -> Dict[str, str]:
+        with open(os.path.join(self.root, table, 'schema.json')) as f:
+            return json.load(f)
+
+    def config(self, run: int) -> Dict:
+        with open(os.path.join(self.root, 'configs', f'{run}.json')) as f:
+            return json.load(f)
+
+    def configs(self) -> Dict[int, Dict]:
+        path = os.path.join(self.root, 'configs')
+        if not os.path.exists(path):
+            return {}
+        return {int(name[:-len('.json')]): self.config(int(name[:-len('.json')])) for name in os.listdir(path) if name.endswith('.json')}
+
+    def chunks(self, table: str, columns: Optional[Sequence[str]] = None, where: Optional[Callable[[Dict[str, np.ndarray]], np.ndarray]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Streams a table chunk by chunk. where takes the columns of a chunk and returns a boolean mask of the rows to keep.
+        Without where the columns are memory-mapped views of the files.
+        """
+        schema = self.schema(table)
+        columns = list(schema) if columns is None else list(columns)
+        names = sorted(os.listdir(os.path.join(self.root, table, next(iter(schema)))))
+
+        for name in names:
+            loaded: Dict[str, np.ndarray] = {}
+
+            def column(c: str) -> np.ndarray:
+                if c not in loaded:
+                    loaded[c] = np.load(os.path.join(self.root, table, c, name), mmap_mode = self.mmap_mode)
+                return loaded[c]
+
+            if where is None:
+                yield {c: column(c) for c in columns}
+                continue
+
+            # the filter may use columns that are not read
+            mask = where(_LazyColumns(column))
+            if mask.any():
+                yield {c: column(c)[mask] for c in columns}
+
+    def read(self, table: str, columns: Optional[Sequence[str]] = None, where: Optional[Callable[[Dict[str, np.ndarray]], np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        Reads the selected rows and columns of a table into memory.
+        """
+        columns = list(self.schema(table)) if columns is None else list(columns)
+        parts: Dict[str, List[np.ndarray]] = {c: [] for c in columns}
+        for chunk in self.chunks(table, columns, where):
+            for c in columns:
+                parts[c].append(np.asarray(chunk[c]))
+        schema = self.schema(table)
+        return {c: np.concatenate(parts[c]) if parts[c] else np.zeros(0, dtype = schema[c]) for c in columns}
+
+    def aggregate(self, table: str, column: str, by: Sequence[str] = (), how: str = 'mean', where: Optional[Callable[[Dict[str, np.ndarray]], np.ndarray]] = None) -> Dict[Tuple, float]:
+        """
+        Streaming group-by aggregation of one column, grouped by the values of the columns in by.
+        """
+        if how not in AGGREGATIONS:
+            raise ValueError(f'Unknown aggregation {how}')
+
+        by = list(by)
+        counts: Dict[Tuple, int] = {}
+        values: Dict[Tuple, float] = {}
+        for chunk in self.chunks(table, by + [column], where):
+            data = np.asarray(chunk[column], dtype = np.float64)
+            if by:
+                keys, inverse = np.unique(np.stack([chunk[c] for c in by], axis = 1), axis = 0, return_inverse = True)
+                inverse = inverse.reshape(-1)
+            else:
+                keys, inverse = np.zeros((1, 0)), np.zeros(len(data), dtype = np.int64)
+
+            chunk_counts = np.bincount(inverse, minlength = len(keys))
+            if how in ['sum', 'mean']:
+                chunk_values = np.bincount(inverse, weights = data, minlength = len(keys))
+            elif how == 'min':
+                chunk_values = np.full(len(keys), np.inf)
+                np.minimum.at(chunk_values, inverse, data)
+            elif how == 'max':
+                chunk_values = np.full(len(keys), -np.inf)
+                np.maximum.at(chunk_values, inverse, data)
+            else:
+                chunk_values = chunk_counts.astype(np.float64)
+
+            for key, count, value in zip(map(tuple, keys.tolist()), chunk_counts, chunk_values):
+                if count == 0:
+                    continue
+                if key not in counts:
+                    counts[key], values[key] = 0, value
+                elif how in ['sum', 'mean', 'count']:
+                    values[key] += value
+                elif how == 'min':
+                    values[key] = min(values[key], value)
+                else:
+                    values[key] = max(values[key], value)
+                counts[key] += int(count)
+
+        if how == 'mean':
+            return {key: values[key] / counts[key] for key in values}
+        return {key: float(values[key]) for key in values}
+
+
+class _LazyColumns(dict):
+    # columns of a chunk that are only loaded when a filter asks for them
+    def __init__(self, load: Callable[[str], np.ndarray]):
+        super().__init__()
+        self.load = load
+
+    def __missing__(self, key: str) -> np.ndarray:
+        return self.load(key)
@@ -1,61 +1,101 @@
 import pickle
-from typing import Callable, List
+from typing import Callable, List, Optional
 import numpy as np
-import logging, sys
 import gym
+import networkx as nx
 
+import ubergym
 import drivers.AcceptingDriver as AcceptingDriver
 import drivers.RandomDriver as RandomDriver
+from drivers.trajectory import TrajectoryBuffer
+from ubergym.envs.scenarios import ScenarioBank
+import ubergym.envs.constants as constants
 
-# logging config
-logging.basicConfig(
-    format='%(message)s',
-    filename='logs.log',
-    level=logging.INFO,
-)
+# ubergym/uber-v0 is registered by the gym.envs entry point of the installed package, or here when ubergym was
+# imported before gym from a source tree
+ubergym.register_envs()
 
 
-def run(n_drivers, driver_type, steps_per_passenger, matcher_type, n_episodes, driver_logging = False, simulation_logging = False, episode_callbacks: List[Callable] = []):
+def run(n_drivers, driver_type, steps_per_passenger, matcher_type, n_episodes, driver_logging = False, simulation_logging = False, episode_callbacks: List[Callable] = [], matcher_cache_size = 0, seed = None, demand_seed = None, scenario_seed = None, trajectory: Optional[TrajectoryBuffer] = None, graph: Optional[nx.DiGraph] = None):
+    """
+    Runs n_episodes episodes and returns, for every episode, the list of the return values of the episode callbacks.
+    seed seeds the environment and the drivers, demand_seed the passenger generation probabilities, so that
+    runs with different parameters can share the same demand profile.
+    With scenario_seed, the passengers and initial driver positions of the episodes are pre-sampled into a ScenarioBank
+    from that seed, so that runs with the same scenario_seed replay the same episodes (common random numbers).
+    matcher_cache_size > 0 opts in to the node-level cache of the matcher assignments, see Matcher.cache_size.
+    With a trajectory buffer of n_drivers drivers, the observations, actions and rewards of the fleet are recorded into it,
+    e.g. a ring buffer keeps the last steps of a long run in bounded memory.
+    graph is the road network, by default the one of ../generate_graph/graph.pkl.
+    """
 
-    with open("../generate_graph/graph.pkl", "rb") as f:
-        G = pickle.load(f)
-    passenger_generation_probabilities = np.random.random(size = len(G))/(steps_per_passenger*len(G)) 
+    if graph is None:
+        with open("../generate_graph/graph.pkl", "rb") as f:
+            graph = pickle.load(f)
+    G = graph
+    # without demand_seed, the demand profile follows seed
+    demand_rng = np.random.default_rng(seed if demand_seed is None else demand_seed)
+    passenger_generation_probabilities = demand_rng.random(size = len(G))/(steps_per_passenger*len(G))
+
+    scenarios = None
+    if scenario_seed is not None:
+        scenarios = ScenarioBank.generate(n_episodes, passenger_generation_probabilities, n_drivers, constants.simulation["num_steps"], seed = scenario_seed)
 
     env = gym.make('ubergym/uber-v0', 
         n_drivers = n_drivers, 
         passenger_generation_probabilities = passenger_generation_probabilities,
         graph = G,
         matcher_type = matcher_type,
-        is_logging = simulation_logging)
+        is_logging = simulation_logging,
+        matcher_cache_size = matcher_cache_size,
+        seed = seed,
+        scenarios = scenarios)
 
+    # without driver logging, the batched policies act for the whole fleet at once
     if driver_type == 'Accepting':
-        drivers = [AcceptingDriver.Driver(i, len(G), G, driver_logging) for i in range(n_drivers)]
+        drivers = [AcceptingDriver.Driver(i, len(G), G, driver_logging) for i in range(n_drivers)] if driver_logging else []
+        policy = AcceptingDriver.Policy(G)
     elif driver_type == 'Random':
-        drivers = [RandomDriver.Driver(i, len(G), G, driver_logging) for i in range(n_drivers)]
+        drivers = [RandomDriver.Driver(i, len(G), G, driver_logging) for i in range(n_drivers)] if driver_logging else []
+        policy = RandomDriver.Policy(len(G))
 
+    results = []
     for episode in range(n_episodes):
         # logging.info(f'Episode: {episode}')
         # reset and loop through environment
-        observations = env.reset()
+        observations = env.reset(options = None if scenarios is None else {"scenario": episode})
+        # the agents draw from the agents stream of the environment, fetched after the reset which may replace it
+        if driver_type == 'Random':
+            policy.reset(env.rngs["agents"])
+            for driver in drivers:
+                driver.reset(env.rngs["agents"])
+        if trajectory is not None:
+            trajectory.reset()
         done = False
         step = 0
 
         while not done:
             #logging.info(f'Step: {step}')
             vectorized_observations = np.array(list(observations.values()))
-            actions = [drivers[i].action(vectorized_observations[:,i]) for i in range(n_drivers)]
-            for driver in drivers:
-                driver.log()
+            if not driver_logging:
+                actions = policy.act_batch(vectorized_observations.T)
+            else:
+                actions = [drivers[i].action(vectorized_observations[:,i]) for i in range(n_drivers)]
+                for driver in drivers:
+                    driver.log()
+            if trajectory is not None:
+                trajectory.add(vectorized_observations.T, actions)
             observations, rewards, done, info = env.step(actions)
-            for i in range(n_drivers):
+            if trajectory is not None:
+                trajectory.add_rewards(rewards)
+            for i in range(len(drivers)):
                 drivers[i].add_reward(rewards[i])
                 drivers[i].log()
             step += 1
         
-        for f in episode_callbacks:
-            f(env)
+        results.append([f(env) for f in episode_callbacks])
 
-    return
+    return results
         
 
 
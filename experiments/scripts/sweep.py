@@ -0,0 +1,74 @@
+import itertools
+import multiprocessing as mp
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from run import run
+
+
+def task_seed(seed: int, *key: int) -> int:
+    """
+    Seed of a task derived from the root seed and the position of the task in the sweep,
+    so that it does not depend on the number of workers or on the order in which tasks run.
+    """
+    return int(np.random.SeedSequence(seed, spawn_key = key).generate_state(1)[0])
+
+
+class SweepTask(NamedTuple):
+    config: Dict
+    chunk: int
+    n_episodes: int
+    seed: int
+    scenario_seed: Optional[int]
+    kwargs: Dict
+
+
+def _run_task(task: SweepTask) -> Tuple[Dict, int, List]:
+    results = run(n_episodes = task.n_episodes, seed = task.seed, scenario_seed = task.scenario_seed, **task.config, **task.kwargs)
+    return task.config, task.chunk, results
+
+
+def sweep(
+    grid: Dict[str, List],
+    n_episodes: int,
+    episodes_per_task: int = 10,
+    n_workers: Optional[int] = None,
+    seed: int = 0,
+    common_scenarios: bool = False,
+    **kwargs) -> Iterator[Tuple[Dict, int, List]]:
+    """
+    Runs n_episodes episodes for every combination of the parameters in grid on a process pool.
+    The episodes of a configuration are split in chunks of episodes_per_task, and every chunk is one task with
+    its own seed derived from seed, the index of the configuration and the index of the chunk.
+    All configurations share the demand profile derived from seed, which pairs them.
+    With common_scenarios, chunk c of every configuration also replays the same pre-sampled passengers and initial
+    driver positions (see ScenarioBank), which pairs the episodes themselves.
+    Yields (config, chunk, results) as tasks finish, results being the return value of run.
+    kwargs are passed to run, e.g. driver_type or episode_callbacks (which must be picklable).
+    """
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*[grid[key] for key in keys])]
+    kwargs.setdefault("demand_seed", task_seed(seed))
+
+    tasks = []
+    for config_index, config in enumerate(configs):
+        for chunk, start in enumerate(range(0, n_episodes, episodes_per_task)):
+            n = min(episodes_per_task, n_episodes - start)
+            # the key (len(configs), chunk) is shared by all configurations and differs from the keys of their own seeds
+            scenario_seed = task_seed(seed, len(configs), chunk) if common_scenarios else None
+            tasks.append(SweepTask(config, chunk, n, task_seed(seed, config_index, chunk), scenario_seed, kwargs))
+
+    with mp.Pool(n_workers) as pool:
+        for result in pool.imap_unordered(_run_task, tasks):
+            yield result
+
+
+def collect(results: Iterator[Tuple[Dict, int, List]], key: Callable[[Dict], Tuple]) -> Dict[Tuple, List]:
+    """
+    Aggregates streamed sweep results by key(config), ordering the episodes by chunk so that the aggregate
+    does not depend on the order in which the tasks finished.
+    """
+    chunks: Dict[Tuple, Dict[int, List]] = {}
+    for config, chunk, episodes in results:
+        chunks.setdefault(key(config), {})[chunk] = episodes
+    return {k: [episode for chunk in sorted(v) for episode in v[chunk]] for k, v in chunks.items()}
@@ -11,4 +11,6 @@ setuptools.setup(name='ubergym',
     install_requires=install_requires,
     packages=setuptools.find_packages(),
     include_package_data=True,
+    # gym registers the environments when it is imported, see ubergym.register_envs
+    entry_points={'gym.envs': ['__root__ = ubergym:register_envs']},
 )
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os, sys
+
+import networkx as nx
+import pytest
+
+# the drivers and experiments packages are imported from the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def caveman() -> nx.DiGraph:
+    """
+    4 cliques of 4 nodes with edges of weight 5, small enough for the restricted Gurobi license.
+    """
+    graph = nx.connected_caveman_graph(4, 4).to_directed()
+    nx.set_edge_attributes(graph, 5, "weight")
+    return graph
+
+
+@pytest.fixture
+def path_graph() -> nx.DiGraph:
+    """
+    0 - 1 - 2 - 3 - 4, so that most pairs of nodes are not neighbors.
+    """
+    graph = nx.path_graph(5).to_directed()
+    nx.set_edge_attributes(graph, 1, "weight")
+    return graph
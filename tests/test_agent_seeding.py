@@ -0,0 +1,62 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+import drivers.QLearningDriver as QLearningDriver
+import drivers.QLearningFleet as QLearningFleet
+
+
+def run_drivers(graph, seed: int, episodes: int = 2):
+    env = Uber(3, np.full(16, 0.05), graph, num_steps = 40, is_logging = False)
+    env.reset(seed = seed)
+    # the initial Q-values also come from the agents stream
+    drivers = [QLearningDriver.Driver(i, len(graph), graph, seed = env.rngs["agents"]) for i in range(3)]
+    actions = []
+    for _ in range(episodes):
+        observations = env.reset(seed = seed)
+        for driver in drivers:
+            driver.reset(env.rngs["agents"])
+        done = False
+        while not done:
+            vectorized_observations = np.array(list(observations.values()))
+            step_actions = [drivers[i].action(vectorized_observations[:, i]) for i in range(3)]
+            actions.append(step_actions)
+            observations, rewards, done, info = env.step(step_actions)
+            for i in range(3):
+                drivers[i].add_reward(rewards[i])
+    return np.array(actions), drivers
+
+
+def test_drivers_follow_the_agents_stream_of_the_env(monkeypatch, caveman):
+    # exploration does not touch the global random state
+    monkeypatch.setattr(np.random, "random", None)
+    monkeypatch.setattr(np.random, "randint", None)
+    first, _ = run_drivers(caveman, 0)
+    second, _ = run_drivers(caveman, 0)
+    assert np.array_equal(first, second)
+    assert not np.array_equal(first, run_drivers(caveman, 1)[0])
+
+
+def test_reset_replaces_the_generator(caveman):
+    graph = caveman
+    env = Uber(3, np.full(16, 0.05), graph, num_steps = 40, is_logging = False)
+    env.reset(seed = 0)
+    fleet = QLearningFleet.Fleet(3, len(graph), graph, seed = env.rngs["agents"])
+    driver = QLearningDriver.Driver(0, len(graph), graph, seed = env.rngs["agents"])
+    assert fleet.rng is env.rngs["agents"] and driver.rng is env.rngs["agents"]
+
+    env.reset(seed = 1)
+    fleet.reset(env.rngs["agents"])
+    driver.reset(env.rngs["agents"])
+    assert fleet.rng is env.rngs["agents"] and driver.rng is env.rngs["agents"]
+
+
+def test_reset_reseeds_the_streams_of_the_env_only(caveman):
+    env = Uber(3, np.full(16, 0.05), caveman, num_steps = 40, seed = 0, is_logging = False)
+    state = np.random.get_state()[1].copy()
+    observations = env.reset(seed = 1)
+    # the global random state is left alone, and the streams only depend on the seed of the reset
+    assert np.array_equal(np.random.get_state()[1], state)
+    fresh = Uber(3, np.full(16, 0.05), caveman, num_steps = 40, seed = 1, is_logging = False)
+    assert all(np.array_equal(a, b) for a, b in zip(observations.values(), fresh.reset(seed = 1).values()))
+    for name in Uber.random_streams:
+        assert env.rngs[name].integers(1 << 30) == fresh.rngs[name].integers(1 << 30)
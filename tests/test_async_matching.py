@@ -0,0 +1,32 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Driver, Passenger
+from drivers import AcceptingDriver
+
+
+def run(graph, async_matching: bool):
+    env = Uber(4, np.full(16, 0.1), graph, num_steps = 60, seed = 0, is_logging = False, async_matching = async_matching)
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = 0)
+    requests = []
+    done = False
+    while not done:
+        idle = {i for i, d in enumerate(env.drivers) if d.status == Driver.Status.IDLE}
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        for i, d in enumerate(env.drivers):
+            if d.status == Driver.Status.MATCHING:
+                p = env.passengers[d.match_request.passenger]
+                assert p.status == Passenger.Status.MATCHING
+                if i in idle:
+                    requests.append(p.spawned_at == env.step_count)
+    env.close()
+    return requests
+
+
+def test_async_matching_is_applied_on_the_next_step(caveman):
+    # synchronous matching can match the passengers spawned on the step, asynchronous matching is computed at the
+    # end of the previous step and applied at the start of this one, so it never does
+    assert any(run(caveman, False))
+    requests = run(caveman, True)
+    assert len(requests) > 0 and not any(requests)
@@ -0,0 +1,44 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ubergym.envs.demand import TRIP_DTYPE, TripDemand, convert_trips
+
+
+@pytest.mark.parametrize("extension", ["csv", "jsonl"])
+def test_convert_trips_round_trip(tmp_path, extension):
+    rows = [(5.0, 1, 2), (1.0, 0, 3), (3.0, 2, 0), (3.0, 3, 1), (9.5, 1, 0)]
+    source = tmp_path / f"trips.{extension}"
+    with open(source, "w") as f:
+        if extension == "csv":
+            f.write("time,origin,destination\n")
+            f.writelines(f"{t},{o},{d}\n" for t, o, d in rows)
+        else:
+            f.writelines(json.dumps({"time": t, "origin": o, "destination": d}) + "\n" for t, o, d in rows)
+
+    path = str(tmp_path / "trips.npy")
+    # small chunks so that the log is read and sorted in several pieces
+    assert convert_trips(str(source), path, n_nodes = 4, chunk_size = 2) == len(rows)
+    assert not os.path.exists(path + ".raw")
+
+    demand = TripDemand.load(path, validate = True)
+    expected = np.array(sorted(rows, key = lambda row: row[0]), dtype = TRIP_DTYPE)
+    assert np.array_equal(demand.trips, expected)
+
+    # replayed in steps of 2 time units, every trip spawns once at the first step at or after its time
+    spawned = []
+    for time in range(0, 12, 2):
+        origins, destinations = demand.arrivals(time)
+        spawned.extend(zip(origins.tolist(), destinations.tolist()))
+    assert spawned == [(o, d) for _, o, d in expected.tolist()]
+    demand.rewind()
+    assert len(demand.arrivals(100)[0]) == len(rows)
+
+
+def test_convert_trips_checks_the_nodes(tmp_path):
+    source = tmp_path / "trips.csv"
+    source.write_text("time,origin,destination\n0,0,7\n")
+    with pytest.raises(ValueError):
+        convert_trips(str(source), str(tmp_path / "trips.npy"), n_nodes = 4)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import drivers.QLearningFleet as QLearningFleet
+
+
+def idle(positions):
+    observations = np.zeros((len(positions), 5))
+    observations[:, 1] = positions
+    return observations
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_td_update_of_idle_drivers(path_graph, shared):
+    fleet = QLearningFleet.Fleet(2, 5, path_graph, shared = shared, epsilon = 0.0, lr = 0.5, seed = 0)
+    rewards = np.array([1.0, 3.0])
+    actions = fleet.act_batch(idle([2, 2]))
+    fleet.add_rewards(rewards)
+    before = [table.copy() for table in fleet.tables]
+
+    fleet.act_batch(idle(actions))
+    expected = before[0].copy()
+    for i in range(2):
+        table, action = fleet.table_index[i], actions[i]
+        qcurr = before[0][table, 2, action]
+        expected[table, 2, action] += 0.5 * (rewards[i] + before[0][table, action].max() - qcurr)
+    assert np.allclose(fleet.tables[0], expected)
+    assert all(np.array_equal(a, b) for a, b in zip(fleet.tables[1:], before[1:]))
+    if shared:
+        # both drivers in the same state took the same greedy action, and their updates accumulated on one entry
+        assert actions[0] == actions[1]
+        assert (fleet.tables[0] != before[0]).sum() == 1
+
+
+def test_no_update_across_statuses_without_table(path_graph):
+    fleet = QLearningFleet.Fleet(1, 5, path_graph, epsilon = 0.0, seed = 0)
+    fleet.act_batch(idle([2]))
+    fleet.add_rewards(np.array([5.0]))
+    before = [table.copy() for table in fleet.tables]
+    # OFF (status 4) has no table: the driver waits in place and nothing is learned
+    off = idle([2])
+    off[0, 0] = 4
+    assert fleet.act_batch(off).tolist() == [2]
+    fleet.add_rewards(np.array([5.0]))
+    fleet.act_batch(idle([2]))
+    assert all(np.array_equal(a, b) for a, b in zip(fleet.tables, before))
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_exploration_only_picks_allowed_actions(path_graph, shared):
+    fleet = QLearningFleet.Fleet(50, 5, path_graph, shared = shared, epsilon = 1.0, seed = 0)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        observations = np.zeros((50, 5))
+        observations[:, 0] = rng.integers(0, 2, 50)
+        observations[:, 1:4] = rng.integers(0, 5, (50, 3))
+        observations[:, 4] = rng.uniform(0, 200, 50)
+        actions = fleet.act_batch(observations)
+        fleet.add_rewards(rng.random(50))
+
+        status, position = observations[:, 0].astype(int), observations[:, 1].astype(int)
+        assert fleet.allowed[position[status == 0], actions[status == 0]].all()
+        assert np.isin(actions[status == 1], [0, 1]).all()
+    assert not any(np.isnan(table).any() for table in fleet.tables)
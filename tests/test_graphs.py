@@ -0,0 +1,26 @@
+import networkx as nx
+import numpy as np
+
+from ubergym.envs import graphs
+
+
+def test_components_match_networkx():
+    # a small radius gives many components, including isolated nodes
+    graph = graphs.random_geometric(500, 0.03, seed = 0, largest_component = False)
+    labels, sizes = graphs._components(graph)
+    components = list(nx.connected_components(graph.to_networkx().to_undirected()))
+
+    assert len(sizes) == len(components)
+    assert sorted(sizes.tolist()) == sorted(len(component) for component in components)
+    for component in components:
+        assert len({labels[node] for node in component}) == 1
+
+
+def test_largest_component_is_kept():
+    full = graphs.random_geometric(500, 0.05, seed = 1, largest_component = False)
+    largest = graphs.random_geometric(500, 0.05, seed = 1)
+    expected = max(nx.connected_components(full.to_networkx().to_undirected()), key = len)
+
+    assert largest.n_nodes == len(expected)
+    assert largest.is_strongly_connected()
+    assert np.array_equal(largest.coords, full.coords[sorted(expected)])
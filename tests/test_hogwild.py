@@ -0,0 +1,20 @@
+import numpy as np
+
+from drivers.hogwild import train
+
+
+def worker_rewards(caveman, seed):
+    env_kwargs = dict(n_drivers = 3, passenger_generation_probabilities = np.full(16, 0.05), graph = caveman, num_steps = 40, is_logging = False)
+    # with epsilon = 1 the actions do not depend on the values written by the other worker
+    _, results = train(env_kwargs, n_episodes = 4, n_workers = 2, driver_kwargs = dict(epsilon = 1.0), seed = seed)
+    rewards = {}
+    for result in sorted(results, key = lambda result: result["episode"]):
+        rewards.setdefault(result["worker"], []).append(result["rewards"])
+    return rewards
+
+
+def test_workers_have_their_own_reproducible_seeds(caveman):
+    rewards = worker_rewards(caveman, 0)
+    assert rewards[0] != rewards[1]
+    assert rewards == worker_rewards(caveman, 0)
+    assert rewards != worker_rewards(caveman, 1)
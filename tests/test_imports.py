@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code: str):
+    return subprocess.run([sys.executable, "-c", code], cwd = ROOT, capture_output = True, text = True)
+
+
+def test_graphs_and_scenarios_do_not_import_the_simulator():
+    result = run(
+        "import sys, ubergym.envs.graphs, ubergym.envs.scenarios, ubergym.server\n"
+        "print(sorted({'gym', 'networkx', 'methodtools', 'gurobipy', 'ubergym.envs.uber'} & set(sys.modules)))"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_uber_is_registered_when_gym_is_imported_first():
+    result = run(
+        "import gym, ubergym\n"
+        "from gym.envs.registration import registry\n"
+        "from ubergym.envs import Uber\n"
+        "ubergym.register_envs()\n"
+        "print(registry.spec(ubergym.ENV_ID).entry_point, Uber.__name__)"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "ubergym.envs:Uber Uber"
@@ -0,0 +1,35 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Driver, Passenger
+from ubergym.envs.patience import Patience
+from drivers import AcceptingDriver
+
+
+def test_kpis_match_the_state_of_the_episode(caveman):
+    graph = caveman
+    env = Uber(6, np.full(16, 0.05), graph, num_steps = 100, seed = 0, is_logging = False, patience = Patience(20, 'exponential'))
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = 0)
+    done = False
+    while not done:
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+
+        waiting = np.zeros(16, dtype = np.int64)
+        for p in env.passengers:
+            if p.status in [Passenger.Status.WAITING, Passenger.Status.MATCHING, Passenger.Status.MATCHED]:
+                waiting[p.position] += 1
+        assert (env.kpis.waiting.counts == waiting).all()
+        assert (env.kpis.drivers.counts == np.bincount([d.status.value for d in env.drivers], minlength = len(Driver.Status))).all()
+
+    arrived = [p for p in env.passengers if p.status == Passenger.Status.ARRIVED]
+    kpis = env.kpis.export()
+    assert kpis["arrived"] == len(arrived)
+    assert np.isclose(kpis["ride_time"]["mean"], np.mean([p.arrived_at - p.picked_up_at for p in arrived]))
+    assert kpis["abandoned"] == sum(p.status == Passenger.Status.ABANDONED for p in env.passengers)
+    assert kpis["spawned_by_node"].sum() == len(env.passengers)
+
+    # the info of the last step only has scalars
+    summary = info["kpis"]
+    assert summary["arrived"] == len(arrived)
+    assert all(not isinstance(value, np.ndarray) for value in summary.values())
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.matcher import Matcher
+from ubergym.envs.actors import Driver, Passenger
+from drivers import AcceptingDriver
+
+
+def total_cost(pairs, env):
+    return sum(env.map.distance(env.drivers[driver].position, env.passengers[passenger].position) for passenger, driver in pairs)
+
+
+@pytest.mark.parametrize("method", ["LINEAR_SUM", "LEXICOGRAPHIC_MINMAX"])
+def test_cached_and_uncached_assignments_have_the_same_cost(method, caveman):
+    graph = caveman
+    env = Uber(5, np.full(16, 0.05), graph, matcher_type = method, num_steps = 80, seed = 0, is_logging = False)
+    uncached = Matcher(method, 4.0, 0.0)
+    cached = Matcher(method, 4.0, 0.0, cache_size = 64)
+    policy = AcceptingDriver.Policy(graph)
+
+    observations = env.reset(seed = 0)
+    done = False
+    while not done:
+        waiting = [i for i, p in enumerate(env.passengers) if p.status == Passenger.Status.WAITING]
+        idle = [j for j, d in enumerate(env.drivers) if d.status == Driver.Status.IDLE]
+        expected = uncached._assign(waiting, idle, [], env.drivers, env.passengers, env.map)
+        # the second call on the same state is served from the cache
+        for _ in range(2):
+            pairs = cached._assign(waiting, idle, [], env.drivers, env.passengers, env.map)
+            assert len(pairs) == len(expected)
+            assert total_cost(pairs, env) == total_cost(expected, env)
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+
+    assert cached.cache_hits > 0
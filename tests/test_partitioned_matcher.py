@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Driver, Passenger
+from ubergym.envs.pricing import SurgePricing
+from ubergym.envs.schedule import MatchingSchedule
+from ubergym.envs.partitioned_matcher import PartitionedMatcher
+from drivers import AcceptingDriver
+
+
+def total_cost(pairs, env):
+    return sum(env.map.distance(env.drivers[driver].position, env.passengers[passenger].position) for passenger, driver in pairs)
+
+
+def total_reward(graph, seed):
+    matcher = PartitionedMatcher('LINEAR_SUM', 4.0, 0.2, zones = np.arange(16) // 4, executor = 'thread')
+    env = Uber(6, np.full(16, 0.05), graph, num_steps = 60, seed = seed, is_logging = False, matcher = matcher)
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = seed)
+    total, done = 0.0, False
+    while not done:
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        total += rewards.sum()
+    env.close()
+    return total
+
+
+def test_given_matcher_uses_the_pricer_of_the_environment(caveman):
+    matcher = PartitionedMatcher('LINEAR_SUM', 0.0, 0.0, executor = 'thread')
+    env = Uber(2, np.full(16, 0.05), caveman, seed = 0, is_logging = False, matcher = matcher, pricing_models = [SurgePricing()], matcher_cache_size = 16)
+    assert matcher.pricer is env.pricer
+    assert isinstance(env.pricer.models[-1], SurgePricing)
+    assert matcher.cache_size == 16
+    env.close()
+
+
+def test_partitioned_matcher_is_reproducible(caveman):
+    assert total_reward(caveman, 3) == total_reward(caveman, 3)
+
+
+def test_zone_solves_share_the_cache_and_the_solver_status(caveman):
+    # the environment never matches, so that the passengers wait and the drivers stay idle
+    env = Uber(6, np.full(16, 0.02), caveman, num_steps = 30, seed = 0, is_logging = False, matching_schedule = MatchingSchedule(every = 1000))
+    uncached = PartitionedMatcher('LINEAR_SUM', 4.0, 0.0, zones = np.arange(16) // 4, executor = 'thread')
+    cached = PartitionedMatcher('LINEAR_SUM', 4.0, 0.0, zones = np.arange(16) // 4, executor = 'thread', cache_size = 64)
+    solve_zones, minimize_costs = cached._solve_zones, cached.minimize_costs
+    policy = AcceptingDriver.Policy(caveman)
+    observations = env.reset(seed = 0)
+    done = False
+    while not done:
+        waiting = [i for i, p in enumerate(env.passengers) if p.status == Passenger.Status.WAITING]
+        idle = [j for j, d in enumerate(env.drivers) if d.status == Driver.Status.IDLE]
+        expected = uncached._assign(waiting, idle, [], env.drivers, env.passengers, env.map)
+        pairs = cached._assign(waiting, idle, [], env.drivers, env.passengers, env.map)
+        # the second call on the same state is served from the cache, by the zones and the reconciliation pass alike
+        cached._solve_zones = lambda costs: [] if len(costs) == 0 else pytest.fail("zone solved again")
+        cached.minimize_costs = lambda costs: pytest.fail("leftovers solved again")
+        assert cached._assign(waiting, idle, [], env.drivers, env.passengers, env.map) == pairs
+        cached._solve_zones, cached.minimize_costs = solve_zones, minimize_costs
+        assert len(pairs) == len(expected)
+        assert total_cost(pairs, env) == total_cost(expected, env)
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+    env.close()
+    assert cached.cache_hits > 0
+
+    # the status of a zone solved in the pool reaches the matcher
+    matcher = PartitionedMatcher('LINEAR_SUM', 4.0, 0.0, executor = 'thread')
+    assert matcher._solve_zones([np.ones((2, 2))])[0] is not None
+    assert matcher.solver_status == 2  # GRB.OPTIMAL
+    for m in [uncached, cached, matcher]:
+        m.close()
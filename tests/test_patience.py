@@ -0,0 +1,39 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Driver, Passenger
+from ubergym.envs.patience import Patience
+
+
+def test_passengers_abandon_after_their_patience_unless_a_request_is_pending(caveman):
+    max_wait = 10
+    env = Uber(3, np.full(16, 0.05), caveman, num_steps = 100, seed = 0, is_logging = False, patience = Patience(max_wait))
+    observations = env.reset(seed = 0)
+
+    pending = np.zeros(3, dtype = np.int64)
+    requested = {}
+    retried = 0
+    done = False
+    while not done:
+        # match requests stay pending (invalid answer) for 4 steps, longer than the patience, then are rejected
+        matching = observations["state"] == Driver.Status.MATCHING.value
+        pending = np.where(matching, pending + 1, 0)
+        actions = np.where(matching, np.where(pending < 4, 2, 0), observations["position"])
+        for i in np.flatnonzero(matching).tolist():
+            requested[i] = env.drivers[i].match_request.passenger
+        observations, rewards, done, info = env.step(actions)
+
+        for name, p in enumerate(env.passengers):
+            deadline = p.spawned_at + max_wait
+            if p.status == Passenger.Status.WAITING:
+                assert deadline >= env.step_count
+            elif p.status == Passenger.Status.MATCHING and deadline < env.step_count:
+                retried += 1
+            elif p.status == Passenger.Status.ABANDONED:
+                assert p.abandoned_at > deadline
+
+    # passengers whose deadline passed while their request was pending abandoned once it was rejected
+    rejected = set(requested.values())
+    assert retried > 0
+    assert any(env.passengers[name].status == Passenger.Status.ABANDONED for name in rejected)
+    assert env.abandoned_passengers == sum(p.status == Passenger.Status.ABANDONED for p in env.passengers)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.shifts import StochasticShifts
+from drivers import AcceptingDriver, RandomDriver
+
+
+def test_accepting_policy_acts_like_the_drivers(caveman):
+    # shifts so that OFF drivers are covered too
+    env = Uber(6, np.full(16, 0.1), caveman, num_steps = 80, seed = 0, is_logging = False, shifts = StochasticShifts(0.1, 0.1))
+    policy = AcceptingDriver.Policy(caveman)
+    drivers = [AcceptingDriver.Driver(i, len(caveman), caveman) for i in range(6)]
+    observations = env.reset(seed = 0)
+    statuses = set()
+    done = False
+    while not done:
+        vectorized_observations = np.array(list(observations.values()))
+        actions = policy.act_batch(vectorized_observations.T)
+        for i, observation in enumerate(vectorized_observations.T.astype(np.int64)):
+            action = drivers[i].action(vectorized_observations[:, i])
+            status, position, p_destination, p_position = observation[:4]
+            if status in [2, 3] and action != actions[i]:
+                # both moves are next hops on shortest paths, which may be broken differently on ties
+                target = p_position if status == 2 else p_destination
+                distance = env.map.distance(position, target)
+                for move in [action, actions[i]]:
+                    assert env.map.neighbors(position, move)
+                    assert env.map.distance(position, move) + env.map.distance(move, target) == distance
+            else:
+                assert action == actions[i]
+        statuses.update(observations["state"].tolist())
+        observations, rewards, done, info = env.step(actions)
+    assert statuses == {0, 1, 2, 3, 4}
+
+
+def test_random_policy_draws_like_the_drivers_on_the_same_stream(path_graph):
+    observations = np.zeros((5, 5))
+    policy = RandomDriver.Policy(5, seed = 0)
+    rng = np.random.default_rng(0)
+    drivers = [RandomDriver.Driver(i, 5, path_graph, seed = rng) for i in range(5)]
+    for _ in range(10):
+        assert policy.act_batch(observations).tolist() == [driver.action(observation) for driver, observation in zip(drivers, observations)]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.pricing import DistancePricing, Pricer, PricingContext, SurgePricing, TimeOfDayPricing
+
+
+def context(origins, waiting_nodes = (), idle_nodes = (), time = 0):
+    origins = np.asarray(origins, dtype = np.int64)
+    return PricingContext(
+        origins = origins,
+        destinations = origins,
+        distances = np.full(len(origins), 10.0),
+        waiting_nodes = np.asarray(waiting_nodes, dtype = np.int64),
+        idle_nodes = np.asarray(idle_nodes, dtype = np.int64),
+        n_nodes = 4,
+        time = time,
+    )
+
+
+def test_surge_grows_with_the_excess_of_waiting_passengers():
+    surge = SurgePricing(zones = np.array([0, 0, 1, 1]), sensitivity = 0.5, max_multiplier = 3.0)
+    # zone 0: 3 waiting for 1 idle driver, zone 1: more idle drivers than waiting passengers
+    multipliers = surge(context([0, 1, 2, 3], waiting_nodes = [0, 1, 1, 2], idle_nodes = [0, 2, 3]))
+    assert np.allclose(multipliers, [2.0, 2.0, 1.0, 1.0])
+    # without idle drivers the excess is the number of waiting passengers, capped by max_multiplier
+    assert np.allclose(surge(context([0], waiting_nodes = [0] * 10)), [3.0])
+
+
+def test_time_of_day_interpolates_over_the_period():
+    time_of_day = TimeOfDayPricing(curve = [1.0, 2.0], period = 10)
+    for time, expected in [(0, 1.0), (5, 2.0), (2.5, 1.5), (7.5, 1.5), (10, 1.0), (25, 2.0)]:
+        assert np.allclose(time_of_day(context([0, 3], time = time)), expected)
+
+
+def test_pricer_multiplies_the_models():
+    pricer = Pricer(models = [DistancePricing(2.0), TimeOfDayPricing([1.0, 2.0], 10), SurgePricing(max_multiplier = 1.5)], variance_per_price = 0.0, seed = 0)
+    prices = pricer.price(context([0, 1], waiting_nodes = [0, 0], time = 5))
+    assert np.allclose(prices, [2.0 * 10.0 * 2.0 * 1.5, 2.0 * 10.0 * 2.0 * 1.0])
+
+
+def test_env_pricer_draws_from_the_pricing_stream(caveman):
+    env = Uber(2, np.full(16, 0.05), caveman, seed = 0, is_logging = False, pricing_models = [SurgePricing()])
+    assert env.pricer.rng is env.rngs["pricing"]
+    env.reset(seed = 1)
+    assert env.pricer.rng is env.rngs["pricing"]
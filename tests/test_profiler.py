@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.profiler import StepProfiler
+from ubergym.envs.partitioned_matcher import PartitionedMatcher
+from ubergym.envs.patience import Patience
+from ubergym.envs.shifts import StochasticShifts
+from drivers import AcceptingDriver
+
+
+def test_captured_metrics_are_only_recorded_on_replay():
+    profiler = StepProfiler(window = 10)
+    started, stepped = threading.Event(), threading.Event()
+
+    def work():
+        profiler.add("work", 1.0)
+        started.set()
+        stepped.wait()
+        profiler.set("status", 2)
+        return "done"
+
+    result = {}
+    worker = threading.Thread(target = lambda: result.update(value = profiler.capture(work)()))
+    worker.start()
+    started.wait()
+    profiler.add("main", 1.0)
+    assert profiler.end_step() == {"main": 1.0}
+    stepped.set()
+    worker.join()
+
+    value, recordings = result["value"]
+    assert value == "done"
+    assert profiler.current == {}
+    profiler.replay(recordings)
+    assert profiler.end_step() == {"work": 1.0, "status": 2.0}
+
+
+def test_async_matching_is_recorded_on_the_step_that_joins_it(caveman):
+    graph = caveman
+    env = Uber(4, np.full(16, 0.1), graph, num_steps = 30, seed = 0, is_logging = False, async_matching = True, profiler = StepProfiler())
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = 0)
+    profiles = []
+    done = False
+    while not done:
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        profiles.append((info["profile"], env.match_batch_size))
+    env.close()
+
+    # the matching started at the end of step t is joined, and recorded, at step t + 1
+    for (_, started), (profile, _) in zip(profiles, profiles[1:]):
+        assert ("match" in profile) == (started > 0)
+    assert "match" not in profiles[0][0]
+
+
+def test_shifts_patience_and_zone_solves_are_timed(caveman):
+    matcher = PartitionedMatcher('LINEAR_SUM', 4.0, 0.2, zones = np.arange(16) // 4, executor = 'thread')
+    env = Uber(4, np.full(16, 0.1), caveman, num_steps = 30, seed = 0, is_logging = False, matcher = matcher, profiler = StepProfiler(),
+        shifts = StochasticShifts(0.1, 0.1), patience = Patience(5))
+    zone_solves = []
+    solve_zones = matcher._solve_zones
+    matcher._solve_zones = lambda costs: zone_solves.append(len(costs)) or solve_zones(costs)
+    policy = AcceptingDriver.Policy(caveman)
+    observations = env.reset(seed = 0)
+    profiles = []
+    done = False
+    while not done:
+        zone_solves.clear()
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        profiles.append((info["profile"], sum(zone_solves)))
+    env.close()
+
+    for profile, solved in profiles:
+        assert {"update_shifts", "expire_passengers"} <= set(profile)
+        if solved > 0:
+            assert profile["match.solve"] > 0 and "match.solver_status" in profile
+    assert any(solved > 0 for _, solved in profiles)
@@ -0,0 +1,29 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from drivers.qtables import QTable
+
+
+@pytest.mark.parametrize("backend", ["dense", "sparse"])
+@pytest.mark.parametrize("neighbor_actions", [False, True])
+def test_save_and_load_round_trip(tmp_path, backend, neighbor_actions, path_graph):
+    graph = path_graph
+    qtable = QTable(graph, num_actions = 5, backend = backend, dtype = np.float32, neighbor_actions = neighbor_actions, seed = 0)
+    states = [(0, 1), (1, 2, 0, 3, 4), (2, 1, 4, 0), (3, 4, 2)]
+    for state in states:
+        qtable.update(state, 0, 1.5)
+    qtable.save(str(tmp_path))
+
+    for mmap_mode in [None, 'r']:
+        loaded = QTable.load(str(tmp_path), graph, mmap_mode = mmap_mode)
+        assert (loaded.backend, loaded.neighbor_actions, loaded.dtype) == (backend, neighbor_actions, np.float32)
+        assert len(loaded) == len(qtable)
+        for state in states:
+            assert np.array_equal(loaded.values(state), qtable.values(state))
+
+
+def test_load_checks_the_graph(tmp_path, path_graph):
+    QTable(path_graph, num_actions = 5, backend = "sparse").save(str(tmp_path))
+    with pytest.raises(ValueError):
+        QTable.load(str(tmp_path), nx.path_graph(6).to_directed())
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from ubergym.envs.uber import Uber
+from drivers.qtables import QTable
+import drivers.QLearningDriver as QLearningDriver
+import drivers.QLearningFleet as QLearningFleet
+
+
+@pytest.mark.parametrize("backend", ["dense", "sparse"])
+def test_matched_states_mask_actions_not_rows(backend, path_graph):
+    graph = path_graph
+    qtable = QTable(graph, num_actions = 5, backend = backend, seed = 0)
+    # driver at 0, passenger at 4 (not a neighbor): only the moves from 0 are masked, the row stays usable
+    for state in [(2, 0, 2, 4), (2, 0, 3, 1), (3, 0, 4)]:
+        values = qtable.values(state)
+        assert np.array_equal(np.isfinite(values), [True, True, False, False, False])
+        assert np.isfinite(values.max())
+
+
+def test_fleet_masks_the_same_actions(path_graph):
+    graph = path_graph
+    fleet = QLearningFleet.Fleet(2, 5, graph, seed = 0)
+    matched = fleet.tables[2][0].reshape(5, 5, 5, 5)
+    allowed = np.isfinite(matched)
+    assert np.array_equal(allowed, np.broadcast_to(fleet.allowed[:, None, None, :], allowed.shape))
+
+
+def test_neighbor_actions_use_csr_slots(path_graph):
+    graph = path_graph
+    qtable = QTable(graph, num_actions = 5, backend = "sparse", neighbor_actions = True, seed = 0)
+    state = (0, 2)
+    assert len(qtable.values(state)) == 3
+    assert [qtable.action(state, slot) for slot in range(3)] == [1, 2, 3]
+    assert [qtable.slot(state, action) for action in [1, 2, 3]] == [0, 1, 2]
+    with pytest.raises(ValueError):
+        qtable.slot(state, 4)
+    # MATCHING rows are accept or reject, not moves
+    assert qtable.action((1, 2, 0, 3, 5), 1) == 1
+
+
+@pytest.mark.parametrize("neighbor_actions", [False, True])
+def test_allowed_slots_are_the_finite_ones(path_graph, neighbor_actions):
+    qtable = QTable(path_graph, num_actions = 5, neighbor_actions = neighbor_actions, seed = 0)
+    for state in [(0, 2), (1, 2, 0, 3, 4), (2, 0, 3, 1), (3, 4, 2)]:
+        assert np.array_equal(qtable.allowed_slots(state), np.flatnonzero(np.isfinite(qtable.values(state))))
+
+
+@pytest.mark.filterwarnings("error")
+def test_exploring_driver_never_learns_nan(caveman):
+    env = Uber(3, np.full(16, 0.05), caveman, num_steps = 60, seed = 0, is_logging = False)
+    drivers = [QLearningDriver.Driver(i, len(caveman), caveman, epsilon = 1.0, seed = env.rngs["agents"]) for i in range(3)]
+    for _ in range(2):
+        observations = env.reset(seed = 0)
+        for driver in drivers:
+            driver.reset(env.rngs["agents"])
+        done = False
+        while not done:
+            vectorized_observations = np.array(list(observations.values()))
+            observations, rewards, done, info = env.step([drivers[i].action(vectorized_observations[:, i]) for i in range(3)])
+            for i in range(3):
+                drivers[i].add_reward(rewards[i])
+    for driver in drivers:
+        for table in driver.qtable.tables:
+            assert not np.isnan(table).any()
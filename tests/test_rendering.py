@@ -0,0 +1,31 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Passenger
+from ubergym.envs.rendering import PASSENGER, Renderer
+from drivers import AcceptingDriver
+
+
+def test_renderer_marks_the_nodes_with_waiting_passengers(caveman):
+    renderer = Renderer(caveman, driver_radius = 0)
+    waiting = np.zeros(16, dtype = np.int64)
+    waiting[[3, 7]] = [1, 2]
+    frame = renderer.render(np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64), waiting)
+    red = (frame == PASSENGER).all(axis = 2)
+    for node in range(16):
+        row, column = renderer.pixels[node]
+        assert red[row, column] == (waiting[node] > 0)
+
+
+def test_render_follows_the_passengers_waiting_for_a_pickup(caveman):
+    graph = caveman
+    env = Uber(4, np.full(16, 0.05), graph, num_steps = 60, seed = 0, render_mode = "rgb_array", is_logging = False)
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = 0)
+    for _ in range(60):
+        observations, _, _, _ = env.step(policy.act_batch(np.array(list(observations.values())).T))
+        frame = env.render()
+        waiting = {p.position for p in env.passengers if p.status in [Passenger.Status.WAITING, Passenger.Status.MATCHING, Passenger.Status.MATCHED]}
+        for node in waiting:
+            row, column = env.renderer.pixels[node]
+            assert (frame[row, column] == PASSENGER).all() or node in {d.position for d in env.drivers}
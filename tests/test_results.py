@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "experiments", "scripts"))
+from results import ResultsReader, ResultsWriter
+
+
+def test_results_round_trip(tmp_path):
+    root = str(tmp_path / "results")
+    with ResultsWriter(root, chunk_size = 4) as writer:
+        writer.write_config(0, {"n_drivers": np.int64(3), "matcher": "LINEAR_SUM"})
+        for episode in range(3):
+            writer.extend("rewards", episode = np.full(3, episode, dtype = np.int32), driver = np.arange(3, dtype = np.int32), reward = np.arange(3) + 10.0 * episode)
+        writer.append("episodes", episode = 0, steps = 100)
+
+    # appending to an existing store keeps the rows written before
+    with ResultsWriter(root, chunk_size = 4) as writer:
+        writer.append("episodes", episode = 1, steps = 50)
+
+    reader = ResultsReader(root)
+    assert reader.tables() == ["episodes", "rewards"]
+    assert reader.configs() == {0: {"n_drivers": 3, "matcher": "LINEAR_SUM"}}
+
+    rewards = reader.read("rewards")
+    assert np.array_equal(rewards["episode"], np.repeat(np.arange(3), 3))
+    assert np.array_equal(rewards["reward"], (np.arange(3)[None] + 10.0 * np.arange(3)[:, None]).ravel())
+    assert np.array_equal(reader.read("episodes")["steps"], [100, 50])
+
+    assert reader.aggregate("rewards", "reward", by = ["episode"], how = "sum") == {(0,): 3.0, (1,): 33.0, (2,): 63.0}
+    selected = reader.read("rewards", columns = ["reward"], where = lambda chunk: chunk["driver"] == 2)
+    assert np.array_equal(selected["reward"], [2.0, 12.0, 22.0])
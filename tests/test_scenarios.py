@@ -0,0 +1,20 @@
+import numpy as np
+
+from ubergym.envs.scenarios import ScenarioBank
+
+
+def test_scenario_bank_round_trip(tmp_path):
+    bank = ScenarioBank.generate(3, np.full(6, 0.2), 4, 10, seed = 0)
+    bank.save(str(tmp_path))
+    loaded = ScenarioBank.load(str(tmp_path))
+
+    assert isinstance(loaded.arrivals, np.memmap)
+    assert (loaded.n_scenarios, loaded.num_steps, loaded.n_drivers, loaded.n_nodes) == (3, 10, 4, 6)
+    assert np.array_equal(loaded.arrivals, bank.arrivals)
+    assert np.array_equal(loaded.offsets, bank.offsets)
+    assert np.array_equal(loaded.driver_positions, bank.driver_positions)
+    for step in range(11):
+        for a, b in zip(loaded.step_arrivals(2, step), bank.step_arrivals(2, step)):
+            assert np.array_equal(a, b)
+    # generating into a path gives the same bank
+    assert np.array_equal(ScenarioBank.generate(3, np.full(6, 0.2), 4, 10, seed = 0, path = str(tmp_path / "generated")).arrivals, bank.arrivals)
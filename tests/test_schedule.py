@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.schedule import MatchingSchedule
+from drivers import AcceptingDriver
+
+
+def test_schedule_triggers():
+    every = MatchingSchedule(every = 3)
+    assert [every.should_match(step, 1, 0) for step in range(7)] == [True, False, False, True, False, False, True]
+    # nothing to match
+    assert not every.should_match(0, 0, 0)
+
+    # off-cycle matching when the queue or the wait of the oldest passenger reaches its threshold
+    queue = MatchingSchedule(every = 5, max_queue = 4)
+    assert not queue.should_match(1, 3, 100)
+    assert queue.should_match(1, 4, 0)
+    wait = MatchingSchedule(every = 5, max_wait = 10)
+    assert not wait.should_match(1, 100, 9)
+    assert wait.should_match(1, 1, 10)
+
+    with pytest.raises(ValueError):
+        MatchingSchedule(every = 0)
+
+
+def invocations(graph, schedule):
+    env = Uber(4, np.full(16, 0.1), graph, num_steps = 60, seed = 0, is_logging = False, matching_schedule = schedule)
+    policy = AcceptingDriver.Policy(graph)
+    observations = env.reset(seed = 0)
+    done = False
+    while not done:
+        observations, rewards, done, info = env.step(policy.act_batch(np.array(list(observations.values())).T))
+    return info["matcher_invocations"]
+
+
+def test_sparser_schedules_call_the_matcher_less(caveman):
+    every_step = invocations(caveman, MatchingSchedule())
+    every_third = invocations(caveman, MatchingSchedule(every = 3))
+    assert 0 < every_third <= -(-60 // 3) < every_step
+    # a queue threshold of one waiting passenger matches whenever there is someone to match
+    assert invocations(caveman, MatchingSchedule(every = 3, max_queue = 1)) == every_step
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.server import EnvServer, UberClient, _compact
+
+
+def make_env(graph):
+    return Uber(4, np.full(16, 0.05), graph, num_steps = 20, is_logging = False)
+
+
+def run(server: EnvServer, steps: int):
+    async def main():
+        await server.start()
+        client = await UberClient.connect(server.path)
+        try:
+            observations, _ = await client.reset(seed = 0)
+            trajectory = [observations]
+            for _ in range(steps):
+                observations, rewards, dones, infos = await client.step(np.zeros((client.n_envs, client.n_drivers), dtype = np.int64))
+                trajectory.append(observations)
+            return np.stack(trajectory, axis = 1), infos
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_every_env_gets_its_own_seed(caveman):
+    path = os.path.join(tempfile.mkdtemp(), "uber.sock")
+    server = EnvServer([make_env(caveman), make_env(caveman)], path)
+    try:
+        seeds = server.seeds(0)
+        assert seeds[0] != seeds[1]
+        assert seeds == server.seeds(0)
+        assert server.seeds(None) == [None, None]
+        trajectories, _ = run(server, 10)
+        assert not np.array_equal(trajectories[0], trajectories[1])
+    finally:
+        server.close()
+
+
+def test_large_info_entries_are_summarised(caveman):
+    path = os.path.join(tempfile.mkdtemp(), "uber.sock")
+    server = EnvServer([make_env(caveman)], path, max_info_items = 2)
+    try:
+        _, infos = run(server, 1)
+    finally:
+        server.close()
+    assert infos[0]["step_count"] > 0
+
+    info = {"small": np.arange(2), "large": np.arange(10), "nested": {"large": list(range(5))}}
+    compact = _compact(info, 2)
+    assert compact["small"] is info["small"]
+    assert compact["large"] == {"shape": [10], "sum": 45, "mean": 4.5, "min": 0, "max": 9}
+    assert compact["nested"]["large"]["shape"] == [5]
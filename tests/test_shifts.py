@@ -0,0 +1,144 @@
+import numpy as np
+
+from ubergym.envs.uber import Uber
+from ubergym.envs.actors import Driver
+from ubergym.envs.shifts import ShiftIndex, ShiftModel, ShiftSchedule, StochasticShifts
+import drivers.QLearningDriver as QLearningDriver
+
+
+def check_index(index: ShiftIndex, active: set):
+    assert set(index.active.tolist()) == active
+    assert len(index) == len(active)
+    assert np.array_equal(index.order[index.slot], np.arange(len(index.order)))
+    assert all(index.is_active(i) == (i in active) for i in range(len(index.order)))
+
+
+def test_shift_index_swaps_drivers_in_and_out():
+    index = ShiftIndex(np.array([True, False, True, True, False, True]))
+    active = {0, 2, 3, 5}
+    check_index(index, active)
+
+    # removing a driver from the middle swaps it with the last active driver
+    slot, last = int(index.slot[2]), int(index.active[-1])
+    index.log_off(2)
+    active.discard(2)
+    check_index(index, active)
+    assert int(index.order[slot]) == last
+    assert int(index.slot[2]) == index.n_active
+
+    index.log_on(4)
+    active.add(4)
+    check_index(index, active)
+
+    # logging a driver on or off twice does nothing
+    index.log_on(4)
+    index.log_off(1)
+    check_index(index, active)
+    for i in list(active):
+        index.log_off(i)
+    check_index(index, set())
+
+
+def test_schedule_logs_drivers_on_and_off_over_one_period():
+    period = 6
+    # plain shift, shift over the end of the period, whole period and zero length
+    schedule = ShiftSchedule(starts = [1, 4, 0, 3], durations = [2, 4, 6, 0], period = period)
+    on_shift = schedule.reset(4, np.random.default_rng(0))
+    assert np.array_equal(on_shift, [False, True, True, False])
+
+    index = ShiftIndex(on_shift)
+    for step in range(1, 2 * period + 1):
+        log_on, log_off = schedule.update(step, index, np.random.default_rng(0))
+        previous, current = schedule.on_shift(step - 1), schedule.on_shift(step)
+        assert sorted(log_on.tolist()) == np.flatnonzero(current & ~previous).tolist()
+        assert sorted(log_off.tolist()) == np.flatnonzero(previous & ~current).tolist()
+        for i in log_on.tolist():
+            index.log_on(i)
+        for i in log_off.tolist():
+            index.log_off(i)
+        assert set(index.active.tolist()) == set(np.flatnonzero(current).tolist())
+
+
+class LogOffWhenMatching(ShiftModel):
+    """
+    Drivers 1 and 3 are off shift, driver 0 is asked to log off as soon as it has a match request.
+    """
+    def __init__(self):
+        self.env = None
+        self.asked = None
+
+    def reset(self, n_drivers, rng):
+        self.asked = None
+        return np.array([i not in (1, 3) for i in range(n_drivers)])
+
+    def update(self, step, index, rng):
+        if self.asked is None and self.env.drivers[0].status == Driver.Status.MATCHING:
+            self.asked = step
+            return np.zeros(0, dtype = np.int64), np.array([0])
+        return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64)
+
+
+def test_deferred_log_off_and_active_mapping(caveman):
+    shifts = LogOffWhenMatching()
+    env = Uber(5, np.full(16, 0.1), caveman, num_steps = 80, seed = 0, is_logging = False, shifts = shifts)
+    shifts.env = env
+    observations = env.reset(seed = 0)
+
+    pending_steps = 0
+    done = False
+    while not done:
+        states = observations["state"]
+        # driver 0 keeps its match request pending (invalid answer) until it has been asked to log off for a few
+        # steps, then rejects it
+        actions = np.where(states == Driver.Status.MATCHING.value, 1, observations["position"])
+        if states[0] == Driver.Status.MATCHING.value:
+            actions[0] = 2
+            if shifts.asked is not None:
+                pending_steps += 1
+                if pending_steps == 3:
+                    actions[0] = 0
+        observations, rewards, done, info = env.step(actions)
+
+        active = set(env.active_drivers.active.tolist())
+        assert info["active_drivers"] == len(active)
+        # drivers off shift are never matched, and match requests point to the driver that holds them
+        assert not {1, 3} & active
+        for i, d in enumerate(env.drivers):
+            if d.match_request is not None:
+                assert d.match_request.driver == i and i in active
+            assert (d.status == Driver.Status.OFF) == (i not in active)
+        assert np.array_equal(observations["state"], [d.status.value for d in env.drivers])
+
+        if shifts.asked is not None and 0 in active:
+            # the log off waits until the driver answered its match request
+            assert 0 in env._pending_log_off
+            assert env.drivers[0].status == Driver.Status.MATCHING
+
+    assert shifts.asked is not None and pending_steps == 3
+    # after the deferred log off, only drivers 2 and 4 remain on shift
+    assert set(env.active_drivers.active.tolist()) == {2, 4}
+    assert env.drivers[0].status == Driver.Status.OFF and 0 not in env._pending_log_off
+
+
+def test_qlearning_driver_waits_while_off_shift(caveman):
+    env = Uber(4, np.full(16, 0.1), caveman, num_steps = 60, seed = 0, is_logging = False, shifts = StochasticShifts(0.2, 0.2))
+    drivers = [QLearningDriver.Driver(i, len(caveman), caveman, seed = env.rngs["agents"]) for i in range(4)]
+    off_steps = 0
+    for _ in range(2):
+        observations = env.reset(seed = 0)
+        for driver in drivers:
+            driver.reset(env.rngs["agents"])
+        done = False
+        while not done:
+            vectorized_observations = np.array(list(observations.values()))
+            actions = [drivers[i].action(vectorized_observations[:, i]) for i in range(4)]
+            for i, driver in enumerate(drivers):
+                if observations["state"][i] == Driver.Status.OFF.value:
+                    # no TD update into or out of OFF, the driver stays in place
+                    off_steps += 1
+                    assert actions[i] == observations["position"][i]
+                    assert driver.prev_state is None and driver.prev_action is None
+            observations, rewards, done, info = env.step(actions)
+            for i in range(4):
+                drivers[i].add_reward(rewards[i])
+    assert off_steps > 0
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "experiments", "scripts"))
+from sweep import collect, sweep
+
+
+def passengers(env):
+    kpis = env.unwrapped.kpis.summary()
+    return kpis["arrived"], kpis["abandoned"], len(env.unwrapped.passengers)
+
+
+def run_sweep(graph, n_workers):
+    results = sweep(
+        {"n_drivers": [2, 3]},
+        n_episodes = 3,
+        episodes_per_task = 2,
+        n_workers = n_workers,
+        seed = 0,
+        driver_type = 'Random',
+        steps_per_passenger = 1,
+        matcher_type = 'LINEAR_SUM',
+        episode_callbacks = [passengers],
+        graph = graph,
+    )
+    return collect(results, key = lambda config: (config["n_drivers"],))
+
+
+def test_results_do_not_depend_on_the_number_of_workers(caveman):
+    serial = run_sweep(caveman, 1)
+    assert sorted(serial) == [(2,), (3,)]
+    assert all(len(episodes) == 3 for episodes in serial.values())
+    assert run_sweep(caveman, 3) == serial
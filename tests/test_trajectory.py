@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from ubergym.envs.uber import Uber
+from drivers.trajectory import TrajectoryBuffer
+from drivers import AcceptingDriver
+
+
+def test_ring_buffer_keeps_the_last_steps():
+    buffer = TrajectoryBuffer(2, capacity = 4, n_features = 1, retention = 'ring')
+    for episode in range(2):
+        buffer.reset()
+        for step in range(3):
+            t = 3 * episode + step
+            buffer.add(np.full((2, 1), t), np.array([t, -t]))
+            buffer.add_rewards(np.array([1.0, 2.0]))
+
+    # 6 steps in a buffer of 4: the first two were overwritten and the steps are returned in order
+    assert len(buffer) == 4
+    assert np.array_equal(buffer.observations[:, 0, 0], [2, 3, 4, 5])
+    assert np.array_equal(buffer.actions, [[2, -2], [3, -3], [4, -4], [5, -5]])
+    assert np.array_equal(buffer.episode_rewards(), [3.0, 6.0])
+
+    # once the current episode is longer than the buffer, its total is unknown
+    for t in range(6, 8):
+        buffer.add(np.full((2, 1), t), np.array([t, -t]))
+    assert buffer.episode_rewards() is None
+
+
+def test_episode_buffer_is_bounded():
+    buffer = TrajectoryBuffer(1, capacity = 2, n_features = 1)
+    buffer.add(np.zeros((1, 1)), np.zeros(1))
+    buffer.add(np.zeros((1, 1)), np.zeros(1))
+    with pytest.raises(IndexError):
+        buffer.add(np.zeros((1, 1)), np.zeros(1))
+    buffer.reset()
+    assert len(buffer) == 0
+
+
+def test_driver_records_into_its_buffer(caveman):
+    env = Uber(2, np.full(16, 0.05), caveman, num_steps = 30, seed = 0, is_logging = False)
+    drivers = [AcceptingDriver.Driver(i, len(caveman), caveman, trajectory = TrajectoryBuffer(1, capacity = 8, retention = 'ring')) for i in range(2)]
+    observations = env.reset(seed = 0)
+    history = [[] for _ in drivers]
+    done = False
+    while not done:
+        vectorized_observations = np.array(list(observations.values()))
+        actions = [drivers[i].action(vectorized_observations[:, i]) for i in range(2)]
+        observations, rewards, done, info = env.step(actions)
+        for i in range(2):
+            drivers[i].add_reward(rewards[i])
+            history[i].append((actions[i], rewards[i]))
+
+    for driver, steps in zip(drivers, history):
+        # no lists by default, the buffer holds the last 8 steps and the total covers the whole episode
+        assert driver.rewards == [] and driver.actions == []
+        assert np.array_equal(driver.trajectory.actions[:, 0], [action for action, _ in steps[-8:]])
+        assert np.array_equal(driver.trajectory.rewards[:, 0], [reward for _, reward in steps[-8:]])
+        assert np.isclose(driver.episode_reward, sum(reward for _, reward in steps))
@@ -1,6 +1,21 @@
-from gym.envs.registration import register
+import sys
 
-register(
-    id='ubergym/uber-v0',
-    entry_point='ubergym.envs:Uber'
-)
\ No newline at end of file
+ENV_ID = 'ubergym/uber-v0'
+
+
+def register_envs():
+    """
+    Registers the environments with gym. gym calls it when it is imported, through the gym.envs entry point of the
+    installed package, so that importing ubergym (e.g. only its graphs, scenarios or server client) does not import gym.
+    """
+    from gym.envs.registration import register, registry
+    if ENV_ID not in registry:
+        register(
+            id=ENV_ID,
+            entry_point='ubergym.envs:Uber'
+        )
+
+
+# gym imported before ubergym, or a source tree used without installing the package
+if 'gym' in sys.modules:
+    register_envs()
@@ -1 +1,7 @@
-from ubergym.envs.uber import Uber
\ No newline at end of file
+def __getattr__(name):
+    # Uber is imported on first use, so that importing the lighter modules of the package (graphs, scenarios)
+    # does not import gym, networkx, methodtools and the simulator
+    if name == 'Uber':
+        from ubergym.envs.uber import Uber
+        return Uber
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
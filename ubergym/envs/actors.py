@@ -10,6 +10,7 @@ class Passenger:
         MATCHED = 2
         RIDING = 3
         ARRIVED = 4
+        ABANDONED = 5
 
     name: int
     position: int
@@ -18,6 +19,7 @@ class Passenger:
     spawned_at: int
     picked_up_at: Optional[int] = None
     arrived_at: Optional[int] = None
+    abandoned_at: Optional[int] = None
     driver: Optional[int] = None
     
 
@@ -15,7 +15,7 @@ simulation = {
         "arrive": 1.0,
         "invalid_action": 0,
     },
-    "metadata": {"render_modes": [], "render_fps": None},
+    "metadata": {"render_modes": ["rgb_array"], "render_fps": 4},
     "matcher_metadata": {"types": ['LINEAR_SUM', 'LEXICOGRAPHIC_MINMAX', 'DYNAMIC'], "default": 'LINEAR_SUM'},
     "is_logging": True,
 
@@ -0,0 +1,177 @@
+"""
+Replay of historical trips as the passenger demand of Uber.
+
+Trips are stored as a .npy file of TRIP_DTYPE records sorted by request time, which TripDemand memory-maps and reads
+with a cursor, so that only the trips of the current step are touched. convert_trips builds such a file from CSV or
+JSON lines trip logs in chunks, without holding the log in Python objects.
+"""
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+import argparse, csv, json, os
+import numpy as np
+
+TRIP_DTYPE = np.dtype([("time", np.float64), ("origin", np.int32), ("destination", np.int32)])
+
+
+@dataclass
+class TripDemand:
+    """
+    Demand replaying trips sorted by time. Simulation time t (the step_count of Uber) corresponds to the trip time
+    start_time + t * time_scale, and a step at time t spawns the trips requested since the previous step, up to and
+    including that time. Uber rewinds the demand on reset, and the trips requested up to start_time spawn at reset.
+    """
+    trips: np.ndarray
+    start_time: float = 0.0
+    time_scale: float = 1.0
+
+    def __post_init__(self):
+        if self.trips.dtype != TRIP_DTYPE:
+            raise TypeError(f"trips should have dtype {TRIP_DTYPE}")
+        self.times = self.trips["time"]
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.trips)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r', validate: bool = False, **kwargs) -> 'TripDemand':
+        """
+        Loads a trip file written by convert_trips (or np.save of a sorted TRIP_DTYPE array), memory-mapped by default.
+        validate checks that the trips are sorted, which reads the whole file.
+        """
+        demand = cls(np.load(path, mmap_mode = mmap_mode), **kwargs)
+        if validate:
+            demand.validate()
+        return demand
+
+    def validate(self, n_nodes: Optional[int] = None, chunk_size: int = 1 << 22):
+        """
+        Checks chunk by chunk that the trips are sorted by time, and that the nodes are in [0, n_nodes) if given.
+        """
+        previous = -np.inf
+        for start in range(0, len(self.trips), chunk_size):
+            chunk = self.trips[start:start + chunk_size]
+            times = chunk["time"]
+            if times[0] < previous or np.any(np.diff(times) < 0):
+                raise ValueError("trips should be sorted by time")
+            previous = times[-1]
+            if n_nodes is not None:
+                for field in ["origin", "destination"]:
+                    if chunk[field].min() < 0 or chunk[field].max() >= n_nodes:
+                        raise ValueError(f"trip {field}s should be between 0 and {n_nodes - 1}")
+
+    def rewind(self):
+        """
+        Moves the cursor back to the first trip, the next call of arrivals returns the trips requested up to its time.
+        """
+        self.cursor = 0
+
+    def arrivals(self, time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Origins and destinations of the trips requested after the previous call and up to simulation time.
+        """
+        start = self.cursor
+        self.cursor = self._advance(self.start_time + time * self.time_scale)
+        trips = self.trips[start:self.cursor]
+        return trips["origin"], trips["destination"]
+
+    def _advance(self, until: float) -> int:
+        # exponential search from the cursor, so that the cost depends on the number of trips of the step and not on the file size
+        n = len(self.times)
+        step = 1
+        end = self.cursor
+        while end < n and self.times[end] <= until:
+            end = self.cursor + step
+            step *= 2
+        low = self.cursor + step // 4 if step > 2 else self.cursor
+        high = min(end, n)
+        return low + int(np.searchsorted(self.times[low:high], until, side = "right"))
+
+
+def _parse_time(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # ISO 8601 timestamps are converted to seconds since the epoch
+        return float(np.datetime64(value, "s").astype(np.int64))
+
+
+def _read_rows(source: str, columns: List[str]) -> Iterator[Tuple]:
+    with open(source, newline = "") as f:
+        if source.endswith(".jsonl") or source.endswith(".json"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield tuple(record[column] for column in columns)
+        else:
+            for record in csv.DictReader(f):
+                yield tuple(record[column] for column in columns)
+
+
+def _chunks(rows: Iterator[Tuple], chunk_size: int) -> Iterator[np.ndarray]:
+    chunk = []
+    for time, origin, destination in rows:
+        chunk.append((_parse_time(time), int(origin), int(destination)))
+        if len(chunk) == chunk_size:
+            yield np.array(chunk, dtype = TRIP_DTYPE)
+            chunk = []
+    if chunk:
+        yield np.array(chunk, dtype = TRIP_DTYPE)
+
+
+def convert_trips(
+    source: str,
+    path: str,
+    time_column: str = "time",
+    origin_column: str = "origin",
+    destination_column: str = "destination",
+    n_nodes: Optional[int] = None,
+    chunk_size: int = 1_000_000) -> int:
+    """
+    Converts a CSV (with a header) or JSON lines (.jsonl) trip log to a trip file at path, sorted by time.
+    Times are numbers or ISO 8601 timestamps (converted to seconds), origins and destinations are node indices,
+    checked to be in [0, n_nodes) if n_nodes is given. The log is parsed chunk_size rows at a time into a raw
+    file next to path, which is only sorted if it is not already. Returns the number of trips.
+    """
+    columns = [time_column, origin_column, destination_column]
+    raw_path = path + ".raw"
+
+    n_trips = 0
+    is_sorted = True
+    previous = -np.inf
+    try:
+        with open(raw_path, "wb") as raw:
+            for chunk in _chunks(_read_rows(source, columns), chunk_size):
+                if n_nodes is not None and (min(chunk["origin"].min(), chunk["destination"].min()) < 0 or max(chunk["origin"].max(), chunk["destination"].max()) >= n_nodes):
+                    raise ValueError(f"trip nodes should be between 0 and {n_nodes - 1}")
+                times = chunk["time"]
+                is_sorted = is_sorted and times[0] >= previous and not np.any(np.diff(times) < 0)
+                previous = times[-1]
+                chunk.tofile(raw)
+                n_trips += len(chunk)
+
+        trips = np.memmap(raw_path, dtype = TRIP_DTYPE, mode = "r", shape = (n_trips,)) if n_trips > 0 else np.zeros(0, dtype = TRIP_DTYPE)
+        output = np.lib.format.open_memmap(path, mode = "w+", dtype = TRIP_DTYPE, shape = (n_trips,))
+        order = None if is_sorted else np.argsort(trips["time"], kind = "stable")
+        for start in range(0, n_trips, chunk_size):
+            output[start:start + chunk_size] = trips[start:start + chunk_size] if order is None else trips[order[start:start + chunk_size]]
+        output.flush()
+        del output, trips
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    return n_trips
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Convert a CSV or JSON lines trip log to a trip file for TripDemand.")
+    parser.add_argument("source")
+    parser.add_argument("path")
+    parser.add_argument("--time-column", default = "time")
+    parser.add_argument("--origin-column", default = "origin")
+    parser.add_argument("--destination-column", default = "destination")
+    parser.add_argument("--n-nodes", type = int, default = None)
+    args = parser.parse_args()
+    n_trips = convert_trips(args.source, args.path, args.time_column, args.origin_column, args.destination_column, args.n_nodes)
+    print(f"wrote {n_trips} trips to {args.path}")
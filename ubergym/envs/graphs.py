@@ -0,0 +1,249 @@
+"""
+Generators of synthetic city graphs with constant edge weights.
+
+Graphs are built directly in compiled form, CSR adjacency arrays plus node coordinates, so that maps with hundreds
+of thousands of nodes can be generated without building a networkx graph. All generators add every edge in both
+directions, so a connected graph is strongly connected. CompiledGraph.to_networkx gives the nx.DiGraph that Uber takes.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple
+import numpy as np
+
+# networkx is only imported by the conversions, generating graphs does not need it
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+@dataclass
+class CompiledGraph:
+    """
+    Directed graph with nodes 0, ..., n_nodes - 1 and constant edge weight.
+    The successors of node i are indices[indptr[i]:indptr[i + 1]], sorted, and coords[i] is the position of node i.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    coords: np.ndarray
+    weight: float = 1
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        return self.n_nodes
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sources and targets of all edges.
+        """
+        sources = np.repeat(np.arange(self.n_nodes, dtype = self.indices.dtype), np.diff(self.indptr))
+        return sources, self.indices
+
+    def transpose(self) -> 'CompiledGraph':
+        sources, targets = self.edges()
+        return _compile(self.n_nodes, targets, sources, self.coords, self.weight, symmetric = False)
+
+    def is_strongly_connected(self) -> bool:
+        if self.n_nodes == 0:
+            return False
+        return bool(_reachable(self, 0).all() and _reachable(self.transpose(), 0).all())
+
+    def to_networkx(self) -> 'nx.DiGraph':
+        """
+        The graph as an nx.DiGraph with a weight attribute on every edge and a pos attribute on every node.
+        """
+        import networkx as nx
+        graph = nx.DiGraph()
+        graph.add_nodes_from((i, {"pos": tuple(xy)}) for i, xy in enumerate(self.coords.tolist()))
+        sources, targets = self.edges()
+        graph.add_edges_from(zip(sources.tolist(), targets.tolist()), weight = self.weight)
+        return graph
+
+    @classmethod
+    def from_networkx(cls, graph: 'nx.DiGraph', weight: str = "weight") -> 'CompiledGraph':
+        """
+        Compiles a graph with nodes 0, ..., N-1 and constant edge weights, coordinates are taken from the pos attribute if present.
+        """
+        n = len(graph)
+        edges = np.array(list(graph.edges()), dtype = np.int64).reshape(-1, 2)
+        weights = {d.get(weight) for _, _, d in graph.edges(data = True)}
+        if len(weights) > 1:
+            raise ValueError("edges of the graph should have constant weight")
+        coords = np.array([graph.nodes[i].get("pos", (0.0, 0.0)) for i in range(n)], dtype = np.float64).reshape(n, 2)
+        return _compile(n, edges[:, 0], edges[:, 1], coords, weights.pop() if weights else 1, symmetric = False)
+
+
+def _compile(n_nodes: int, sources: np.ndarray, targets: np.ndarray, coords: np.ndarray, weight: float, symmetric: bool = True) -> CompiledGraph:
+    """
+    CSR form of the edges, adding the reverse of every edge if symmetric and dropping duplicates and self loops.
+    """
+    sources = np.asarray(sources, dtype = np.int64)
+    targets = np.asarray(targets, dtype = np.int64)
+    if symmetric:
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+
+    keys = np.unique(sources[sources != targets] * n_nodes + targets[sources != targets])
+    sources, targets = np.divmod(keys, n_nodes)
+
+    dtype = np.int32 if n_nodes < np.iinfo(np.int32).max else np.int64
+    indptr = np.zeros(n_nodes + 1, dtype = np.int64)
+    np.cumsum(np.bincount(sources, minlength = n_nodes), out = indptr[1:])
+    return CompiledGraph(indptr = indptr, indices = targets.astype(dtype), coords = np.asarray(coords, dtype = np.float64), weight = weight)
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # concatenation of arange(starts[i], starts[i] + counts[i]) for all i
+    offsets = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(offsets, counts) + np.repeat(starts, counts)
+
+
+def _reachable(graph: CompiledGraph, source: int) -> np.ndarray:
+    """
+    Nodes reachable from source, by breadth first search with one vectorized expansion per level.
+    """
+    visited = np.zeros(graph.n_nodes, dtype = bool)
+    visited[source] = True
+    frontier = np.array([source])
+    while len(frontier) > 0:
+        starts = graph.indptr[frontier]
+        successors = graph.indices[_ranges(starts, graph.indptr[frontier + 1] - starts)]
+        frontier = np.unique(successors[~visited[successors]])
+        visited[frontier] = True
+    return visited
+
+
+def _components(graph: CompiledGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Connected component of every node of a symmetric graph, numbered in the order of their smallest node, and the
+    sizes of the components. All the components are labelled at once: every round hooks the root of each edge to the
+    smaller root of its other end, then points every node to its root, and drops the edges inside a component.
+    A round is O(edges) with numpy, whatever the number of components.
+    """
+    parent = np.arange(graph.n_nodes)
+    sources, targets = graph.edges()
+    # the graph is symmetric, one direction of every edge is enough
+    once = sources < targets
+    sources, targets = sources[once], targets[once]
+    while len(sources) > 0:
+        roots_u, roots_v = parent[sources], parent[targets]
+        cross = roots_u != roots_v
+        sources, targets, roots_u, roots_v = sources[cross], targets[cross], roots_u[cross], roots_v[cross]
+        parent[np.maximum(roots_u, roots_v)] = np.minimum(roots_u, roots_v)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    _, labels, sizes = np.unique(parent, return_inverse = True, return_counts = True)
+    return labels, sizes
+
+
+def _largest_component(graph: CompiledGraph) -> CompiledGraph:
+    """
+    Subgraph of the largest connected component of a symmetric graph, with nodes renumbered in their original order.
+    """
+    labels, sizes = _components(graph)
+    keep = labels == int(np.argmax(sizes))
+    index = np.cumsum(keep) - 1
+    sources, targets = graph.edges()
+    mask = keep[sources]
+    return _compile(int(keep.sum()), index[sources[mask]], index[targets[mask]], graph.coords[keep], graph.weight, symmetric = False)
+
+
+def grid(rows: int, cols: int, weight: float = 1, spacing: float = 1.0) -> CompiledGraph:
+    """
+    Manhattan grid with rows x cols intersections, node r * cols + c at (c * spacing, r * spacing) is connected to its
+    horizontal and vertical neighbors.
+    """
+    nodes = np.arange(rows * cols).reshape(rows, cols)
+    sources = np.concatenate([nodes[:, :-1].ravel(), nodes[:-1, :].ravel()])
+    targets = np.concatenate([nodes[:, 1:].ravel(), nodes[1:, :].ravel()])
+    r, c = np.divmod(np.arange(rows * cols), cols)
+    coords = np.stack([c * spacing, r * spacing], axis = 1)
+    return _compile(rows * cols, sources, targets, coords, weight)
+
+
+def caveman(n_cliques: int, clique_size: int, weight: float = 1) -> CompiledGraph:
+    """
+    Connected caveman graph, the same graph as nx.connected_caveman_graph(n_cliques, clique_size): n_cliques cliques
+    where one edge of every clique is rewired to the previous clique, so that the cliques form a ring.
+    Cliques are placed on a circle and the nodes of a clique on a smaller circle around its center.
+    """
+    if clique_size < 2:
+        raise ValueError("clique_size should be at least 2")
+
+    n = n_cliques * clique_size
+    i, j = np.triu_indices(clique_size, k = 1)
+    starts = np.arange(0, n, clique_size)
+    sources = (starts[:, None] + i[None, :]).ravel()
+    targets = (starts[:, None] + j[None, :]).ravel()
+
+    # rewire the edge (start, start + 1) of every clique to (start, start - 1)
+    rewired = (i == 0) & (j == 1)
+    rewired = np.tile(rewired, n_cliques)
+    targets = np.where(rewired, np.repeat((starts - 1) % n, len(i)), targets)
+
+    clique, member = np.divmod(np.arange(n), clique_size)
+    big = 2 * np.pi * clique / max(n_cliques, 1)
+    small = 2 * np.pi * member / clique_size
+    radius = max(1.0, n_cliques / np.pi)
+    coords = np.stack([radius * np.cos(big) + 0.4 * np.cos(small), radius * np.sin(big) + 0.4 * np.sin(small)], axis = 1)
+    return _compile(n, sources, targets, coords, weight)
+
+
+def random_geometric(n_nodes: int, radius: float, weight: float = 1, seed: Optional[int] = None, largest_component: bool = True) -> CompiledGraph:
+    """
+    n_nodes points drawn uniformly in the unit square, connected when they are within radius of each other.
+    Pairs are only compared between neighboring cells of a grid with cells of size radius. The graph may be disconnected,
+    with largest_component only its largest connected component is kept, so the graph can have fewer than n_nodes nodes.
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.random((n_nodes, 2))
+
+    n_cells = max(1, int(np.floor(1.0 / radius)))
+    cell = np.minimum((coords * n_cells).astype(np.int64), n_cells - 1)
+    cell_id = cell[:, 0] * n_cells + cell[:, 1]
+    order = np.argsort(cell_id, kind = "stable")
+    sorted_cells = cell_id[order]
+
+    sources, targets = [], []
+    # every unordered pair of neighboring cells is visited once
+    for dx, dy in [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]:
+        x, y = cell[:, 0] + dx, cell[:, 1] + dy
+        valid = (x >= 0) & (x < n_cells) & (y >= 0) & (y < n_cells)
+        other = x * n_cells + y
+        starts = np.searchsorted(sorted_cells, other, side = "left")
+        counts = np.where(valid, np.searchsorted(sorted_cells, other, side = "right") - starts, 0)
+        s = np.repeat(np.arange(n_nodes), counts)
+        t = order[_ranges(starts, counts)]
+        close = np.sum((coords[s] - coords[t]) ** 2, axis = 1) <= radius ** 2
+        sources.append(s[close])
+        targets.append(t[close])
+
+    graph = _compile(n_nodes, np.concatenate(sources), np.concatenate(targets), coords, weight)
+    return _largest_component(graph) if largest_component else graph
+
+
+def ring_radial(n_rings: int, n_spokes: int, weight: float = 1, spacing: float = 1.0) -> CompiledGraph:
+    """
+    Ring-radial city: a center node 0 and n_rings rings of n_spokes nodes, node 1 + r * n_spokes + s is on ring r and
+    spoke s. Consecutive nodes of a ring are connected, as are consecutive nodes of a spoke and the center to the first ring.
+    """
+    if n_spokes < 2:
+        raise ValueError("n_spokes should be at least 2")
+
+    nodes = 1 + np.arange(n_rings * n_spokes).reshape(n_rings, n_spokes)
+    sources = np.concatenate([nodes.ravel(), nodes[:-1, :].ravel(), np.zeros(n_spokes, dtype = np.int64)])
+    targets = np.concatenate([np.roll(nodes, -1, axis = 1).ravel(), nodes[1:, :].ravel(), nodes[0, :]])
+
+    ring, spoke = np.divmod(np.arange(n_rings * n_spokes), n_spokes)
+    angle = 2 * np.pi * spoke / n_spokes
+    coords = np.concatenate([[[0.0, 0.0]], np.stack([(ring + 1) * spacing * np.cos(angle), (ring + 1) * spacing * np.sin(angle)], axis = 1)])
+    return _compile(1 + n_rings * n_spokes, sources, targets, coords, weight)
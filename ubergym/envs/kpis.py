@@ -0,0 +1,205 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+import numpy as np
+
+from ubergym.envs.actors import Driver
+
+
+@dataclass
+class Histogram:
+    """
+    Streaming histogram of durations with fixed bins of bin_width starting at 0, the last bin also counts the
+    durations beyond it. The count, sum and maximum are exact.
+    """
+    bins: int
+    bin_width: float
+
+    def __post_init__(self):
+        self.counts = np.zeros(self.bins, dtype = np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[min(int(value // self.bin_width), self.bins - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, float(value))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else float("nan")
+
+    def export(self) -> Dict:
+        return {
+            "counts": self.counts.copy(),
+            "bin_edges": np.arange(self.bins + 1) * self.bin_width,
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+        }
+
+
+class TimeWeightedCounts:
+    """
+    Counts that change by events, e.g. waiting passengers per node, with their integral over time. The integral of
+    a count is only brought up to date when it changes, so an event costs O(1) whatever the number of counts.
+    """
+    def __init__(self, n: int, time: float, initial: Optional[np.ndarray] = None):
+        self.counts = np.zeros(n, dtype = np.int64) if initial is None else np.array(initial, dtype = np.int64)
+        self.area = np.zeros(n)
+        self.since = np.full(n, float(time))
+        self.start = float(time)
+
+    def change(self, i: int, delta: int, time: float):
+        self.area[i] += self.counts[i] * (time - self.since[i])
+        self.since[i] = time
+        self.counts[i] += delta
+
+    def integral(self, time: float) -> np.ndarray:
+        return self.area + self.counts * (time - self.since)
+
+    def mean(self, time: float) -> np.ndarray:
+        """
+        Time average of the counts since the start, the current counts if no time has passed.
+        """
+        if time <= self.start:
+            return self.counts.astype(np.float64)
+        return self.integral(time) / (time - self.start)
+
+
+@dataclass
+class KPIs:
+    """
+    Episode KPIs maintained by Uber as events happen, every event is O(1):
+        wait_time: histogram of the times from spawn to pickup
+        ride_time: histogram of the times from pickup to arrival
+        drivers: number of drivers by status and its time average, the utilization
+        waiting: passengers waiting for a pickup at each node and its time average, spawned passengers by node
+        match requests sent, accepted and rejected, the acceptance rate
+        revenue of the completed trips, in total and by driver
+    Times are in clock units (step_count), the histogram bins are step_size wide unless bin_width is given.
+    With summary_on_done, the info of the last step of an episode has the scalar summary of the KPIs under "kpis",
+    the histograms and the per-node and per-driver arrays are returned by export.
+    """
+    bins: int = 50
+    bin_width: Optional[float] = None
+    summary_on_done: bool = True
+
+    def reset(self, n_nodes: int, n_drivers: int, time: float, step_size: float):
+        """
+        Starts the KPIs of an episode at time with n_drivers idle drivers.
+        """
+        self.time = float(time)
+        bin_width = self.bin_width if self.bin_width is not None else step_size
+        self.wait_time = Histogram(self.bins, bin_width)
+        self.ride_time = Histogram(self.bins, bin_width)
+
+        statuses = np.zeros(len(Driver.Status), dtype = np.int64)
+        statuses[Driver.Status.IDLE.value] = n_drivers
+        self.drivers = TimeWeightedCounts(len(Driver.Status), time, statuses)
+        self.waiting = TimeWeightedCounts(n_nodes, time)
+        self.spawned_by_node = np.zeros(n_nodes, dtype = np.int64)
+        self.revenue_by_driver = np.zeros(n_drivers)
+
+        self.spawned = 0
+        self.abandoned = 0
+        self.match_requests = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.revenue = 0.0
+
+    def tick(self, time: float):
+        self.time = float(time)
+
+    def spawn(self, node: int):
+        self.spawned += 1
+        self.spawned_by_node[node] += 1
+        self.waiting.change(node, 1, self.time)
+
+    def pickup(self, node: int, wait: float):
+        self.waiting.change(node, -1, self.time)
+        self.wait_time.add(wait)
+
+    def abandon(self, node: int):
+        self.abandoned += 1
+        self.waiting.change(node, -1, self.time)
+
+    def arrive(self, driver: int, ride: float, price: float):
+        self.ride_time.add(ride)
+        self.revenue += price
+        self.revenue_by_driver[driver] += price
+
+    def request(self):
+        self.match_requests += 1
+
+    def respond(self, accepted: bool):
+        if accepted:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+
+    def driver_status(self, old: Driver.Status, new: Driver.Status):
+        if old != new:
+            self.drivers.change(old.value, -1, self.time)
+            self.drivers.change(new.value, 1, self.time)
+
+    @property
+    def acceptance_rate(self) -> float:
+        responses = self.accepted + self.rejected
+        return self.accepted / responses if responses > 0 else float("nan")
+
+    def utilization(self) -> Dict[str, float]:
+        """
+        Fraction of the driver time spent in every status since the start of the episode.
+        """
+        time = self.drivers.integral(self.time)
+        total = time.sum()
+        return {status.name: float(time[status.value] / total) if total > 0 else float("nan") for status in Driver.Status}
+
+    def summary(self) -> Dict:
+        """
+        Scalar KPIs at the current time, small enough for the info of every episode.
+        """
+        return {
+            "time": self.time - self.drivers.start,
+            "spawned": self.spawned,
+            "picked_up": self.wait_time.count,
+            "arrived": self.ride_time.count,
+            "abandoned": self.abandoned,
+            "mean_wait_time": self.wait_time.mean,
+            "max_wait_time": self.wait_time.max,
+            "mean_ride_time": self.ride_time.mean,
+            "max_ride_time": self.ride_time.max,
+            "utilization": self.utilization(),
+            "match_requests": self.match_requests,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "acceptance_rate": self.acceptance_rate,
+            "revenue": self.revenue,
+        }
+
+    def export(self) -> Dict:
+        """
+        Copy of the KPIs at the current time, as numbers and numpy arrays.
+        """
+        return {
+            "time": self.time - self.drivers.start,
+            "spawned": self.spawned,
+            "picked_up": self.wait_time.count,
+            "arrived": self.ride_time.count,
+            "abandoned": self.abandoned,
+            "wait_time": self.wait_time.export(),
+            "ride_time": self.ride_time.export(),
+            "drivers_by_status": {status.name: int(self.drivers.counts[status.value]) for status in Driver.Status},
+            "utilization": self.utilization(),
+            "waiting_by_node": self.waiting.counts.copy(),
+            "mean_waiting_by_node": self.waiting.mean(self.time),
+            "spawned_by_node": self.spawned_by_node.copy(),
+            "match_requests": self.match_requests,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "acceptance_rate": self.acceptance_rate,
+            "revenue": self.revenue,
+            "revenue_by_driver": self.revenue_by_driver.copy(),
+        }
@@ -1,18 +1,88 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
+import hashlib, pickle
 import networkx as nx
 from methodtools import lru_cache
 import numpy as np
 
+from ubergym.envs.graphs import CompiledGraph
+
+# constant edge weights of the graphs that passed check_graph, by graph_hash
+_checked_graphs: Dict[str, float] = {}
+
+
+def graph_hash(graph: nx.DiGraph) -> Optional[str]:
+    """
+    Hash of the adjacency of a graph (nodes, edges and edge attributes), equal for graphs built in the same way.
+    The adjacency dicts are pickled in C, which is several times faster than checking the graph.
+    None if the edge attributes can not be pickled.
+    """
+    try:
+        adjacency = pickle.dumps(graph._adj, protocol = pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError):
+        return None
+    return hashlib.blake2b(adjacency, digest_size = 16).hexdigest()
+
+
+def check_graph(graph: nx.DiGraph) -> float:
+    """
+    Checks that graph is a strongly connected nx.DiGraph with constant edge weights and returns the weight.
+    The result is cached by graph_hash, so that the environments built on the same graph only check it once.
+    """
+    # only allow nx.DiGraph
+    if not type(graph) is nx.DiGraph:
+        raise TypeError("graph should be of type nx.DiGraph")
+
+    key = graph_hash(graph)
+    if key in _checked_graphs:
+        return _checked_graphs[key]
+
+    # only allow strongly connected graphs
+    if not nx.is_strongly_connected(graph):
+        raise ValueError("graph is not strongly connected")
+
+    # only allow constant weights
+    weight = None
+    for u,v,d in graph.edges(data=True):
+        try:
+            edge_weight = d["weight"]
+        except:
+            raise ValueError("edges of the graphs should have the weight attribute")
+
+        if weight is None:
+            weight = edge_weight
+        elif edge_weight != weight:
+            raise ValueError("edges of the graph should have constant weight")
+
+    if key is not None:
+        _checked_graphs[key] = weight
+    return weight
+
+
 @dataclass
 class Map:
     # we assume that the graph has nodes with nodes 0,1,...,N-1
     graph: nx.DiGraph
+    # constant edge weight, set for checked graphs (see compile)
+    edge_weight: Optional[float] = None
 
     def __post_init__(self):
         self.nodes = list(self.graph)
         self.distance = lru_cache()(self._distance)
         self.shortest_path = lru_cache()(self._shortest_path)
+        self._next_hops: Optional[np.ndarray] = None
+
+    @classmethod
+    def compile(cls, graph: Union[nx.DiGraph, CompiledGraph]) -> 'Map':
+        """
+        Map of a checked graph. Uber takes it in place of the graph and skips the check, and the environments built on
+        the same Map share its shortest path caches. A CompiledGraph is checked on its CSR arrays before conversion.
+        """
+        if isinstance(graph, CompiledGraph):
+            if not graph.is_strongly_connected():
+                raise ValueError("graph is not strongly connected")
+            return cls(graph.to_networkx(), edge_weight = graph.weight)
+        return cls(graph, edge_weight = check_graph(graph))
 
     def _distance(self, src, dst) -> float:
         return nx.algorithms.shortest_path_length(self.graph, src, dst, weight="weight")
@@ -20,11 +90,38 @@ class Map:
     def _shortest_path(self, src, dst) -> List[int]:
         return nx.algorithms.shortest_path(self.graph, src, dst, weight="weight")
 
+    def next_hops(self) -> np.ndarray:
+        """
+        Table of next nodes on shortest paths, next_hops[src, dst] is the node after src on a shortest path to dst.
+        next_hops[src, src] is src. The table is computed once with one shortest path search per destination.
+        """
+        if self._next_hops is not None:
+            return self._next_hops
+
+        n = len(self.nodes)
+        next_hops = np.tile(np.arange(n), (n, 1)).T
+        reverse = self.graph.reverse(copy = False)
+        for dst in range(n):
+            # predecessors in the reversed graph are successors on a shortest path to dst in the graph
+            predecessors, _ = nx.algorithms.dijkstra_predecessor_and_distance(reverse, dst, weight = "weight")
+            for src, nodes in predecessors.items():
+                if nodes:
+                    next_hops[src, dst] = nodes[0]
+        self._next_hops = next_hops
+        return next_hops
+
     def neighbors(self, src, dst) -> bool:
         return self.graph.has_edge(src, dst)
 
     def __len__(self) -> int:
         return len(self.nodes)
 
-    def random_node(self) -> int:
-        return np.random.randint(0, len(self.nodes))
\ No newline at end of file
+    def random_node(self, rng: Optional[np.random.Generator] = None) -> int:
+        if rng is None:
+            return np.random.randint(0, len(self.nodes))
+        return int(rng.integers(0, len(self.nodes)))
+
+    def random_nodes(self, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        if rng is None:
+            return np.random.randint(0, len(self.nodes), size = n)
+        return rng.integers(0, len(self.nodes), size = n)
\ No newline at end of file
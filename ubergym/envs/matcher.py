@@ -1,12 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from collections import OrderedDict
 import enum
 import numpy as np
-import gurobipy as grb
-from typing import List
+from typing import List, Optional, Tuple
 
 from ubergym.envs.maps import Map
 from ubergym.envs.match_request import MatchRequest
 from ubergym.envs.actors import Driver, Passenger
+from ubergym.envs.pricing import Pricer, PricingContext, DistancePricing
 @dataclass
 class Matcher:
     class Optimization(enum.Enum):
@@ -17,6 +18,13 @@ class Matcher:
     method: str
     MEAN_PRICE_PER_DISTANCE: float
     VARIANCE_PER_PRICE: float
+    pricer: Optional[Pricer] = None
+    # number of node-level assignments kept in the LRU cache, 0 disables the cache
+    cache_size: int = 0
+    cache_hits: int = field(default = 0, init = False)
+    cache_misses: int = field(default = 0, init = False)
+    # Gurobi status of the last solve
+    solver_status: Optional[int] = field(default = None, init = False)
 
     def __post_init__(self):
         if self.method == 'LINEAR_SUM':
@@ -28,10 +36,16 @@ class Matcher:
         else:
             raise ValueError(f'Unknown optimization method {self.method}')
 
+        if self.pricer is None:
+            self.pricer = Pricer(models = [DistancePricing(self.MEAN_PRICE_PER_DISTANCE)], variance_per_price = self.VARIANCE_PER_PRICE)
+
+        self._cache: OrderedDict = OrderedDict()
+
     def match(self, 
         drivers: List[Driver],
         passengers: List[Passenger],
-        map: Map) -> List[MatchRequest]:
+        map: Map,
+        time: int = 0) -> List[MatchRequest]:
 
         # if the matcher type is LINEAR_SUM or LEXICOGRAPHIC_MINMAX costs are the distances between waiting passengers and idle drivers
         # if the matcher type is DYNAMIC, costs are the distances between waiting passengers and idle + riding drivers
@@ -41,70 +55,182 @@ class Matcher:
 
         waiting_passengers = [i for i in range(len(passengers)) if passengers[i].status == Passenger.Status.WAITING]
         idle_drivers = [i for i in range(len(drivers)) if drivers[i].status == Driver.Status.IDLE]
-        riding_drivers = [i for i in range(len(drivers)) if drivers[i].status == Driver.Status.RIDING]
+        riding_drivers = []
+        if self.optimization == Matcher.Optimization.DYNAMIC:
+            riding_drivers = [i for i in range(len(drivers)) if drivers[i].status == Driver.Status.RIDING]
 
-        if self.optimization in [Matcher.Optimization.LINEAR_SUM, Matcher.Optimization.LEXICOGRAPHIC_MINMAX]:
-            costs = np.zeros((len(waiting_passengers), len(idle_drivers)))  
-            n, m = costs.shape
+        pairs = self._assign(waiting_passengers, idle_drivers, riding_drivers, drivers, passengers, map)
 
-            if n == 0 or m == 0:
-                return match_requests
-            
-            for i in range(n):
-                for j in range(m):
-                    # the function map.distance is lru cached, hence there are no recalculations
-                    distance = map.distance(drivers[idle_drivers[j]].position, passengers[waiting_passengers[i]].position)
-                    costs[i][j] = distance
+        if len(pairs) == 0:
+            return match_requests
 
-        elif self.optimization == Matcher.Optimization.DYNAMIC:
-            costs = np.zeros((len(waiting_passengers), len(idle_drivers) + len(riding_drivers)))  
-            n, m = costs.shape
-
-            if n == 0 or m == 0:
-                return match_requests
-            
-            for i in range(n):
-                for j in range(len(idle_drivers)):
-                    # the function map.distance is lru cached, hence there are no recalculations
-                    distance = map.distance(drivers[idle_drivers[j]].position, passengers[waiting_passengers[i]].position)
-                    costs[i][j] = distance
-            
-            for i in range(n):
-                for j in range(len(idle_drivers), m):
-                    # the function map.distance is lru cached, hence there are no recalculations
-                    d = drivers[riding_drivers[j - len(idle_drivers)]]
-                    driver_position = d.position
-                    driver_destination = passengers[d.passenger].destination
-                    passenger_position = passengers[waiting_passengers[i]].position
-                    distance = map.distance(driver_destination, passenger_position) + map.distance(driver_position, driver_destination)
-                    costs[i][j] = distance
+        matched_passengers = [passenger for passenger, _ in pairs]
+        matched_drivers = [driver for _, driver in pairs]
+
+        prices = self._price(matched_passengers, passengers, waiting_passengers, idle_drivers, drivers, map, time)
+        for driver, passenger, price in zip(matched_drivers, matched_passengers, prices):
+            match_requests.append(MatchRequest(driver = driver, passenger = passenger, price = float(price)))
+        
+        return match_requests
+
+    def _assign(self,
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        riding_drivers: List[int],
+        drivers: List[Driver],
+        passengers: List[Passenger],
+        map: Map) -> List[Tuple[int, int]]:
+        """
+        Solves the assignment problem and returns the matched (passenger, driver) pairs in passenger order.
+        """
+        if self.cache_size > 0:
+            return self._cached_assign(waiting_passengers, idle_drivers, riding_drivers, drivers, passengers, map)
+
+        costs = self._costs(waiting_passengers, idle_drivers, riding_drivers, drivers, passengers, map)
+
+        if costs.size == 0:
+            return []
 
         solution = self.minimize_costs(costs)
+        return self._decode(solution, waiting_passengers, idle_drivers + riding_drivers)
 
-        if solution is None:
-            return match_requests
+    def _cached_assign(self,
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        riding_drivers: List[int],
+        drivers: List[Driver],
+        passengers: List[Passenger],
+        map: Map) -> List[Tuple[int, int]]:
+        """
+        Same as _assign, but the assignment is cached at the node level.
+        Passengers and drivers on the same nodes have the same costs, so they are interchangeable and
+        a cached assignment between sorted node tuples can be mapped back to any concrete passengers and drivers.
+        """
+        key, waiting_passengers, idle_drivers, riding_drivers = self._cache_key(waiting_passengers, idle_drivers, riding_drivers, drivers, passengers)
+
+        slots = self._cache_get(key)
+        if slots is None:
+            costs = self._costs(waiting_passengers, idle_drivers, riding_drivers, drivers, passengers, map)
+            slots = []
+            if costs.size > 0:
+                n, m = costs.shape
+                slots = self._decode(self.minimize_costs(costs), list(range(n)), list(range(m)))
+            self._cache_put(key, costs, slots)
+
+        candidate_drivers = idle_drivers + riding_drivers
+        return sorted((waiting_passengers[i], candidate_drivers[j]) for i, j in slots)
+
+    def _cache_key(self,
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        riding_drivers: List[int],
+        drivers: List[Driver],
+        passengers: List[Passenger]) -> Tuple[Tuple, List[int], List[int], List[int]]:
+        """
+        Sorts the passengers and drivers in the canonical order of the cache, returns the key and the sorted lists.
+        """
+        # canonical order: passengers and idle drivers by position, riding drivers by position and dropoff
+        waiting_passengers = sorted(waiting_passengers, key = lambda i: passengers[i].position)
+        idle_drivers = sorted(idle_drivers, key = lambda j: drivers[j].position)
+        riding_drivers = sorted(riding_drivers, key = lambda j: (drivers[j].position, passengers[drivers[j].passenger].destination))
+
+        key = (
+            self.optimization,
+            tuple(passengers[i].position for i in waiting_passengers),
+            tuple(drivers[j].position for j in idle_drivers),
+            tuple((drivers[j].position, passengers[drivers[j].passenger].destination) for j in riding_drivers),
+        )
+        return key, waiting_passengers, idle_drivers, riding_drivers
+
+    def _cache_get(self, key: Tuple) -> Optional[List[Tuple[int, int]]]:
+        slots = self._cache.get(key)
+        if slots is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+        else:
+            self.cache_misses += 1
+        return slots
+
+    def _cache_put(self, key: Tuple, costs: np.ndarray, slots: List[Tuple[int, int]]):
+        # failed solves are not cached so that they are retried
+        if costs.size == 0 or len(slots) > 0:
+            self._cache[key] = slots
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last = False)
+
+    def _costs(self,
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        riding_drivers: List[int],
+        drivers: List[Driver],
+        passengers: List[Passenger],
+        map: Map) -> np.ndarray:
+        """
+        Builds the costs matrix with one row per waiting passenger and one column per idle, then riding driver.
+        """
+        costs = np.zeros((len(waiting_passengers), len(idle_drivers) + len(riding_drivers)))  
+        n, m = costs.shape
 
+        if n == 0 or m == 0:
+            return costs
+        
         for i in range(n):
-            for j in range(m):
+            for j in range(len(idle_drivers)):
+                # the function map.distance is lru cached, hence there are no recalculations
+                distance = map.distance(drivers[idle_drivers[j]].position, passengers[waiting_passengers[i]].position)
+                costs[i][j] = distance
+        
+        for i in range(n):
+            for j in range(len(idle_drivers), m):
+                # the function map.distance is lru cached, hence there are no recalculations
+                d = drivers[riding_drivers[j - len(idle_drivers)]]
+                driver_position = d.position
+                driver_destination = passengers[d.passenger].destination
+                passenger_position = passengers[waiting_passengers[i]].position
+                distance = map.distance(driver_destination, passenger_position) + map.distance(driver_position, driver_destination)
+                costs[i][j] = distance
+
+        return costs
+
+    def _decode(self, solution: Optional[np.ndarray], waiting_passengers: List[int], candidate_drivers: List[int]) -> List[Tuple[int, int]]:
+        """
+        Maps the rows and columns of a matching solution back to (passenger, driver) pairs.
+        """
+        if solution is None:
+            return []
 
-                if j >= len(idle_drivers):
-                    driver = riding_drivers[j - len(idle_drivers)]
-                else:
-                    driver = idle_drivers[j]
+        # the first assigned driver of every passenger, in passenger order
+        rows, cols = np.nonzero(solution > 0.5)
+        rows, first = np.unique(rows, return_index = True)
+        cols = cols[first]
 
-                if solution[i,j] > 0.5:
-                    passenger = passengers[waiting_passengers[i]]
-                    price = self._price(distance = map.distance(passenger.position, passenger.destination))
-                    match_requests.append(MatchRequest(driver = driver, passenger = waiting_passengers[i], price = price))
-                    break
-        
-        return match_requests
+        return [(waiting_passengers[i], candidate_drivers[j]) for i, j in zip(rows, cols)]
 
-    def _price(self, distance: int) -> float:
-        mean_price = self.MEAN_PRICE_PER_DISTANCE * distance
-        variance_price = self.VARIANCE_PER_PRICE * mean_price  
-        price = max(0.0, np.random.normal(mean_price, variance_price))
-        return price
+    def _price(self,
+        matched_passengers: List[int],
+        passengers: List[Passenger],
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        drivers: List[Driver],
+        map: Map,
+        time: int) -> np.ndarray:
+        """
+        Prices all the match requests of the step in one call of the pricer.
+        """
+        origins = np.array([passengers[i].position for i in matched_passengers], dtype = np.int64)
+        destinations = np.array([passengers[i].destination for i in matched_passengers], dtype = np.int64)
+        distances = np.array([map.distance(o, d) for o, d in zip(origins, destinations)], dtype = np.float64)
+
+        context = PricingContext(
+            origins = origins,
+            destinations = destinations,
+            distances = distances,
+            waiting_nodes = np.array([passengers[i].position for i in waiting_passengers], dtype = np.int64),
+            idle_nodes = np.array([drivers[j].position for j in idle_drivers], dtype = np.int64),
+            n_nodes = len(map),
+            time = time,
+        )
+        return self.pricer.price(context)
 
     def minimize_costs(self, costs: np.ndarray) -> np.ndarray:
         """
@@ -126,6 +252,9 @@ class Matcher:
 
     def _linear_cost_minimization(self, costs: np.ndarray) -> np.ndarray:
 
+        # gurobipy is only imported by the matchers that solve the linear program
+        import gurobipy as grb
+
         n,m = costs.shape
         
         model = grb.Model("matching")
@@ -147,6 +276,7 @@ class Matcher:
             model.addConstr(grb.quicksum(x[i,j] for i in range(n)) <= 1, name=f'Constr3_{j}')
 
         model.optimize()
+        self.solver_status = model.status
 
         if model.status == grb.GRB.OPTIMAL:
             solution = np.array(model.getAttr('x')).reshape(n,m)
@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import networkx as nx
+
+from ubergym.envs.maps import Map
+from ubergym.envs.actors import Driver, Passenger
+from ubergym.envs.matcher import Matcher
+
+
+def _minimize_costs(method: str, costs: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[int]]:
+    # module level so that it can be sent to worker processes without pickling the matcher, the solver status is
+    # returned since the matcher of a worker process is not the one of the environment
+    matcher = Matcher(method, 0.0, 0.0)
+    return matcher.minimize_costs(costs), matcher.solver_status
+
+
+def community_zones(graph: nx.DiGraph) -> np.ndarray:
+    """
+    Partitions the nodes of the graph into zones using greedy modularity communities.
+    """
+    zones = np.zeros(len(graph), dtype = np.int64)
+    communities = nx.algorithms.community.greedy_modularity_communities(graph.to_undirected())
+    for zone, nodes in enumerate(communities):
+        zones[list(nodes)] = zone
+    return zones
+
+
+@dataclass
+class PartitionedMatcher(Matcher):
+    """
+    Splits the map into zones and solves the assignment of every zone independently on a pool of workers.
+    Passengers and drivers left unmatched in their zone are then matched in one reconciliation pass across zones.
+    The result is not globally optimal, but every sub-problem is much smaller than the full matching problem.
+    With cache_size > 0 the zones and the reconciliation pass share the node-level cache of the matcher, and
+    solver_status is the status of the last solve, of the reconciliation pass if it solved one.
+    """
+    # zones[node] is the zone of the node, if None zones are the communities of the graph
+    zones: Optional[np.ndarray] = None
+    executor: str = 'process'
+    max_workers: Optional[int] = None
+    _pool: Optional[Executor] = field(default = None, init = False, repr = False)
+
+    def __post_init__(self):
+        super().__post_init__()
+
+        if self.executor not in ['process', 'thread']:
+            raise ValueError(f'Unknown executor {self.executor}')
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == 'process':
+                self._pool = ProcessPoolExecutor(max_workers = self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers = self.max_workers)
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _solve_zones(self, costs: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """
+        Solves the cost matrices of the zones on the pool and returns their solutions in order.
+        """
+        pool = self._get_pool()
+        futures = [pool.submit(_minimize_costs, self.method, zone_costs) for zone_costs in costs]
+        solutions = []
+        for future in futures:
+            solution, status = future.result()
+            if status is not None:
+                self.solver_status = status
+            solutions.append(solution)
+        return solutions
+
+    def _assign(self,
+        waiting_passengers: List[int],
+        idle_drivers: List[int],
+        riding_drivers: List[int],
+        drivers: List[Driver],
+        passengers: List[Passenger],
+        map: Map) -> List[Tuple[int, int]]:
+
+        if self.zones is None:
+            self.zones = community_zones(map.graph)
+
+        # group passengers and drivers by the zone of their current position
+        groups: Dict[int, Tuple[List[int], List[int], List[int]]] = {}
+        for i in waiting_passengers:
+            groups.setdefault(self.zones[passengers[i].position], ([], [], []))[0].append(i)
+        for j in idle_drivers:
+            groups.setdefault(self.zones[drivers[j].position], ([], [], []))[1].append(j)
+        for j in riding_drivers:
+            groups.setdefault(self.zones[drivers[j].position], ([], [], []))[2].append(j)
+
+        # costs are built here since map.distance is cached in this process, only the solves run on the pool
+        pairs: List[Tuple[int, int]] = []
+        jobs = []
+        for zone in sorted(groups):
+            zone_passengers, zone_idle, zone_riding = groups[zone]
+            key = None
+            if self.cache_size > 0:
+                key, zone_passengers, zone_idle, zone_riding = self._cache_key(zone_passengers, zone_idle, zone_riding, drivers, passengers)
+                slots = self._cache_get(key)
+                if slots is not None:
+                    zone_drivers = zone_idle + zone_riding
+                    pairs += [(zone_passengers[i], zone_drivers[j]) for i, j in slots]
+                    continue
+            costs = self._costs(zone_passengers, zone_idle, zone_riding, drivers, passengers, map)
+            if costs.size == 0:
+                if key is not None:
+                    self._cache_put(key, costs, [])
+                continue
+            jobs.append((zone_passengers, zone_idle + zone_riding, key, costs))
+
+        solutions = self._solve_zones([costs for _, _, _, costs in jobs])
+        for (zone_passengers, zone_drivers, key, costs), solution in zip(jobs, solutions):
+            n, m = costs.shape
+            slots = self._decode(solution, list(range(n)), list(range(m)))
+            if key is not None:
+                self._cache_put(key, costs, slots)
+            pairs += [(zone_passengers[i], zone_drivers[j]) for i, j in slots]
+
+        # reconciliation pass for the leftovers of all zones
+        matched_passengers = {passenger for passenger, _ in pairs}
+        matched_drivers = {driver for _, driver in pairs}
+        leftover_passengers = [i for i in waiting_passengers if i not in matched_passengers]
+        leftover_idle = [j for j in idle_drivers if j not in matched_drivers]
+        leftover_riding = [j for j in riding_drivers if j not in matched_drivers]
+        pairs += super()._assign(leftover_passengers, leftover_idle, leftover_riding, drivers, passengers, map)
+
+        pairs.sort()
+        return pairs
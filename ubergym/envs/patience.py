@@ -0,0 +1,33 @@
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+
+DISTRIBUTIONS = ['fixed', 'exponential', 'uniform']
+
+
+@dataclass
+class Patience:
+    """
+    Maximum time (in clock units) a passenger waits to be matched before abandoning.
+        fixed: every passenger waits max_wait
+        exponential: waits are exponential with mean max_wait
+        uniform: waits are uniform between 0 and 2 * max_wait
+    """
+    max_wait: float
+    distribution: str = 'fixed'
+    seed: Optional[int] = None
+    rng: np.random.Generator = field(init = False, repr = False)
+
+    def __post_init__(self):
+        if self.distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Unknown patience distribution {self.distribution}')
+        if self.max_wait < 0:
+            raise ValueError("max_wait should be non-negative")
+        self.rng = np.random.default_rng(self.seed)
+
+    def sample(self, n: int) -> np.ndarray:
+        if self.distribution == 'fixed':
+            return np.full(n, float(self.max_wait))
+        if self.distribution == 'exponential':
+            return self.rng.exponential(self.max_wait, size = n)
+        return self.rng.uniform(0, 2 * self.max_wait, size = n)
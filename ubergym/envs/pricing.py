@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Union
+import numpy as np
+
+
+@dataclass
+class PricingContext:
+    """
+    Everything a pricing model can look at when pricing the match requests of one step.
+    All the per-match arrays have one entry per match request.
+    """
+    origins: np.ndarray  # passenger positions
+    destinations: np.ndarray  # passenger destinations
+    distances: np.ndarray  # trip distances from origin to destination
+    waiting_nodes: np.ndarray  # positions of all waiting passengers in this step
+    idle_nodes: np.ndarray  # positions of all idle drivers in this step
+    n_nodes: int
+    time: int
+
+
+class PricingModel:
+    """
+    A pricing model maps a PricingContext to one value per match request.
+    The mean price of a match request is the product of the values of all models of the Pricer.
+    """
+
+    def __call__(self, context: PricingContext) -> np.ndarray:
+        raise NotImplementedError
+
+
+@dataclass
+class DistancePricing(PricingModel):
+    # mean price is proportional to the trip distance
+    mean_price_per_distance: float
+
+    def __call__(self, context: PricingContext) -> np.ndarray:
+        return self.mean_price_per_distance * context.distances
+
+
+@dataclass
+class SurgePricing(PricingModel):
+    # zones[node] is the zone of the node, if None every node is its own zone
+    zones: Optional[np.ndarray] = None
+    sensitivity: float = 0.5
+    max_multiplier: float = 3.0
+
+    def __call__(self, context: PricingContext) -> np.ndarray:
+        zones = np.arange(context.n_nodes) if self.zones is None else np.asarray(self.zones)
+        n_zones = int(zones.max()) + 1
+
+        waiting = np.bincount(zones[context.waiting_nodes], minlength = n_zones)
+        idle = np.bincount(zones[context.idle_nodes], minlength = n_zones)
+
+        # multiplier grows with the excess of waiting passengers over idle drivers in the zone
+        excess = (waiting - idle) / np.maximum(idle, 1)
+        multiplier = np.clip(1.0 + self.sensitivity * excess, 1.0, self.max_multiplier)
+        return multiplier[zones[context.origins]]
+
+
+@dataclass
+class TimeOfDayPricing(PricingModel):
+    # curve holds equally spaced multipliers over one period of the simulation clock, interpolated in between
+    curve: Sequence[float]
+    period: int
+
+    def __call__(self, context: PricingContext) -> np.ndarray:
+        curve = np.asarray(self.curve, dtype = np.float64)
+        xp = np.arange(len(curve)) * self.period / len(curve)
+        multiplier = np.interp(context.time, xp, curve, period = self.period)
+        return np.full(len(context.origins), multiplier)
+
+
+@dataclass
+class Pricer:
+    models: List[PricingModel]
+    variance_per_price: float
+    # a Generator, e.g. the pricing stream env.rngs["pricing"] of Uber, is used as is
+    seed: Optional[Union[int, np.random.Generator]] = None
+    rng: np.random.Generator = field(init = False, repr = False)
+
+    def __post_init__(self):
+        self.rng = np.random.default_rng(self.seed)
+
+    def price(self, context: PricingContext) -> np.ndarray:
+        """
+        Prices all the match requests of a step at once.
+        """
+        mean_price = np.ones(len(context.origins))
+        for model in self.models:
+            mean_price = mean_price * model(context)
+
+        variance_price = self.variance_per_price * mean_price
+        return np.maximum(0.0, self.rng.normal(mean_price, variance_price))
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import functools
+import threading
+import time
+import numpy as np
+
+
+@dataclass
+class StepProfiler:
+    """
+    Per-step timings and counters over a rolling window of the last window steps.
+    Timings are recorded by wrapping functions with wrap, which adds the wall time of every call to the metric of the
+    current step, and counters with set. end_step closes the step and returns its metrics.
+    Metrics that were not recorded on a step (e.g. the matcher on a step without matching) are NaN for that step.
+    Nothing is wrapped unless a profiler is given, so an environment without one runs the uninstrumented code.
+    The metrics are only recorded by the thread that ends the steps, a function run in another thread is wrapped
+    with capture and its metrics are replayed by that thread when it collects the result.
+    """
+    window: int = 1000
+    bins: int = 20
+
+    def __post_init__(self):
+        # recordings of the functions running under capture in the current thread, None outside of capture
+        self._captured = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.history: Dict[str, np.ndarray] = {}
+        self.steps = 0
+        self.current: Dict[str, float] = {}
+        self.last: Dict[str, float] = {}
+
+    def wrap(self, name: str, function: Callable) -> Callable:
+        """
+        Returns function timed into the metric name, in seconds.
+        """
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+    def add(self, name: str, value: float):
+        captured = getattr(self._captured, "recordings", None)
+        if captured is not None:
+            captured.append(("add", name, value))
+            return
+        self.current[name] = self.current.get(name, 0.0) + value
+
+    def set(self, name: str, value: float):
+        captured = getattr(self._captured, "recordings", None)
+        if captured is not None:
+            captured.append(("set", name, value))
+            return
+        self.current[name] = float(value)
+
+    def capture(self, function: Callable) -> Callable:
+        """
+        Returns function returning (result, recordings), with the metrics recorded during the call kept in
+        recordings instead of the current step, to run function in a worker thread and replay them later.
+        """
+        @functools.wraps(function)
+        def captured(*args, **kwargs):
+            self._captured.recordings = []
+            try:
+                return function(*args, **kwargs), self._captured.recordings
+            finally:
+                self._captured.recordings = None
+        return captured
+
+    def replay(self, recordings: List[Tuple[str, str, float]]):
+        """
+        Records the metrics captured by capture into the current step.
+        """
+        for method, name, value in recordings:
+            getattr(self, method)(name, value)
+
+    def discard(self):
+        """
+        Drops the metrics recorded since the last step, e.g. the ones of a reset.
+        """
+        self.current = {}
+
+    def end_step(self) -> Dict[str, float]:
+        row = self.steps % self.window
+        for name, value in self.current.items():
+            if name not in self.history:
+                self.history[name] = np.full(self.window, np.nan)
+            self.history[name][row] = value
+        for name, values in self.history.items():
+            if name not in self.current:
+                values[row] = np.nan
+
+        self.steps += 1
+        self.last, self.current = self.current, {}
+        return self.last
+
+    def values(self, name: str) -> np.ndarray:
+        """
+        Recorded values of a metric in the window, oldest first, without the steps where it was not recorded.
+        """
+        values = self.history[name]
+        if self.steps > self.window:
+            row = self.steps % self.window
+            values = np.concatenate([values[row:], values[:row]])
+        else:
+            values = values[:self.steps]
+        return values[~np.isnan(values)]
+
+    def histogram(self, name: str, bins: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Counts and bin edges of the values of a metric in the window.
+        """
+        return np.histogram(self.values(name), bins = self.bins if bins is None else bins)
+
+    def histograms(self, bins: Optional[int] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        return {name: self.histogram(name, bins) for name in self.history}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Number of recordings, mean, total, percentiles and maximum of every metric in the window.
+        """
+        summary = {}
+        for name in sorted(self.history):
+            values = self.values(name)
+            if len(values) == 0:
+                continue
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            summary[name] = {
+                "count": len(values),
+                "mean": float(values.mean()),
+                "total": float(values.sum()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(values.max()),
+            }
+        return summary
@@ -0,0 +1,118 @@
+from typing import Optional
+import numpy as np
+import networkx as nx
+
+BACKGROUND = (255, 255, 255)
+ROAD = (200, 200, 200)
+NODE = (150, 150, 150)
+PASSENGER = (220, 40, 40)
+# driver colors by Driver.Status value: IDLE, MATCHING, MATCHED, RIDING, OFF
+DRIVER_COLORS = np.array([
+    (40, 160, 60),
+    (240, 180, 0),
+    (30, 100, 220),
+    (140, 50, 180),
+    (120, 120, 120),
+], dtype = np.uint8)
+
+
+def _disc(radius: int) -> np.ndarray:
+    """
+    (k, 2) pixel offsets (dy, dx) of a disc of the given radius.
+    """
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = dy ** 2 + dx ** 2 <= radius ** 2
+    return np.stack([dy[inside], dx[inside]], axis = 1)
+
+
+class Renderer:
+    """
+    Headless renderer of the simulation as RGB arrays of shape (height, width, 3).
+    The layout of the nodes comes from their pos attribute, or from a spring layout computed once, and the roads and
+    nodes are rasterized once into a background. Every frame copies the background and stamps the nodes with waiting
+    passengers and the drivers, colored by status, with vectorized indexing.
+    """
+    def __init__(self, graph: nx.DiGraph, width: int = 512, height: int = 512, margin: int = 8, node_radius: int = 1, driver_radius: int = 2):
+        self.width = width
+        self.height = height
+        self.margin = margin
+
+        self.node_stamp = _disc(node_radius)
+        self.passenger_stamp = _disc(driver_radius)
+        self.driver_stamp = _disc(driver_radius)
+        self.pixels = self._layout(graph)
+        self.background = self._rasterize(graph)
+        # drivers on the same node are spread around it so that they do not hide each other
+        self.jitter_radius = driver_radius
+        self._jitter: Optional[np.ndarray] = None
+
+    def _layout(self, graph: nx.DiGraph) -> np.ndarray:
+        """
+        (n_nodes, 2) integer pixel coordinates (row, column) of the nodes, indexed by node.
+        """
+        nodes = sorted(graph)
+        if all("pos" in graph.nodes[node] for node in nodes):
+            coords = np.array([graph.nodes[node]["pos"] for node in nodes], dtype = np.float64)
+        else:
+            layout = nx.spring_layout(graph, seed = 0)
+            coords = np.array([layout[node] for node in nodes], dtype = np.float64)
+
+        low, high = coords.min(axis = 0), coords.max(axis = 0)
+        span = np.where(high - low > 0, high - low, 1.0)
+        unit = (coords - low) / span
+        columns = self.margin + unit[:, 0] * (self.width - 1 - 2 * self.margin)
+        # image rows grow downwards
+        rows = self.margin + (1 - unit[:, 1]) * (self.height - 1 - 2 * self.margin)
+        return np.stack([np.rint(rows), np.rint(columns)], axis = 1).astype(np.int64)
+
+    def _rasterize(self, graph: nx.DiGraph) -> np.ndarray:
+        image = np.empty((self.height, self.width, 3), dtype = np.uint8)
+        image[...] = BACKGROUND
+
+        edges = np.array(list(graph.edges()), dtype = np.int64).reshape(-1, 2)
+        if len(edges) > 0:
+            start, end = self.pixels[edges[:, 0]], self.pixels[edges[:, 1]]
+            # one sample per pixel along the longest axis of every edge
+            lengths = np.abs(end - start).max(axis = 1) + 1
+            edge = np.repeat(np.arange(len(edges)), lengths)
+            offsets = np.cumsum(lengths) - lengths
+            t = (np.arange(lengths.sum()) - offsets[edge]) / np.maximum(lengths - 1, 1)[edge]
+            points = np.rint(start[edge] + t[:, None] * (end - start)[edge]).astype(np.int64)
+            image[points[:, 0], points[:, 1]] = ROAD
+
+        self._stamp(image, self.pixels, self.node_stamp, np.array(NODE, dtype = np.uint8))
+        return image
+
+    def _stamp(self, image: np.ndarray, centers: np.ndarray, stamp: np.ndarray, colors: np.ndarray):
+        """
+        Draws stamp at every center, colors is one color for all or one color per center.
+        """
+        points = (centers[:, None, :] + stamp[None, :, :]).reshape(-1, 2)
+        rows = np.clip(points[:, 0], 0, self.height - 1)
+        columns = np.clip(points[:, 1], 0, self.width - 1)
+        if colors.ndim == 2:
+            colors = np.repeat(colors, len(stamp), axis = 0)
+        image[rows, columns] = colors
+
+    def jitter(self, n_drivers: int) -> np.ndarray:
+        if self._jitter is None or len(self._jitter) != n_drivers:
+            angle = np.arange(n_drivers) * 2.399963  # golden angle, spreads consecutive drivers evenly
+            self._jitter = np.rint(np.stack([np.sin(angle), np.cos(angle)], axis = 1) * self.jitter_radius).astype(np.int64)
+        return self._jitter
+
+    def render(self, driver_positions: np.ndarray, driver_statuses: np.ndarray, waiting_counts: np.ndarray) -> np.ndarray:
+        """
+        Frame with the drivers at driver_positions colored by their status values, and a marker on every node with
+        waiting passengers, waiting_counts is the number of waiting passengers per node.
+        """
+        image = self.background.copy()
+
+        waiting_nodes = np.flatnonzero(waiting_counts)
+        if len(waiting_nodes) > 0:
+            self._stamp(image, self.pixels[waiting_nodes], self.passenger_stamp, np.array(PASSENGER, dtype = np.uint8))
+
+        driver_positions = np.asarray(driver_positions, dtype = np.int64)
+        if len(driver_positions) > 0:
+            centers = self.pixels[driver_positions] + self.jitter(len(driver_positions))
+            self._stamp(image, centers, self.driver_stamp, DRIVER_COLORS[np.asarray(driver_statuses, dtype = np.int64)])
+        return image
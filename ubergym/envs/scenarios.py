@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import json, os
+import numpy as np
+
+FORMAT_VERSION = 1
+
+ARRIVAL_DTYPE = np.dtype([("origin", np.int32), ("destination", np.int32)])
+
+
+@dataclass
+class ScenarioBank:
+    """
+    Pre-sampled demand realisations: the passenger arrivals of every step and the initial driver positions of n_scenarios episodes.
+    Uber.reset(options={"scenario": k}) replays scenario k, so that runs that only differ in e.g. the matcher see the same
+    passengers (common random numbers) and no arrivals are sampled in the step loop.
+        arrivals: (origin, destination) of all passengers, ordered by scenario, step and origin
+        offsets: (n_scenarios, num_steps + 2), the arrivals of step s of scenario k are arrivals[offsets[k, s]:offsets[k, s + 1]]
+        driver_positions: (n_scenarios, n_drivers) initial positions, an environment with fewer drivers uses the first ones
+    """
+    arrivals: np.ndarray
+    offsets: np.ndarray
+    driver_positions: np.ndarray
+    n_nodes: int
+
+    def __post_init__(self):
+        if self.offsets.shape[0] != self.driver_positions.shape[0]:
+            raise ValueError("offsets and driver_positions should have one row per scenario")
+
+    @property
+    def n_scenarios(self) -> int:
+        return self.offsets.shape[0]
+
+    @property
+    def num_steps(self) -> int:
+        # step 0 holds the arrivals at reset
+        return self.offsets.shape[1] - 2
+
+    @property
+    def n_drivers(self) -> int:
+        return self.driver_positions.shape[1]
+
+    def __len__(self) -> int:
+        return self.n_scenarios
+
+    def step_arrivals(self, scenario: int, step: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Origins and destinations of the passengers spawned at step (in steps, not in clock time) of scenario.
+        """
+        arrivals = self.arrivals[self.offsets[scenario, step]:self.offsets[scenario, step + 1]]
+        return arrivals["origin"], arrivals["destination"]
+
+    @classmethod
+    def generate(
+        cls,
+        n_scenarios: int,
+        passenger_generation_probabilities: np.ndarray,
+        n_drivers: int,
+        num_steps: int,
+        seed: Optional[int] = None,
+        path: Optional[str] = None) -> 'ScenarioBank':
+        """
+        Samples n_scenarios episodes from the arrival process of Uber: on every step a passenger spawns at node i with
+        probability passenger_generation_probabilities[i], with a destination drawn uniformly among the other nodes.
+        Every scenario and the driver positions have their own random stream derived from seed, so scenario k does not
+        depend on n_scenarios, driver i does not depend on n_drivers, and banks with different probabilities but the same
+        seed draw the same uniforms. With path, the bank is saved there and returned memory-mapped.
+        """
+        probabilities = np.asarray(passenger_generation_probabilities, dtype = np.float64)
+        n_nodes = len(probabilities)
+        if n_nodes < 2:
+            raise ValueError("scenarios need at least two nodes")
+
+        positions_seed, *scenario_seeds = np.random.SeedSequence(seed).spawn(n_scenarios + 1)
+
+        arrivals, offsets = [], np.zeros((n_scenarios, num_steps + 2), dtype = np.int64)
+        total = 0
+        for k, scenario_seed in enumerate(scenario_seeds):
+            rng = np.random.default_rng(scenario_seed)
+            spawned = rng.random((num_steps + 1, n_nodes)) < probabilities
+            # destinations are drawn for every (step, node) so that they do not depend on the probabilities
+            destinations = rng.integers(0, n_nodes - 1, size = (num_steps + 1, n_nodes))
+            steps, origins = np.nonzero(spawned)
+            destinations = destinations[steps, origins]
+            destinations += destinations >= origins
+
+            scenario = np.empty(len(origins), dtype = ARRIVAL_DTYPE)
+            scenario["origin"] = origins
+            scenario["destination"] = destinations
+            arrivals.append(scenario)
+
+            offsets[k, 1:] = total + np.cumsum(np.bincount(steps, minlength = num_steps + 1))
+            offsets[k, 0] = total
+            total += len(origins)
+
+        # driver i draws its positions for all scenarios from its own stream
+        driver_positions = np.array(
+            [np.random.default_rng(s).integers(0, n_nodes, size = n_scenarios) for s in positions_seed.spawn(n_drivers)],
+            dtype = np.int32,
+        ).reshape(n_drivers, n_scenarios).T
+
+        bank = cls(
+            arrivals = np.concatenate(arrivals) if arrivals else np.zeros(0, dtype = ARRIVAL_DTYPE),
+            offsets = offsets,
+            driver_positions = np.ascontiguousarray(driver_positions),
+            n_nodes = n_nodes,
+        )
+        if path is None:
+            return bank
+        bank.save(path)
+        return cls.load(path)
+
+    def save(self, path: str):
+        """
+        Saves the bank to the directory path as arrivals.npy, offsets.npy, driver_positions.npy and a meta.json.
+        """
+        os.makedirs(path, exist_ok = True)
+        np.save(os.path.join(path, 'arrivals.npy'), self.arrivals)
+        np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'driver_positions.npy'), self.driver_positions)
+
+        meta = {"version": FORMAT_VERSION, "n_nodes": self.n_nodes}
+        # meta.json is written last so that a directory with a meta.json is complete
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent = 2)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> 'ScenarioBank':
+        """
+        Loads a bank saved with save, memory-mapped read-only by default so that processes replaying it share the pages.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        if meta["version"] > FORMAT_VERSION:
+            raise ValueError(f'scenario bank format version {meta["version"]} is newer than the supported version {FORMAT_VERSION}')
+
+        return cls(
+            arrivals = np.load(os.path.join(path, 'arrivals.npy'), mmap_mode = mmap_mode),
+            offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode = mmap_mode),
+            driver_positions = np.load(os.path.join(path, 'driver_positions.npy'), mmap_mode = mmap_mode),
+            n_nodes = meta["n_nodes"],
+        )
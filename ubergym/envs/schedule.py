@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class MatchingSchedule:
+    """
+    Decides on which steps the matcher is called. Matching happens when any of the conditions holds
+    and there is at least one waiting passenger. The default schedule matches on every step.
+    """
+    every: int = 1  # match every k steps
+    max_queue: Optional[int] = None  # match when at least this many passengers are waiting
+    max_wait: Optional[int] = None  # match when the oldest waiting passenger waited at least this long (in clock units)
+
+    def __post_init__(self):
+        if self.every < 1:
+            raise ValueError("every should be a positive integer")
+
+    def should_match(self, step: int, n_waiting: int, oldest_wait: int) -> bool:
+        if n_waiting == 0:
+            return False
+        if step % self.every == 0:
+            return True
+        if self.max_queue is not None and n_waiting >= self.max_queue:
+            return True
+        if self.max_wait is not None and oldest_wait >= self.max_wait:
+            return True
+        return False
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+import numpy as np
+
+
+class ShiftIndex:
+    """
+    Compact index of the drivers on shift. order is a permutation of the drivers whose first n_active entries are
+    the drivers on shift, and slot[i] is the position of driver i in order, so that drivers log on and off in O(1)
+    by swapping entries and active is a view of the drivers on shift.
+    """
+    def __init__(self, on_shift: np.ndarray):
+        on_shift = np.asarray(on_shift, dtype = bool)
+        self.order = np.concatenate([np.flatnonzero(on_shift), np.flatnonzero(~on_shift)])
+        self.slot = np.empty(len(self.order), dtype = np.int64)
+        self.slot[self.order] = np.arange(len(self.order))
+        self.n_active = int(on_shift.sum())
+
+    def __len__(self) -> int:
+        return self.n_active
+
+    @property
+    def active(self) -> np.ndarray:
+        return self.order[:self.n_active]
+
+    @property
+    def inactive(self) -> np.ndarray:
+        return self.order[self.n_active:]
+
+    def is_active(self, driver: int) -> bool:
+        return self.slot[driver] < self.n_active
+
+    def _move(self, driver: int, position: int):
+        # swaps driver with the driver at position in order
+        other = self.order[position]
+        self.order[self.slot[driver]], self.order[position] = other, driver
+        self.slot[other], self.slot[driver] = self.slot[driver], position
+
+    def log_on(self, driver: int):
+        if not self.is_active(driver):
+            self._move(driver, self.n_active)
+            self.n_active += 1
+
+    def log_off(self, driver: int):
+        if self.is_active(driver):
+            self._move(driver, self.n_active - 1)
+            self.n_active -= 1
+
+
+class ShiftModel:
+    """
+    A shift model decides when drivers log on and off. reset gives the drivers on shift at the start of an episode,
+    and update, called on every step, the drivers logging on and off at that step. Uber keeps drivers with a trip
+    or a pending match request on shift until they are idle.
+    """
+
+    def reset(self, n_drivers: int, rng: np.random.Generator) -> np.ndarray:
+        raise NotImplementedError
+
+    def update(self, step: int, index: ShiftIndex, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+
+@dataclass
+class ShiftSchedule(ShiftModel):
+    """
+    Fixed shifts, driver i is on shift from step starts[i] for durations[i] steps. With a period, the shifts repeat
+    every period steps (e.g. daily shifts), and a shift may run over the end of the period.
+    Every step only looks up the drivers whose shift starts or ends at that step.
+    """
+    starts: Sequence[int]
+    durations: Sequence[int]
+    period: Optional[int] = None
+
+    def __post_init__(self):
+        self.starts = np.asarray(self.starts, dtype = np.int64)
+        self.durations = np.asarray(self.durations, dtype = np.int64)
+        if self.starts.shape != self.durations.shape:
+            raise ValueError("starts and durations should have the same length")
+        if np.any(self.durations < 0) or (self.period is not None and np.any(self.durations > self.period)):
+            raise ValueError("durations should be between 0 and period")
+
+        # drivers sorted by the phase (step, or step in the period) of their shift starts and ends
+        self._on_phases, self._on_drivers = self._events(self.starts)
+        self._off_phases, self._off_drivers = self._events(self.starts + self.durations)
+
+    def _events(self, steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        phases = steps if self.period is None else steps % self.period
+        order = np.argsort(phases, kind = "stable")
+        return phases[order], order
+
+    def _at(self, phases: np.ndarray, drivers: np.ndarray, step: int) -> np.ndarray:
+        phase = step if self.period is None else step % self.period
+        return drivers[np.searchsorted(phases, phase, side = "left"):np.searchsorted(phases, phase, side = "right")]
+
+    def on_shift(self, step: int) -> np.ndarray:
+        elapsed = step - self.starts
+        if self.period is not None:
+            elapsed = elapsed % self.period
+        return (elapsed >= 0) & (elapsed < self.durations)
+
+    def reset(self, n_drivers: int, rng: np.random.Generator) -> np.ndarray:
+        if len(self.starts) != n_drivers:
+            raise ValueError("the schedule should have one shift per driver")
+        return self.on_shift(0)
+
+    def update(self, step: int, index: ShiftIndex, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        log_on = self._at(self._on_phases, self._on_drivers, step)
+        log_off = self._at(self._off_phases, self._off_drivers, step)
+        # zero length shifts start and end at the same step
+        if len(log_on) > 0 and len(log_off) > 0:
+            both = np.intersect1d(log_on, log_off)
+            log_on, log_off = np.setdiff1d(log_on, both), np.setdiff1d(log_off, both)
+        return log_on, log_off
+
+
+@dataclass
+class StochasticShifts(ShiftModel):
+    """
+    Drivers log on and off at random, on every step each driver off shift logs on with probability log_on and each
+    driver on shift logs off with probability log_off, so that a fraction log_on / (log_on + log_off) of the fleet
+    is on shift in the long run. initial_fraction of the drivers is on shift at the start.
+    The number of drivers logging on and off is drawn first, so a step costs O(changes) and not O(drivers).
+    """
+    log_on: float
+    log_off: float
+    initial_fraction: Optional[float] = None
+
+    def __post_init__(self):
+        for probability in [self.log_on, self.log_off]:
+            if not 0 <= probability <= 1:
+                raise ValueError("log_on and log_off should be probabilities")
+
+    def reset(self, n_drivers: int, rng: np.random.Generator) -> np.ndarray:
+        fraction = self.initial_fraction
+        if fraction is None:
+            fraction = self.log_on / (self.log_on + self.log_off) if self.log_on + self.log_off > 0 else 1.0
+        return rng.random(n_drivers) < fraction
+
+    def update(self, step: int, index: ShiftIndex, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        inactive, active = index.inactive, index.active
+        n_on = rng.binomial(len(inactive), self.log_on)
+        n_off = rng.binomial(len(active), self.log_off)
+        log_on = inactive[rng.choice(len(inactive), n_on, replace = False)] if n_on > 0 else inactive[:0]
+        log_off = active[rng.choice(len(active), n_off, replace = False)] if n_off > 0 else active[:0]
+        # copies, since the index changes as the drivers log on and off
+        return log_on.copy(), log_off.copy()
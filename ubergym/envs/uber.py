@@ -3,58 +3,94 @@ from gym import spaces
 
 import networkx as nx
 import numpy as np
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from collections import OrderedDict
-import logging, sys
+import logging, sys, time, heapq
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from ubergym.envs.maps import Map
+from ubergym.envs.graphs import CompiledGraph
 from ubergym.envs.actors import Driver, Passenger
 from ubergym.envs.matcher import Matcher
+from ubergym.envs.pricing import Pricer, DistancePricing
+from ubergym.envs.schedule import MatchingSchedule
+from ubergym.envs.scenarios import ScenarioBank
+from ubergym.envs.demand import TripDemand
+from ubergym.envs.patience import Patience
+from ubergym.envs.kpis import KPIs
+from ubergym.envs.shifts import ShiftIndex, ShiftModel
+from ubergym.envs.profiler import StepProfiler
+from ubergym.envs.rendering import Renderer
 from ubergym.envs.match_request import MatchRequest
 import ubergym.envs.constants as constants
 
-# logging config
-logging.basicConfig(
-    format='%(message)s',
-    filename='logs.log',
-    level=logging.INFO,
-)
+# the simulation messages are logged at INFO level, the application configures where they go
+logger = logging.getLogger(__name__)
 
 class Uber(gym.Env):
     metadata = constants.simulation["metadata"]
     matcher_metadata = constants.simulation["matcher_metadata"]
+    # every random component draws from its own generator, new streams are appended so that the others keep their seeds
+    random_streams = ["arrivals", "destinations", "placement", "pricing", "patience", "agents", "shifts"]
     
     def __init__(
         self, 
         n_drivers: int, 
-        passenger_generation_probabilities: np.ndarray, 
-        graph: nx.DiGraph, 
+        passenger_generation_probabilities: Optional[np.ndarray], 
+        graph: Union[nx.DiGraph, CompiledGraph, Map], 
         num_steps: Optional[int] = constants.simulation["num_steps"], 
         matcher_type: Optional[str] = None, 
         is_logging: Optional[bool] = constants.simulation["is_logging"], 
         seed: Optional[int] = None, 
-        render_mode: Optional[str] = None) -> None:
+        render_mode: Optional[str] = None,
+        pricing_models: Optional[List] = None,
+        matcher: Optional[Matcher] = None,
+        matching_schedule: Optional[MatchingSchedule] = None,
+        matcher_cache_size: int = 0,
+        async_matching: bool = False,
+        scenarios: Optional[ScenarioBank] = None,
+        profiler: Optional[StepProfiler] = None,
+        demand: Optional[TripDemand] = None,
+        patience: Optional[Patience] = None,
+        kpis: Optional[KPIs] = None,
+        shifts: Optional[ShiftModel] = None) -> None:
         
         if not(render_mode is None or render_mode in self.metadata["render_modes"]):
             raise ValueError(f"render_mode {render_mode} is not supported")
 
         self.render_mode = render_mode
+        # built on the first rendered frame, the layout and the road raster are reused for the whole life of the env
+        self.renderer: Optional[Renderer] = None
         self.is_logging = is_logging
         self.messages = []
 
-        self.SEED = seed
-        np.random.seed(self.SEED)
+        self._seed(seed)
         
         self.n_drivers = n_drivers
 
-        self.edge_weight = self._check_graph(graph)
-        
-        self.map = Map(graph)
+        # a Map from Map.compile is already checked, other graphs are checked (once per graph) and compiled here
+        if isinstance(graph, Map) and graph.edge_weight is None:
+            graph = graph.graph
+        self.map = graph if isinstance(graph, Map) else Map.compile(graph)
+        self.edge_weight = self.map.edge_weight
 
-        if len(passenger_generation_probabilities) != len(self.map):
+        # replayed trips replace the per-node arrival probabilities, which are then optional
+        if demand is None and passenger_generation_probabilities is None:
+            raise ValueError("passenger_generation_probabilities must be given without a demand")
+        if passenger_generation_probabilities is not None and len(passenger_generation_probabilities) != len(self.map):
             raise ValueError("passenger_generation_probabilities must have length equal to the number of nodes in the graph")
         
         self.passenger_generation_probabilities = passenger_generation_probabilities
+        self.demand = demand
+
+        # pre-sampled episodes replayed with reset(options={"scenario": k})
+        if scenarios is not None:
+            if scenarios.n_nodes != len(self.map):
+                raise ValueError("scenarios must be sampled on a graph with the same number of nodes")
+            if scenarios.n_drivers < self.n_drivers:
+                raise ValueError("scenarios must have initial positions for at least n_drivers drivers")
+        self.scenarios = scenarios
+        self.scenario: Optional[int] = None
 
         self.observation_space = spaces.Dict(
             {
@@ -72,15 +108,37 @@ class Uber(gym.Env):
         self.step_count = constants.simulation["step_count"]
         self.step_size = self.edge_weight
         self.num_steps = num_steps
+        if self.scenarios is not None and self.scenarios.num_steps < self.num_steps:
+            raise ValueError("scenarios must have arrivals for at least num_steps steps")
 
         # initialize drivers and passengers
         self.drivers: List[Driver] = []
+        positions = self.map.random_nodes(self.n_drivers, self.rngs["placement"])
         for i in range(self.n_drivers):
-            self.drivers.append(Driver(last_move = self.step_count, name = i, position = self.map.random_node(), status = Driver.Status.IDLE))
+            self.drivers.append(Driver(last_move = self.step_count, name = i, position = int(positions[i]), status = Driver.Status.IDLE))
 
         self.passengers: List[Passenger] = []
 
-        # initialize matcher
+        # with a patience, waiting passengers abandon after their maximum wait, expired from a heap of (deadline, passenger)
+        self.patience = patience
+        if self.patience is not None:
+            self.patience.rng = self.rngs["patience"]
+        self._deadlines: List[Tuple[float, int]] = []
+        self.abandoned_passengers = 0
+        self.step_abandoned_passengers = 0
+
+        # episode KPIs are updated on every event instead of being recomputed from the passengers and drivers
+        self.kpis = kpis if kpis is not None else KPIs()
+        self.kpis.reset(len(self.map), self.n_drivers, self.step_count, self.step_size)
+
+        # n_drivers is the capacity of the fleet, with shifts only the drivers on shift act, are observed and are matched
+        self.shifts = shifts
+        self._start_shifts()
+
+        # initialize matcher, a given matcher instance (e.g. a PartitionedMatcher) takes precedence over matcher_type
+        if matcher is not None:
+            matcher_type = matcher.method
+
         if not(matcher_type is None or matcher_type in self.matcher_metadata["types"]):
             raise ValueError(f"matcher_type {matcher_type} is not supported")
 
@@ -89,19 +147,60 @@ class Uber(gym.Env):
         self.matcher_type = matcher_type
         self.MEAN_PRICE_PER_DISTANCE = constants.simulation["mean_price_per_distance"]
         self.VARIANCE_PER_PRICE = constants.simulation["variance_per_price"]
-        self.matcher = Matcher(self.matcher_type, self.MEAN_PRICE_PER_DISTANCE, self.VARIANCE_PER_PRICE)
+
+        # the distance-linear model is always applied, extra models (e.g. surge, time of day) multiply it
+        models = [DistancePricing(self.MEAN_PRICE_PER_DISTANCE)] + list(pricing_models or [])
+        self.pricer = Pricer(models = models, variance_per_price = self.VARIANCE_PER_PRICE, seed = self.rngs["pricing"])
+        if matcher is None:
+            matcher = Matcher(self.matcher_type, self.MEAN_PRICE_PER_DISTANCE, self.VARIANCE_PER_PRICE, pricer = self.pricer, cache_size = matcher_cache_size)
+        else:
+            # a given matcher prices with the seeded pricer of the environment, and pricing_models and
+            # matcher_cache_size apply to it as to the matchers built here
+            matcher.pricer = self.pricer
+            if matcher_cache_size > 0:
+                matcher.cache_size = matcher_cache_size
+        self.matcher = matcher
+
+        # the default schedule matches on every step
+        self.matching_schedule = matching_schedule if matching_schedule is not None else MatchingSchedule()
+        self.matcher_invocations = 0
+        self.match_batch_size = 0
+
+        # in asynchronous mode the matching of a step runs in a worker thread while the agents compute their actions,
+        # its match requests are sent one step later than in synchronous mode, whatever the matching_schedule
+        self.async_matching = async_matching
+        self._matching_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_matching: Optional[Future] = None
+
+        # the phases are only wrapped with timers when a profiler is given
+        self.profiler = profiler
+        if self.profiler is not None:
+            self._instrument()
 
     def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool, dict]:
 
+        # the matching started at the end of the previous step only reads the state, so it is joined before any update
+        match_requests = self._join_matching()
         self.step_count += self.step_size
+        self.kpis.tick(self.step_count)
         rewards = self._process_actions(actions)
+        if self.shifts is not None:
+            self._update_shifts()
+        if self.patience is not None:
+            self._expire_passengers()
         self._generate_passengers()
-        self._send_match_requests()
+        if self.async_matching:
+            self._apply_match_requests(match_requests)
+            self._start_matching()
+        else:
+            self._send_match_requests()
         if self.is_logging:
             self._log()
 
         done = self.step_count == self.num_steps * self.step_size
         info = self._get_info()
+        if done and self.kpis.summary_on_done:
+            info["kpis"] = self.kpis.summary()
         observation = self._get_obs()
         return observation, rewards, done, info 
     
@@ -109,19 +208,162 @@ class Uber(gym.Env):
         # We need the following line to seed self.np_random
         super().reset(seed=seed)
 
+        # the streams are seeded once per seed, not on every step, so that steps draw different arrivals
+        if seed is not None:
+            self._seed(seed)
+
+        self.scenario = (options or {}).get("scenario")
+        if self.scenario is not None:
+            if self.scenarios is None:
+                raise ValueError("a scenario can only be replayed by an environment created with scenarios")
+            if not 0 <= self.scenario < len(self.scenarios):
+                raise ValueError(f"scenario should be between 0 and {len(self.scenarios) - 1}")
+
+        self._join_matching()
         self.step_count = 0
+        self.kpis.reset(len(self.map), self.n_drivers, self.step_count, self.step_size)
+        self.matcher_invocations = 0
+        self.match_batch_size = 0
         self.passengers = []
+        self._deadlines = []
+        self.abandoned_passengers = 0
+        self.step_abandoned_passengers = 0
+        if self.demand is not None and self.scenario is None:
+            self.demand.rewind()
         self._generate_passengers()
         self.drivers = []
+        if self.scenario is None:
+            positions = self.map.random_nodes(self.n_drivers, self.rngs["placement"])
+        else:
+            positions = self.scenarios.driver_positions[self.scenario, :self.n_drivers]
         for i in range(self.n_drivers):
-            self.drivers.append(Driver(last_move = self.step_count, name = i, position = self.map.random_node(), status = Driver.Status.IDLE))
+            self.drivers.append(Driver(last_move = self.step_count, name = i, position = int(positions[i]), status = Driver.Status.IDLE))
+        self._start_shifts()
 
         observation = self._get_obs()
         info = self._get_info()
         return (observation, info) if return_info else observation
 
     def render(self):
-        return ()
+        if self.render_mode != "rgb_array":
+            return ()
+        if self.renderer is None:
+            self.renderer = Renderer(self.map.graph)
+        driver_positions = np.fromiter((d.position for d in self.drivers), dtype = np.int64, count = len(self.drivers))
+        driver_statuses = np.fromiter((d.status.value for d in self.drivers), dtype = np.int64, count = len(self.drivers))
+        # passengers waiting for a pickup per node, kept up to date by the KPIs as passengers spawn, are picked up and abandon
+        return self.renderer.render(driver_positions, driver_statuses, self.kpis.waiting.counts)
+
+    def _seed(self, seed: Optional[int]) -> None:
+        """
+        Derives one generator per random component (see random_streams) from seed with SeedSequence.spawn, so that
+        the draws of a component do not depend on when the others draw, e.g. with asynchronous matching, and
+        environments stepped in threads, batches or processes reproduce the serial trajectories.
+        """
+        self.SEED = seed
+        sequences = np.random.SeedSequence(seed).spawn(len(self.random_streams))
+        self.rngs = {name: np.random.default_rng(sequence) for name, sequence in zip(self.random_streams, sequences)}
+        if getattr(self, "pricer", None) is not None:
+            self.pricer.rng = self.rngs["pricing"]
+        if getattr(self, "patience", None) is not None:
+            self.patience.rng = self.rngs["patience"]
+
+    def close(self):
+        self._join_matching()
+        if self._matching_executor is not None:
+            self._matching_executor.shutdown()
+            self._matching_executor = None
+        if hasattr(self.matcher, "close"):
+            self.matcher.close()
+
+    def _instrument(self) -> None:
+        """
+        Replaces step, reset, the phases of step and the phases of the matcher by versions recording into the profiler.
+        Phases: process_actions, update_shifts (with a shift model), expire_passengers (with a patience model),
+        generate_passengers, match (split into match.costs, match.solve, match.decode and match.price), join_matching
+        (waiting for an asynchronous matching), get_obs and step in total. The zone solves of a PartitionedMatcher run
+        in parallel and are timed into match.solve as one call, along with the solve of its reconciliation pass.
+        Counters: waiting_passengers, idle_drivers, match_batch_size, match.matrix_size, match.solver_status,
+        map_cache_hits and map_cache_misses. info["profile"] has the metrics of the step, and the last step of an
+        episode also has info["profile_histograms"] with the histograms of the window, see StepProfiler.
+        With asynchronous matching, the metrics of the match phases are recorded on the step that joins the matching.
+        """
+        profiler = self.profiler
+
+        phases = [
+            ("process_actions", "_process_actions"),
+            ("update_shifts", "_update_shifts"),
+            ("expire_passengers", "_expire_passengers"),
+            ("generate_passengers", "_generate_passengers"),
+            ("match", "_generate_match_requests"),
+            ("join_matching", "_join_matching"),
+            ("get_obs", "_get_obs"),
+        ]
+        for name, method in phases:
+            setattr(self, method, profiler.wrap(name, getattr(self, method)))
+
+        matcher = self.matcher
+        costs, minimize_costs = matcher._costs, matcher.minimize_costs
+
+        def counted_costs(*args, **kwargs):
+            matrix = costs(*args, **kwargs)
+            profiler.add("match.matrix_size", matrix.size)
+            return matrix
+
+        def counted_minimize_costs(*args, **kwargs):
+            solution = minimize_costs(*args, **kwargs)
+            if matcher.solver_status is not None:
+                profiler.set("match.solver_status", matcher.solver_status)
+            return solution
+
+        matcher._costs = profiler.wrap("match.costs", counted_costs)
+        matcher.minimize_costs = profiler.wrap("match.solve", counted_minimize_costs)
+        if hasattr(matcher, "_solve_zones"):
+            solve_zones = matcher._solve_zones
+
+            def counted_solve_zones(*args, **kwargs):
+                solutions = solve_zones(*args, **kwargs)
+                if matcher.solver_status is not None:
+                    profiler.set("match.solver_status", matcher.solver_status)
+                return solutions
+
+            matcher._solve_zones = profiler.wrap("match.solve", counted_solve_zones)
+        matcher._decode = profiler.wrap("match.decode", matcher._decode)
+        matcher._price = profiler.wrap("match.price", matcher._price)
+
+        step, reset = self.step, self.reset
+        cache_info = getattr(self.map.distance, "cache_info", None)
+        cache = [0, 0]
+
+        def profiled_step(actions):
+            start = time.perf_counter()
+            observation, rewards, done, info = step(actions)
+            profiler.set("step", time.perf_counter() - start)
+
+            profiler.set("waiting_passengers", sum(p.status == Passenger.Status.WAITING for p in self.passengers))
+            profiler.set("idle_drivers", sum(d.status == Driver.Status.IDLE for d in self.drivers))
+            profiler.set("match_batch_size", self.match_batch_size)
+            if cache_info is not None:
+                hits, misses = cache_info()[:2]
+                profiler.set("map_cache_hits", hits - cache[0])
+                profiler.set("map_cache_misses", misses - cache[1])
+                cache[:] = hits, misses
+
+            info["profile"] = profiler.end_step()
+            if done:
+                info["profile_histograms"] = profiler.histograms()
+            return observation, rewards, done, info
+
+        def profiled_reset(*args, **kwargs):
+            result = reset(*args, **kwargs)
+            # the phases run by reset are not part of any step
+            profiler.discard()
+            if cache_info is not None:
+                cache[:] = cache_info()[:2]
+            return result
+
+        self.step = profiled_step
+        self.reset = profiled_reset
 
     def _process_actions(self, actions: np.ndarray) -> np.ndarray:
         """
@@ -132,7 +374,8 @@ class Uber(gym.Env):
 
         rewards = np.zeros(self.n_drivers)
 
-        for i in range(self.n_drivers):
+        # the actions of the drivers off shift are ignored
+        for i in self.active_drivers.active.tolist():
             d = self.drivers[i]
             a = actions[i]
             if d.status in [Driver.Status.IDLE, Driver.Status.MATCHED, Driver.Status.RIDING]:
@@ -156,6 +399,8 @@ class Uber(gym.Env):
             p.status = Passenger.Status.WAITING
             p.driver = None
             reward += constants.simulation["rewards"]["reject_match"]
+            self.kpis.respond(False)
+            self.kpis.driver_status(Driver.Status.MATCHING, d.status)
         
         elif a != 1:
             reward += constants.simulation["rewards"]["invalid_action"]
@@ -174,6 +419,11 @@ class Uber(gym.Env):
             if d.position == p.position:
                 p.status = Passenger.Status.RIDING
                 d.status = Driver.Status.RIDING
+                p.picked_up_at = self.step_count
+                self.kpis.pickup(p.position, p.picked_up_at - p.spawned_at)
+
+            self.kpis.respond(True)
+            self.kpis.driver_status(Driver.Status.MATCHING, d.status)
 
         self._log_match(i, a)
         return reward
@@ -217,6 +467,8 @@ class Uber(gym.Env):
                 arrival = True
                 passenger = d.passenger
                 reward += d.match_request.price * constants.simulation["rewards"]["arrive"]
+                self.kpis.arrive(driver, self.step_count - p.picked_up_at, d.match_request.price)
+                self.kpis.driver_status(d.status, Driver.Status.IDLE)
                 d.match_request = None
                 d.status = Driver.Status.IDLE
                 d.passenger = None
@@ -233,6 +485,8 @@ class Uber(gym.Env):
                 p.status = Passenger.Status.RIDING
                 d.status = Driver.Status.RIDING
                 p.picked_up_at = self.step_count
+                self.kpis.pickup(p.position, p.picked_up_at - p.spawned_at)
+                self.kpis.driver_status(Driver.Status.MATCHED, d.status)
 
         self._log_move(driver, prev_position, new_position, arrival, pickup, passenger)
 
@@ -242,13 +496,71 @@ class Uber(gym.Env):
         """
         Get an observation from the current state.
         """
-        d = OrderedDict()
-        d['state'] = np.array([d.status.value for d in self.drivers])
-        d['position'] = np.array([d.position for d in self.drivers])
-        d['passenger_destination'] = np.array([self.passengers[d.passenger].destination if d.passenger is not None else 0 for d in self.drivers])
-        d['passenger_position'] = np.array([self.passengers[d.passenger].position if d.passenger is not None else 0 for d in self.drivers])
-        d['price'] = np.array([d.match_request.price if d.match_request is not None else 0 for d in self.drivers])
-        return d
+        self._update_observation(self.active_drivers.active)
+        return OrderedDict((feature, values.copy()) for feature, values in self._observation.items())
+
+    def _update_observation(self, indices: np.ndarray) -> None:
+        """
+        Writes the features of the given drivers into the observation arrays, the rows of the other drivers are kept.
+        """
+        indices = indices.tolist()
+        drivers = [self.drivers[i] for i in indices]
+        observation = self._observation
+        observation['state'][indices] = [d.status.value for d in drivers]
+        observation['position'][indices] = [d.position for d in drivers]
+        observation['passenger_destination'][indices] = [self.passengers[d.passenger].destination if d.passenger is not None else 0 for d in drivers]
+        observation['passenger_position'][indices] = [self.passengers[d.passenger].position if d.passenger is not None else 0 for d in drivers]
+        observation['price'][indices] = [d.match_request.price if d.match_request is not None else 0 for d in drivers]
+
+    def _start_shifts(self) -> None:
+        """
+        Puts the drivers off shift at the start of an episode in the OFF status and builds the active driver index
+        and the observation arrays.
+        """
+        on_shift = np.ones(self.n_drivers, dtype = bool) if self.shifts is None else self.shifts.reset(self.n_drivers, self.rngs["shifts"])
+        self.active_drivers = ShiftIndex(on_shift)
+        # drivers asked to log off during a trip or a match request log off when they are idle again
+        self._pending_log_off = set()
+        for i in self.active_drivers.inactive.tolist():
+            self.drivers[i].status = Driver.Status.OFF
+            self.kpis.driver_status(Driver.Status.IDLE, Driver.Status.OFF)
+
+        self._observation = OrderedDict(
+            (feature, np.zeros(self.n_drivers, dtype = np.float64 if feature == 'price' else np.int64))
+            for feature in ['state', 'position', 'passenger_destination', 'passenger_position', 'price']
+        )
+        self._update_observation(np.arange(self.n_drivers))
+
+    def _update_shifts(self) -> None:
+        """
+        Logs drivers on and off following the shift model, only the drivers changing shift are touched.
+        """
+        log_on, log_off = self.shifts.update(self.step_count // self.step_size, self.active_drivers, self.rngs["shifts"])
+        self._pending_log_off.update(log_off.tolist())
+
+        for i in log_on.tolist():
+            if i in self._pending_log_off:
+                self._pending_log_off.discard(i)
+            elif not self.active_drivers.is_active(i):
+                d = self.drivers[i]
+                self.kpis.driver_status(d.status, Driver.Status.IDLE)
+                d.status = Driver.Status.IDLE
+                d.last_move = self.step_count
+                self.active_drivers.log_on(i)
+                self._log_shift(i, True)
+
+        for i in list(self._pending_log_off):
+            d = self.drivers[i]
+            if not self.active_drivers.is_active(i):
+                self._pending_log_off.discard(i)
+            elif d.status == Driver.Status.IDLE:
+                self.kpis.driver_status(d.status, Driver.Status.OFF)
+                d.status = Driver.Status.OFF
+                self.active_drivers.log_off(i)
+                self._pending_log_off.discard(i)
+                # the observation is only updated for the drivers on shift
+                self._update_observation(np.array([i]))
+                self._log_shift(i, False)
 
     def _get_info(self) -> dict:
         """
@@ -256,73 +568,166 @@ class Uber(gym.Env):
         """
         info = {}
         info["step_count"] = self.step_count
+        info["matcher_invocations"] = self.matcher_invocations
+        info["match_batch_size"] = self.match_batch_size
+        if self.shifts is not None:
+            info["active_drivers"] = len(self.active_drivers)
+        if self.patience is not None:
+            info["abandoned_passengers"] = self.abandoned_passengers
+            info["step_abandoned_passengers"] = self.step_abandoned_passengers
+        if self.matcher.cache_size > 0:
+            info["matcher_cache_hits"] = self.matcher.cache_hits
+            info["matcher_cache_misses"] = self.matcher.cache_misses
         return info
 
     def _generate_passengers(self) -> None:
 
-        np.random.seed(self.SEED)
-        
-        for i in range(len(self.map)):
-            if np.random.random() < self.passenger_generation_probabilities[i]:
-                destination = self.map.random_node()
-                while destination == i:
-                    destination = self.map.random_node()
-                name = len(self.passengers)
-                self.passengers.append(Passenger(name = name, position = i, destination = destination, status = Passenger.Status.WAITING, spawned_at = self.step_count))
-                self._log_passenger_generation(name, i, destination)
-        return
+        # a replayed scenario slices the pre-sampled arrivals of the step
+        if self.scenario is not None:
+            self._add_passengers(*self.scenarios.step_arrivals(self.scenario, self.step_count // self.step_size))
+            return
+
+        # replayed trips are read from the cursor of the demand up to the current time
+        if self.demand is not None:
+            self._add_passengers(*self.demand.arrivals(self.step_count))
+            return
+
+        # one arrival draw per node and one destination draw per passenger, each from its own stream
+        n = len(self.map)
+        origins = np.flatnonzero(self.rngs["arrivals"].random(n) < self.passenger_generation_probabilities)
+        # uniform over the nodes other than the origin: draw among n - 1 nodes and skip the origin
+        destinations = self.rngs["destinations"].integers(0, n - 1, size = len(origins))
+        destinations += destinations >= origins
+        self._add_passengers(origins, destinations)
+
+    def _add_passengers(self, origins: np.ndarray, destinations: np.ndarray) -> None:
+        """
+        Spawn waiting passengers at origins going to destinations.
+        """
+        first = len(self.passengers)
+        for origin, destination in zip(origins, destinations):
+            name = len(self.passengers)
+            self.passengers.append(Passenger(name = name, position = int(origin), destination = int(destination), status = Passenger.Status.WAITING, spawned_at = self.step_count))
+            self.kpis.spawn(int(origin))
+            self._log_passenger_generation(name, int(origin), int(destination))
+
+        if self.patience is not None and len(self.passengers) > first:
+            waits = self.patience.sample(len(self.passengers) - first)
+            for name, wait in zip(range(first, len(self.passengers)), waits):
+                heapq.heappush(self._deadlines, (self.step_count + float(wait), name))
+
+    def _expire_passengers(self) -> None:
+        """
+        Waiting passengers whose wait exceeds their patience abandon. Passengers are popped from the deadline heap,
+        so the cost only depends on the number of expired deadlines.
+        """
+        self.step_abandoned_passengers = 0
+        retry = []
+        while self._deadlines and self._deadlines[0][0] < self.step_count:
+            deadline, name = heapq.heappop(self._deadlines)
+            p = self.passengers[name]
+            if p.status == Passenger.Status.WAITING:
+                p.status = Passenger.Status.ABANDONED
+                p.abandoned_at = self.step_count
+                self.step_abandoned_passengers += 1
+                self.kpis.abandon(p.position)
+                self._log_abandonment(name)
+            elif p.status == Passenger.Status.MATCHING:
+                # a passenger whose match request is pending abandons if it is rejected
+                retry.append((deadline, name))
+
+        # retried on the next step, when the driver has answered
+        for entry in retry:
+            heapq.heappush(self._deadlines, entry)
+        self.abandoned_passengers += self.step_abandoned_passengers
 
     def _send_match_requests(self) -> None:
 
-        match_requests = self._generate_match_requests()
+        if not self._schedule_matching():
+            return
+
+        self._apply_match_requests(self._generate_match_requests())
+
+    def _schedule_matching(self) -> bool:
+        """
+        Decide whether the matcher is called on this step and update the matching counters.
+        """
+        self.match_batch_size = 0
+
+        waiting = [p.spawned_at for p in self.passengers if p.status == Passenger.Status.WAITING]
+        oldest_wait = self.step_count - min(waiting) if waiting else 0
+        if not self.matching_schedule.should_match(self.step_count // self.step_size, len(waiting), oldest_wait):
+            return False
+
+        self.matcher_invocations += 1
+        self.match_batch_size = len(waiting)
+        return True
+
+    def _start_matching(self) -> None:
+        """
+        Start matching the current state in the worker thread, the result is applied in the next step.
+        """
+        if not self._schedule_matching():
+            return
+
+        if self._matching_executor is None:
+            self._matching_executor = ThreadPoolExecutor(max_workers = 1)
+        task = self._generate_match_requests
+        if self.profiler is not None:
+            # the worker does not record into the profiler while the main thread ends the step, its metrics are
+            # replayed on the step that joins it
+            task = self.profiler.capture(task)
+        self._pending_matching = self._matching_executor.submit(task)
+
+    def _join_matching(self) -> List[MatchRequest]:
+        """
+        Wait for the pending asynchronous matching, if any, and return its match requests.
+        """
+        if self._pending_matching is None:
+            return []
+
+        match_requests = self._pending_matching.result()
+        self._pending_matching = None
+        if self.profiler is not None:
+            match_requests, recordings = match_requests
+            self.profiler.replay(recordings)
+        return match_requests
+
+    def _apply_match_requests(self, match_requests: List[MatchRequest]) -> None:
+
         for match_request in match_requests:
             d = self.drivers[match_request.driver]
             p = self.passengers[match_request.passenger]
+            # match requests computed on an older state may be stale, those are dropped
             if d.status != Driver.Status.IDLE or p.status != Passenger.Status.WAITING:
                 continue
 
             d.status = Driver.Status.MATCHING
             d.match_request = match_request
             p.status = Passenger.Status.MATCHING
+            self.kpis.request()
+            self.kpis.driver_status(Driver.Status.IDLE, d.status)
             self._log_match_request(match_request)
 
 
     def _generate_match_requests(self) -> List[MatchRequest]:
 
-        return self.matcher.match(self.drivers, self.passengers, self.map)
-
-    def _check_graph(self, graph):
-
-        # only allow nx.DiGraph
-        if not type(graph) is nx.DiGraph:
-            raise TypeError("graph should be of type nx.DiGraph")
-
-        # only allow strongly connected graphs
-        if not nx.is_strongly_connected(graph):
-            raise ValueError("graph is not strongly connected")
-        
-        # only allow constant weights
-        weight = None
-        for u,v,d in graph.edges(data=True):
-            try:
-                edge_weight = d["weight"]
-            except:
-                raise ValueError("edges of the graphs should have the weight attribute")
-
-            if weight is None:
-                weight = edge_weight
-            elif edge_weight != weight:
-                raise ValueError("edges of the graph should have constant weight")
-
-        return weight
+        if self.shifts is None:
+            return self.matcher.match(self.drivers, self.passengers, self.map, time = self.step_count)
 
+        # the matcher only sees the drivers on shift, its driver indices are mapped back to the fleet
+        active = self.active_drivers.active.copy()
+        match_requests = self.matcher.match([self.drivers[i] for i in active.tolist()], self.passengers, self.map, time = self.step_count)
+        for match_request in match_requests:
+            match_request.driver = int(active[match_request.driver])
+        return match_requests
 
     def _log(self):
         if not self.is_logging:
             return
         
         for message in self.messages:
-            logging.info(message)
+            logger.info(message)
         
         self.messages = []
 
@@ -352,6 +757,14 @@ class Uber(gym.Env):
 
         self.messages.append(f"Match Request for driver {match_request.driver}, passenger {match_request.passenger} with price {match_request.price}.")
 
+    def _log_shift(self, driver: int, on: bool):
+
+        self.messages.append(f"Driver {driver} logged {'on' if on else 'off'}.")
+
+    def _log_abandonment(self, passenger: int):
+
+        self.messages.append(f"Passenger {passenger} abandoned after waiting too long.")
+
     def _log_passenger_generation(self, passenger: int, position: int, destination: int):
 
         self.messages.append(f"Passenger {passenger} generated at position {position} to destination {destination}.")
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""
+Local server hosting Uber environments for agents running in other processes.
+
+EnvServer hosts a list of environments with the same number of drivers and accepts batched reset and step calls on a
+Unix domain socket. Observations, actions, rewards and done flags live in shared memory blocks, and the socket only
+carries small control messages, one JSON object per line, so that clients in any language can drive the server:
+    {"cmd": "spec"}                                          -> layout of the shared memory blocks
+    {"cmd": "reset", "envs": [0, 1], "seed": 0, "options": {}} -> resets the environments, writes their observations
+    {"cmd": "step", "envs": [0, 1]}                            -> reads their actions, steps them, writes the results
+Replies are {"ok": true, ...} or {"ok": false, "error": message}. envs defaults to all environments.
+A reset seed is the seed of the whole server: environment i is reset with the i-th child of SeedSequence(seed) spawned
+once per environment, so that the environments are independent and the seed of environment i does not depend on
+which other environments are reset with it. A null seed resets every environment with fresh entropy.
+Infos are sent as JSON in the reply, arrays and lists with more than max_info_items entries (e.g. the per-driver
+arrays of large fleets) are replaced by a summary {"shape", "sum", "mean", "min", "max"} so that replies stay small.
+Shared memory layout, row i belongs to environment i:
+    observations: float64 (n_envs, n_drivers, 5) with the features state, position, passenger_destination, passenger_position, price
+    actions: int64 (n_envs, n_drivers)
+    rewards: float64 (n_envs, n_drivers)
+    dones: uint8 (n_envs,)
+UberClient is an asyncio client with batched calls, and RemoteUber the gym API of one hosted environment.
+The client only needs numpy, it does not import the simulator, networkx or gurobipy.
+"""
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import asyncio, json, os
+import numpy as np
+
+# largest control message, in bytes, the default asyncio limit of 64 KiB is too small for the infos of many envs
+LINE_LIMIT = 2 ** 24
+
+FEATURES = ["state", "position", "passenger_destination", "passenger_position", "price"]
+
+BUFFERS = {
+    "observations": (np.float64, lambda n_envs, n_drivers: (n_envs, n_drivers, len(FEATURES))),
+    "actions": (np.int64, lambda n_envs, n_drivers: (n_envs, n_drivers)),
+    "rewards": (np.float64, lambda n_envs, n_drivers: (n_envs, n_drivers)),
+    "dones": (np.uint8, lambda n_envs, n_drivers: (n_envs,)),
+}
+
+
+def _json_default(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return str(value)
+
+
+def _compact(value, max_items: int):
+    """
+    value with the arrays and lists of more than max_items entries replaced by a summary, recursively in dicts.
+    """
+    if isinstance(value, dict):
+        return {key: _compact(item, max_items) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)) and np.size(value) > max_items:
+        array = np.asarray(value)
+        if not np.issubdtype(array.dtype, np.number):
+            return {"shape": list(array.shape)}
+        return {"shape": list(array.shape), "sum": array.sum(), "mean": array.mean(), "min": array.min(), "max": array.max()}
+    return value
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: Dict) -> Dict:
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    if not reply.pop("ok"):
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # the server owns the blocks, a client must not unlink them when it exits
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        block = shared_memory.SharedMemory(name = name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+class EnvServer:
+    def __init__(self, envs: List, path: str, max_info_items: int = 256):
+        """
+        Hosts the given Uber environments on the Unix domain socket at path. Info arrays and lists with more than
+        max_info_items entries are summarised in the replies.
+        """
+        n_drivers = {env.n_drivers for env in envs}
+        if len(n_drivers) != 1:
+            raise ValueError("all environments should have the same number of drivers")
+
+        self.envs = envs
+        self.path = path
+        self.n_drivers = n_drivers.pop()
+        self.max_info_items = max_info_items
+
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.buffers: Dict[str, np.ndarray] = {}
+        for name, (dtype, shape) in BUFFERS.items():
+            shape = shape(len(envs), self.n_drivers)
+            block = shared_memory.SharedMemory(create = True, size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+            self.blocks[name] = block
+            self.buffers[name] = np.ndarray(shape, dtype = dtype, buffer = block.buf)
+            self.buffers[name][...] = 0
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock = asyncio.Lock()
+
+    def spec(self) -> Dict:
+        return {
+            "n_envs": len(self.envs),
+            "n_drivers": self.n_drivers,
+            "features": FEATURES,
+            "buffers": {name: {"shm": self.blocks[name].name, "dtype": np.dtype(dtype).str, "shape": list(self.buffers[name].shape)} for name, (dtype, _) in BUFFERS.items()},
+        }
+
+    def _write_observation(self, i: int, observation: OrderedDict):
+        self.buffers["observations"][i] = np.stack([observation[feature] for feature in FEATURES], axis = 1)
+
+    def seeds(self, seed: Optional[int]) -> List[Optional[int]]:
+        """
+        Seeds of the environments for a reset with seed, one child of SeedSequence(seed) per environment.
+        """
+        if seed is None:
+            return [None] * len(self.envs)
+        return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(len(self.envs))]
+
+    def reset(self, envs: List[int], seed: Optional[int] = None, options: Optional[Dict] = None) -> Dict:
+        infos = {}
+        seeds = self.seeds(seed)
+        for i in envs:
+            observation, info = self.envs[i].reset(seed = seeds[i], return_info = True, options = options)
+            self._write_observation(i, observation)
+            self.buffers["rewards"][i] = 0
+            self.buffers["dones"][i] = 0
+            infos[i] = _compact(info, self.max_info_items)
+        return {"infos": infos}
+
+    def step(self, envs: List[int]) -> Dict:
+        infos = {}
+        for i in envs:
+            observation, rewards, done, info = self.envs[i].step(self.buffers["actions"][i].copy())
+            self._write_observation(i, observation)
+            self.buffers["rewards"][i] = rewards
+            self.buffers["dones"][i] = done
+            infos[i] = _compact(info, self.max_info_items)
+        return {"infos": infos}
+
+    def _handle(self, message: Dict) -> Dict:
+        command = message.get("cmd")
+        envs = message.get("envs")
+        envs = list(range(len(self.envs))) if envs is None else [int(i) for i in envs]
+        if any(i < 0 or i >= len(self.envs) for i in envs):
+            raise ValueError(f"environments should be between 0 and {len(self.envs) - 1}")
+
+        if command == "spec":
+            return self.spec()
+        if command == "reset":
+            return self.reset(envs, message.get("seed"), message.get("options"))
+        if command == "step":
+            return self.step(envs)
+        raise ValueError(f"Unknown command {command}")
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    # the environments are stepped in a worker thread so that other clients can still connect
+                    async with self._lock:
+                        reply = await loop.run_in_executor(None, self._handle, message)
+                    reply = {"ok": True, **reply}
+                except Exception as error:
+                    reply = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+                writer.write(json.dumps(reply, default = _json_default).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path = self.path, limit = LINE_LIMIT)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.buffers = {}
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+        for env in self.envs:
+            env.close()
+
+
+class UberClient:
+    """
+    asyncio client of an EnvServer. Observations and rewards returned by reset and step are copies of the shared buffers.
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, spec: Dict):
+        self.reader = reader
+        self.writer = writer
+        self.n_envs = spec["n_envs"]
+        self.n_drivers = spec["n_drivers"]
+
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.buffers: Dict[str, np.ndarray] = {}
+        for name, buffer in spec["buffers"].items():
+            self.blocks[name] = _attach(buffer["shm"])
+            self.buffers[name] = np.ndarray(tuple(buffer["shape"]), dtype = np.dtype(buffer["dtype"]), buffer = self.blocks[name].buf)
+
+    @classmethod
+    async def connect(cls, path: str) -> 'UberClient':
+        reader, writer = await asyncio.open_unix_connection(path, limit = LINE_LIMIT)
+        return cls(reader, writer, await _request(reader, writer, {"cmd": "spec"}))
+
+    async def _request(self, message: Dict) -> Dict:
+        return await _request(self.reader, self.writer, message)
+
+    def _envs(self, envs: Optional[List[int]]) -> List[int]:
+        return list(range(self.n_envs)) if envs is None else list(envs)
+
+    async def reset(self, envs: Optional[List[int]] = None, seed: Optional[int] = None, options: Optional[Dict] = None) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        Resets the environments, returns their (len(envs), n_drivers, features) observations and infos.
+        """
+        envs = self._envs(envs)
+        reply = await self._request({"cmd": "reset", "envs": envs, "seed": seed, "options": options})
+        return self.buffers["observations"][envs].copy(), [reply["infos"][str(i)] for i in envs]
+
+    async def step(self, actions: np.ndarray, envs: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Dict]]:
+        """
+        Steps the environments with (len(envs), n_drivers) actions, returns their observations, rewards, done flags and infos.
+        """
+        envs = self._envs(envs)
+        self.buffers["actions"][envs] = actions
+        reply = await self._request({"cmd": "step", "envs": envs})
+        return (
+            self.buffers["observations"][envs].copy(),
+            self.buffers["rewards"][envs].copy(),
+            self.buffers["dones"][envs].astype(bool),
+            [reply["infos"][str(i)] for i in envs],
+        )
+
+    def env(self, i: int) -> 'RemoteUber':
+        return RemoteUber(self, i)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.buffers = {}
+        for block in self.blocks.values():
+            block.close()
+        self.blocks = {}
+
+
+class RemoteUber:
+    """
+    The gym API (old step API, as Uber) of environment i of a server, with async reset and step.
+    """
+    def __init__(self, client: UberClient, i: int):
+        self.client = client
+        self.i = i
+        self.n_drivers = client.n_drivers
+
+    @staticmethod
+    def _observation(features: np.ndarray) -> OrderedDict:
+        observation = OrderedDict()
+        for k, feature in enumerate(FEATURES):
+            observation[feature] = features[:, k] if feature == "price" else features[:, k].astype(np.int64)
+        return observation
+
+    async def reset(self, seed: Optional[int] = None, return_info: bool = False, options: Optional[Dict] = None):
+        observations, infos = await self.client.reset([self.i], seed, options)
+        observation = self._observation(observations[0])
+        return (observation, infos[0]) if return_info else observation
+
+    async def step(self, actions: np.ndarray) -> Tuple[OrderedDict, np.ndarray, bool, Dict]:
+        observations, rewards, dones, infos = await self.client.step(np.asarray(actions)[None], [self.i])
+        return self._observation(observations[0]), rewards[0], bool(dones[0]), infos[0]